@@ -0,0 +1,112 @@
+"""Measures directory discovery on a filesystem with per-call latency.
+
+Usage (from the repository root):
+    python -m benchmarks.directory_walk [--dirs N] [--per-dir N] [--latency MS]
+
+Builds a tree of empty ``.jpg`` files, then walks it the way a scan does
+while every ``os.stat``, ``os.scandir`` and ``DirEntry.stat`` call made by
+the scanner sleeps for ``--latency`` milliseconds first, standing in for the
+round trips of a network share. Only discovery is timed; no thumbnails are
+generated. Reports the walk time for several listing thread counts.
+"""
+import argparse
+import os
+
+os.environ.setdefault("PIC_ANALYZER_NO_QT", "1")
+
+import shutil
+import tempfile
+import time
+import types
+from src.app import file_scanner
+from src.app.file_scanner import FolderScanner
+from src.app.scan_rules import ScanRules
+
+
+class SlowEntry:
+    """``os.DirEntry`` whose ``stat`` pays one round trip, like on NFS/SMB."""
+
+    def __init__(self, entry, latency):
+        self._entry = entry
+        self._latency = latency
+        self.name = entry.name
+        self.path = entry.path
+
+    def is_dir(self, follow_symlinks=True):
+        # Served from the type returned with the listing
+        return self._entry.is_dir(follow_symlinks=follow_symlinks)
+
+    def stat(self, follow_symlinks=True):
+        time.sleep(self._latency)
+        return self._entry.stat(follow_symlinks=follow_symlinks)
+
+
+class SlowScandir:
+    def __init__(self, path, latency):
+        time.sleep(latency)
+        with os.scandir(path) as it:
+            self._entries = [SlowEntry(entry, latency) for entry in it]
+
+    def __enter__(self):
+        return iter(self._entries)
+
+    def __exit__(self, *exc):
+        return False
+
+
+def slow_os(latency: float):
+    """Returns a stand-in for the ``os`` module with slow filesystem calls."""
+    def stat(path, *args, **kwargs):
+        time.sleep(latency)
+        return os.stat(path, *args, **kwargs)
+    namespace = types.SimpleNamespace(**{
+        name: getattr(os, name) for name in dir(os) if not name.startswith("__")
+    })
+    namespace.stat = stat
+    namespace.scandir = lambda path: SlowScandir(path, latency)
+    return namespace
+
+
+def make_tree(root: str, dirs: int, per_dir: int):
+    for d in range(dirs):
+        directory = os.path.join(root, f"group{d % 10}", f"dir{d:04d}")
+        os.makedirs(directory, exist_ok=True)
+        for i in range(per_dir):
+            open(os.path.join(directory, f"img{i:04d}.jpg"), "wb").close()
+
+
+def walk(root: str, listing_workers: int) -> tuple[float, int]:
+    """Returns (seconds, images found) of one discovery pass."""
+    scanner = FolderScanner(root, rules=ScanRules(), listing_workers=listing_workers)
+    scanner.journal = False
+    start = time.perf_counter()
+    found = sum(1 for path, _ in scanner._discover({}, {}) if path is not None)
+    return time.perf_counter() - start, found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dirs", type=int, default=200, help="Leaf directories")
+    parser.add_argument("--per-dir", type=int, default=20, help="Files per directory")
+    parser.add_argument("--latency", type=float, default=2.0,
+                        help="Milliseconds added to every filesystem call")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 8, 16, 32],
+                        help="Listing thread counts to compare")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="directory_walk_")
+    real_os = file_scanner.os
+    try:
+        make_tree(root, args.dirs, args.per_dir)
+        file_scanner.os = slow_os(args.latency / 1000)
+        print(f"{'threads':>8} {'seconds':>9} {'dirs/s':>8} {'images':>8}")
+        for threads in args.threads:
+            seconds, found = walk(root, threads)
+            print(f"{threads:>8} {seconds:>9.2f} {args.dirs / seconds:>8.0f} {found:>8}")
+    finally:
+        file_scanner.os = real_os
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
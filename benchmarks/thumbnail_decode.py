@@ -0,0 +1,68 @@
+"""Compares per-image thumbnail latency of the fast and exact decode paths.
+
+Usage (from the repository root):
+    python -m benchmarks.thumbnail_decode [IMAGE ...] [--repeat N]
+
+Without arguments, synthetic 24-megapixel JPEG and PNG files are generated
+in a temporary directory.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from PIL import Image
+from src.ui.thumbnail_gen import ThumbnailGenerator
+
+
+def make_samples(directory: str) -> list[str]:
+    """Writes synthetic camera-sized test images and returns their paths."""
+    width, height = 6000, 4000
+    # A gradient compresses like a photo far better than random noise
+    gradient = Image.linear_gradient("L").resize((width, height))
+    img = Image.merge("RGB", (
+        gradient,
+        gradient.transpose(Image.FLIP_LEFT_RIGHT),
+        gradient.transpose(Image.FLIP_TOP_BOTTOM),
+    ))
+    paths = []
+    for ext, params in ((".jpg", {"quality": 92}), (".png", {})):
+        path = os.path.join(directory, f"sample_24mp{ext}")
+        img.save(path, **params)
+        paths.append(path)
+    return paths
+
+
+def time_path(path: str, quality: str, repeat: int) -> list[float]:
+    """Returns the latencies in milliseconds of ``repeat`` thumbnail runs."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        ThumbnailGenerator.generate(path, quality=quality)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("images", nargs="*", help="Images to benchmark")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per image and path")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        images = args.images or make_samples(tmp)
+        print(f"{'image':<28} {'path':<6} {'median ms':>10} {'min ms':>8}")
+        for path in images:
+            medians = {}
+            for quality in ThumbnailGenerator.QUALITIES:
+                timings = time_path(path, quality, args.repeat)
+                medians[quality] = statistics.median(timings)
+                print(f"{os.path.basename(path)[:28]:<28} {quality:<6} "
+                      f"{medians[quality]:>10.1f} {min(timings):>8.1f}")
+            fast = medians[ThumbnailGenerator.QUALITY_FAST]
+            speedup = medians[ThumbnailGenerator.QUALITY_EXACT] / fast
+            print(f"{'':<28} speedup {speedup:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
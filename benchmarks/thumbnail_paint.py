@@ -0,0 +1,52 @@
+"""Compares the cost of turning stored thumbnails into pixmaps per encoding.
+
+Usage (from the repository root):
+    python -m benchmarks.thumbnail_paint [--tiles N]
+
+Measures what rebuilding a gallery of N tiles costs on the UI thread, i.e.
+``GalleryView._set_item_thumbnail`` for each tile, together with the bytes
+each encoding stores per thumbnail.
+"""
+import argparse
+import os
+import time
+from PIL import Image
+from PySide6.QtWidgets import QApplication, QListWidgetItem
+from src.ui.gallery.logic import GalleryView
+from src.ui.thumbnail_gen import ThumbnailGenerator
+
+
+def make_thumbnail() -> Image.Image:
+    """Returns a photo-like 150px thumbnail."""
+    gradient = Image.linear_gradient("L").resize((150, 113))
+    return Image.merge("RGB", (
+        gradient,
+        gradient.transpose(Image.FLIP_LEFT_RIGHT),
+        gradient.transpose(Image.FLIP_TOP_BOTTOM),
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tiles", type=int, default=5000, help="Tiles per encoding")
+    args = parser.parse_args()
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app = QApplication.instance() or QApplication([])
+    gallery = GalleryView()
+    thumbnail = make_thumbnail()
+
+    print(f"{'encoding':<10} {'bytes/tile':>10} {'total ms':>10} {'us/tile':>8}")
+    for encoding in ThumbnailGenerator.ENCODINGS:
+        data = ThumbnailGenerator._encode(thumbnail, encoding)
+        items = [QListWidgetItem() for _ in range(args.tiles)]
+        start = time.perf_counter()
+        for item in items:
+            gallery._set_item_thumbnail(item, data)
+        elapsed = time.perf_counter() - start
+        print(f"{encoding:<10} {len(data):>10} {elapsed * 1000:>10.1f} "
+              f"{elapsed / args.tiles * 1e6:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
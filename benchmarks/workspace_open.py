@@ -0,0 +1,74 @@
+"""Measures how long reopening an indexed workspace takes to show its first images.
+
+Usage (from the repository root):
+    python -m benchmarks.workspace_open [--images N] [--per-dir N]
+
+Indexes N tiny synthetic images once, then reopens the workspace the way the
+main window does, with and without emitting the indexed snapshot first.
+Reports the time to the first result batch and to the end of the scan.
+Runs without Qt, like the headless indexer.
+"""
+import argparse
+import os
+
+os.environ.setdefault("PIC_ANALYZER_NO_QT", "1")
+
+import shutil
+import tempfile
+import time
+from PIL import Image
+from src.app.database import DatabaseManager
+from src.app.file_scanner import FolderScanner
+
+
+def make_tree(root: str, images: int, per_dir: int):
+    """Writes ``images`` small JPEGs spread over directories of ``per_dir``."""
+    buffer_path = os.path.join(root, "template.jpg")
+    Image.new("RGB", (64, 48), "gray").save(buffer_path)
+    for i in range(images):
+        directory = os.path.join(root, f"dir{i // per_dir:04d}")
+        os.makedirs(directory, exist_ok=True)
+        shutil.copyfile(buffer_path, os.path.join(directory, f"img{i:06d}.jpg"))
+    os.remove(buffer_path)
+
+
+def reopen(root: str, db_path: str, snapshot: bool) -> tuple[float, float, int]:
+    """Returns (ms to first batch, ms to finish, images emitted)."""
+    first = []
+    emitted = [0]
+    def on_batch(batch):
+        if not first:
+            first.append(time.perf_counter())
+        emitted[0] += len(batch)
+    scanner = FolderScanner(root, db_path, incremental=True, snapshot=snapshot)
+    scanner.signals.files_found.connect(on_batch)
+    start = time.perf_counter()
+    scanner.run()
+    end = time.perf_counter()
+    return ((first[0] if first else end) - start) * 1000, (end - start) * 1000, emitted[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", type=int, default=20000, help="Images in the workspace")
+    parser.add_argument("--per-dir", type=int, default=200, help="Images per directory")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="workspace_open_")
+    try:
+        make_tree(root, args.images, args.per_dir)
+        db_path = DatabaseManager.workspace_db_path(root)
+        DatabaseManager(db_path)
+        FolderScanner(root, db_path, incremental=True).run()
+
+        print(f"{'mode':<10} {'first batch ms':>15} {'total ms':>10} {'images':>8}")
+        for snapshot in (False, True):
+            first, total, emitted = reopen(root, db_path, snapshot)
+            mode = "snapshot" if snapshot else "walk"
+            print(f"{mode:<10} {first:>15.1f} {total:>10.1f} {emitted:>8}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,13 @@
-import os
 import datetime
+from src.app.archives import path_exists, path_mtime
 
 class DateGroupingAlgo:
     def run(self, image_path: str, granularity: str = "month") -> dict:
-        if not os.path.exists(image_path):
+        if not path_exists(image_path):
             return {"error": "File not found"}
         
-        mtime = os.path.getmtime(image_path)
+        # Images inside archives carry their own timestamp
+        mtime = path_mtime(image_path)
         dt = datetime.datetime.fromtimestamp(mtime)
         
         if granularity == "year":
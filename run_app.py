@@ -1,5 +1,8 @@
 import sys
+import multiprocessing
 from src.app.main import main
 
 if __name__ == "__main__":
+    # Required for the thumbnail process pool in frozen (PyInstaller) builds.
+    multiprocessing.freeze_support()
     main()
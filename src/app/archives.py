@@ -0,0 +1,179 @@
+"""Images inside ZIP/CBZ archives, addressed as members of virtual folders.
+
+An archive is scanned like a folder: each image member is indexed under the
+virtual path ``<archive path>!/<member name>`` (see ``member_path``) and read
+straight out of the archive, without extracting it. Everything that opens
+images by path goes through ``open_image`` or ``image_source`` so members
+work wherever files do.
+"""
+import io
+import os
+import zipfile
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_EXTENSIONS = {".zip", ".cbz"}
+# Joins an archive path and a member name
+MEMBER_SEPARATOR = "!/"
+
+
+def is_archive(path) -> bool:
+    """Returns whether ``path`` names a supported archive (by extension)."""
+    return os.path.splitext(path)[1].lower() in ARCHIVE_EXTENSIONS
+
+
+def member_path(archive, name) -> str:
+    """Returns the virtual path of member ``name`` of ``archive``."""
+    return archive + MEMBER_SEPARATOR + name
+
+
+def split_member_path(path):
+    """Splits a virtual member path.
+
+    Returns:
+        tuple[str, str]: ``(archive path, member name)``, or None if ``path``
+        does not point into an archive.
+    """
+    start = 0
+    while True:
+        index = path.find(MEMBER_SEPARATOR, start)
+        if index < 0:
+            return None
+        if is_archive(path[:index]):
+            return path[:index], path[index + len(MEMBER_SEPARATOR):]
+        start = index + 1
+
+
+def container_of(path) -> str:
+    """Returns the folder or archive holding ``path``."""
+    parts = split_member_path(path)
+    return parts[0] if parts else os.path.dirname(path)
+
+
+def path_exists(path, follow_symlinks=True) -> bool:
+    """Like ``os.path.exists``; a member exists if its archive does.
+
+    With ``follow_symlinks`` unset, broken symlinks exist, as with
+    ``os.path.lexists``.
+    """
+    parts = split_member_path(path)
+    if parts:
+        return os.path.isfile(parts[0])
+    return os.path.exists(path) if follow_symlinks else os.path.lexists(path)
+
+
+def path_mtime(path) -> float:
+    """Like ``os.path.getmtime``; members report the time stored in the archive.
+
+    Raises:
+        OSError: If the file, archive or member cannot be read.
+    """
+    if split_member_path(path) is None:
+        return os.path.getmtime(path)
+    archive, name = split_member_path(path)
+    try:
+        with zipfile.ZipFile(archive) as zf:
+            return ArchiveMember(zf.getinfo(name)).st_mtime
+    except (zipfile.BadZipFile, KeyError) as e:
+        raise OSError(f"Cannot read {name} from {archive}: {e}") from e
+
+
+class ArchiveMember:
+    """Size, time and checksum of one archive member, shaped like a stat result."""
+    st_dev = None
+    st_ino = None
+
+    def __init__(self, info):
+        self.st_size = info.file_size
+        try:
+            self.st_mtime = datetime(*info.date_time).timestamp()
+        except (ValueError, OverflowError):
+            self.st_mtime = 0
+        self.crc = info.CRC
+
+
+class _OpenArchives:
+    """Keeps the last few archives open for reading members.
+
+    Saves re-parsing the central directory of a large archive for every one
+    of its members.
+    """
+    MAX_OPEN = 4
+
+    def __init__(self):
+        self._archives = OrderedDict()
+        self._lock = threading.Lock()
+
+    def read(self, archive, name) -> bytes:
+        st = os.stat(archive)
+        key = (archive, st.st_mtime_ns, st.st_size)
+        with self._lock:
+            zf = self._archives.pop(archive, (None, None))
+            if zf[0] != key:
+                if zf[1] is not None:
+                    zf[1].close()
+                zf = (key, zipfile.ZipFile(archive))
+            self._archives[archive] = zf
+            while len(self._archives) > self.MAX_OPEN:
+                self._archives.popitem(last=False)[1][1].close()
+            # ZipFile reads share one file handle, so they are serialized
+            return zf[1].read(name)
+
+_open_archives = _OpenArchives()
+
+
+def list_members(archive, extensions):
+    """Lists the members of ``archive`` with one of ``extensions``, by name.
+
+    Directories and encrypted members are skipped.
+
+    Returns:
+        list[tuple[str, ArchiveMember]]: ``(member name, stats)`` pairs.
+
+    Raises:
+        OSError: If the archive cannot be read or is not a ZIP file.
+    """
+    try:
+        with zipfile.ZipFile(archive) as zf:
+            infos = zf.infolist()
+    except zipfile.BadZipFile as e:
+        raise OSError(f"Not a readable archive: {e}") from e
+    members = []
+    for info in infos:
+        if info.is_dir() or info.flag_bits & 0x1:
+            continue
+        if os.path.splitext(info.filename)[1].lower() in extensions:
+            members.append((info.filename, ArchiveMember(info)))
+    members.sort(key=lambda member: member[0])
+    return members
+
+
+def read_member(path) -> bytes:
+    """Returns the uncompressed content of the member at virtual ``path``.
+
+    Raises:
+        OSError: If the archive or the member cannot be read.
+    """
+    archive, name = split_member_path(path)
+    try:
+        return _open_archives.read(archive, name)
+    except (zipfile.BadZipFile, KeyError, RuntimeError, EOFError) as e:
+        raise OSError(f"Cannot read {name} from {archive}: {e}") from e
+
+
+def open_image(path):
+    """Returns a binary file object of a file or archive member. Close it when done."""
+    if split_member_path(path) is None:
+        return open(path, "rb")
+    stream = io.BytesIO(read_member(path))
+    stream.name = path
+    return stream
+
+
+def image_source(path):
+    """Returns what Pillow should open: ``path`` itself, or a stream for members."""
+    return path if split_member_path(path) is None else open_image(path)
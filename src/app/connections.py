@@ -0,0 +1,96 @@
+"""Reused, tuned SQLite connections to workspace databases.
+
+Opening a connection costs a file open, a schema parse and a cold page
+cache, which the UI used to pay on every click. ``ConnectionManager`` keeps
+one connection per thread and database instead, so later queries find the
+schema parsed, their statements prepared and the pages they need cached.
+"""
+import os
+import sqlite3
+import logging
+import threading
+from src.app.io_tuning import storage_class, STORAGE_NETWORK
+
+logger = logging.getLogger(__name__)
+
+# Applied to every connection. WAL lets readers and a writer (a running
+# scan) proceed side by side; with it, synchronous=NORMAL only risks the last
+# commits on power loss, never corruption.
+PRAGMAS = (
+    ("synchronous", "NORMAL"),
+    ("mmap_size", 256 * 1024 * 1024),
+    ("cache_size", -16 * 1024), # KiB
+    ("temp_store", "MEMORY"),
+)
+# Prepared statements kept per connection, looked up by their SQL text
+CACHED_STATEMENTS = 256
+
+
+def open_connection(db_path, **kwargs) -> sqlite3.Connection:
+    """Opens a connection to ``db_path`` with the tuned pragma profile.
+
+    The database is switched to WAL unless it lives on a network
+    filesystem, where the shared memory WAL relies on does not work.
+
+    Args:
+        db_path (str): The database file.
+        **kwargs: Passed on to ``sqlite3.connect``.
+    """
+    conn = sqlite3.connect(db_path, cached_statements=CACHED_STATEMENTS, **kwargs)
+    pragmas = PRAGMAS
+    if storage_class(os.path.dirname(os.path.abspath(db_path))) != STORAGE_NETWORK:
+        pragmas = (("journal_mode", "WAL"),) + pragmas
+    for name, value in pragmas:
+        try:
+            conn.execute(f"PRAGMA {name} = {value}").fetchall()
+        except sqlite3.Error as e:
+            # e.g. WAL cannot be entered while another connection writes
+            logger.warning(f"Could not set PRAGMA {name} on {db_path}: {e}")
+    return conn
+
+
+class ConnectionManager:
+    """Hands out one connection per thread to a database, reused across calls.
+
+    SQLite connections may only be used by the thread that opened them, so
+    each thread gets its own. ``close`` retires them: the calling thread's
+    connection is closed at once, those of other threads the next time they
+    ask for one (or when the thread exits).
+    """
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._generation = 0
+
+    @classmethod
+    def for_database(cls, db_path: str) -> "ConnectionManager":
+        """Returns the manager shared by everyone using the database at ``db_path``."""
+        path = os.path.abspath(db_path)
+        with cls._instances_lock:
+            manager = cls._instances.get(path)
+            if manager is None:
+                manager = cls._instances[path] = cls(path)
+            return manager
+
+    def connection(self) -> sqlite3.Connection:
+        """Returns the calling thread's connection, opening it if needed."""
+        local = self._local
+        conn = getattr(local, "conn", None)
+        if conn is not None and local.generation == self._generation:
+            return conn
+        if conn is not None:
+            conn.close()
+        local.conn = open_connection(self.db_path)
+        local.generation = self._generation
+        return local.conn
+
+    def close(self):
+        """Retires every connection to the database (see class docs)."""
+        self._generation += 1
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._local.conn = None
+            conn.close()
@@ -1,16 +1,70 @@
 import sqlite3
 import os
+import time
+import logging
+from datetime import datetime
+from src.app.thumb_store import ThumbnailPack
+from src.app.connections import ConnectionManager
+from src.app.archives import path_exists
+
+logger = logging.getLogger(__name__)
 
 class DatabaseManager:
     """Manages SQLite database operations for image metadata and analysis results.
 
     This class handles database initialization, schema management, and provides
-    methods for retrieving metrics and image-specific metadata.
+    methods for retrieving metrics and image-specific metadata. Queries run on
+    the calling thread's reused connection (see ``ConnectionManager``).
 
     Attributes:
         db_path (str): The file path to the SQLite database.
     """
 
+    # Database of a workspace, stored in the workspace folder
+    WORKSPACE_DB_NAME = ".pic_analyzer.db"
+
+    # (column, type) pairs added to the images table after its creation
+    IMAGE_COLUMN_MIGRATIONS = [
+        ("thumbnail", "BLOB"),
+        ("thumbnail_source", "TEXT"),
+        ("thumb_offset", "INTEGER"),
+        ("thumb_length", "INTEGER"),
+        ("content_key", "TEXT"),
+        ("device", "INTEGER"),
+        ("inode", "INTEGER"),
+        ("width", "INTEGER"),
+        ("height", "INTEGER"),
+        ("format", "TEXT"),
+        ("frame_count", "INTEGER"),
+        ("taken_at", "REAL"),
+        ("member_crc", "INTEGER"),
+    ]
+
+    # Numeric metrics computed from images columns, in menu order. The
+    # columns filled from image headers during scans (see ingest.read_header)
+    # are only offered once some image has them.
+    IMAGE_METRICS = {
+        "file_size": "file_size",
+        "modified_at": "modified_at",
+        "width": "width",
+        "height": "height",
+        "megapixels": "width * height / 1000000.0",
+        "aspect_ratio": "CAST(width AS REAL) / NULLIF(height, 0)",
+        "frame_count": "frame_count",
+        "taken_at": "taken_at",
+    }
+
+    # Tables whose rows belong to an image through image_id
+    IMAGE_CHILD_TABLES = ("analysis_results", "thumbnail_levels")
+    # Rows deleted per statement
+    DELETE_BATCH_SIZE = 500
+    # Seconds the post-scan maintenance may spend reclaiming space
+    MAINTENANCE_TIME_BUDGET = 2.0
+    # Free pages released per incremental vacuum step
+    VACUUM_STEP_PAGES = 256
+    # Rows sampled per index by ANALYZE, see PRAGMA analysis_limit
+    ANALYSIS_LIMIT = 1000
+
     def __init__(self, db_path: str):
         """Initializes the DatabaseManager with the specified database path.
 
@@ -20,15 +74,27 @@ class DatabaseManager:
         self.db_path = db_path
         self._initialize_db()
 
+    @classmethod
+    def workspace_db_path(cls, folder: str) -> str:
+        """Returns the path of the database indexing ``folder``."""
+        return os.path.join(folder, cls.WORKSPACE_DB_NAME)
+
     def _initialize_db(self):
         """Initializes the database schema if it doesn't already exist.
 
-        Creates tables for images, analysis_results, and plugin_metadata.
+        Creates tables for images, analysis_results, directories,
+        thumbnail_levels, scan_journal, workspace_settings and
+        plugin_metadata.
         Also handles basic schema migrations for existing databases.
         """
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
 
+        # Lets maintenance give free pages back to the filesystem. Only takes
+        # effect before the first table is created; older databases are
+        # converted by ``run_maintenance``.
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+
         # Create images table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS images (
@@ -38,7 +104,20 @@ class DatabaseManager:
                 file_size INTEGER,
                 created_at TIMESTAMP,
                 modified_at TIMESTAMP,
-                thumbnail BLOB
+                thumbnail BLOB, -- legacy, thumbnails live in the ThumbnailPack
+                thumbnail_source TEXT,
+                thumb_offset INTEGER,
+                thumb_length INTEGER,
+                content_key TEXT, -- content fingerprint, see file_ops.content_fingerprint
+                device INTEGER,
+                inode INTEGER,
+                -- read from the image header; format is '' if it was unreadable
+                width INTEGER,
+                height INTEGER,
+                format TEXT,
+                frame_count INTEGER,
+                taken_at REAL, -- EXIF capture time, Unix timestamp
+                member_crc INTEGER -- CRC-32 of images inside archives, see archives.py
             )
         ''')
 
@@ -55,6 +134,46 @@ class DatabaseManager:
             )
         ''')
 
+        # Create directories table (directory-level index for incremental rescans)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS directories (
+                path TEXT PRIMARY KEY,
+                parent TEXT,
+                mtime_ns INTEGER,
+                entry_count INTEGER -- for archives: their size in bytes
+            )
+        ''')
+
+        # Create thumbnail_levels table (lazily generated non-base thumbnail sizes)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS thumbnail_levels (
+                image_id INTEGER,
+                level INTEGER,
+                thumb_offset INTEGER,
+                thumb_length INTEGER,
+                PRIMARY KEY (image_id, level),
+                FOREIGN KEY (image_id) REFERENCES images (id)
+            )
+        ''')
+
+        # Create scan_journal table (checkpoints of scans still in progress)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS scan_journal (
+                root TEXT PRIMARY KEY,
+                pending TEXT, -- JSON list of directories not walked yet
+                started_at REAL,
+                updated_at REAL
+            )
+        ''')
+
+        # Create workspace_settings table (JSON values, e.g. ScanRules)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS workspace_settings (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+        ''')
+
         # Create plugin_metadata table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS plugin_metadata (
@@ -68,13 +187,14 @@ class DatabaseManager:
 
         conn.commit()
         
-        # Schema migration: check for thumbnail column
+        # Schema migration: add columns introduced after the first release
         try:
             cursor.execute("PRAGMA table_info(images)")
             columns = [col[1] for col in cursor.fetchall()]
-            if 'thumbnail' not in columns:
-                cursor.execute("ALTER TABLE images ADD COLUMN thumbnail BLOB")
-                conn.commit()
+            for column, column_type in self.IMAGE_COLUMN_MIGRATIONS:
+                if column not in columns:
+                    cursor.execute(f"ALTER TABLE images ADD COLUMN {column} {column_type}")
+            conn.commit()
         except Exception:
             pass
             
@@ -82,9 +202,142 @@ class DatabaseManager:
 
     def switch_database(self, new_db_path: str):
         """Closes connection to current DB (any) and opens/initializes a new one."""
+        if os.path.abspath(new_db_path) != os.path.abspath(self.db_path):
+            ConnectionManager.for_database(self.db_path).close()
         self.db_path = new_db_path
         self._initialize_db()
 
+    def _connection(self) -> sqlite3.Connection:
+        """Returns the calling thread's connection to the database. Do not close it."""
+        return ConnectionManager.for_database(self.db_path).connection()
+
+    @staticmethod
+    def delete_images(conn, paths) -> int:
+        """Deletes the images at ``paths`` together with their analysis results
+        and thumbnail levels. Does not commit.
+
+        Args:
+            conn (sqlite3.Connection): An open connection to the workspace database.
+            paths (Iterable[str]): The image paths to delete.
+
+        Returns:
+            int: The number of deleted images.
+        """
+        paths = list(paths)
+        deleted = 0
+        size = DatabaseManager.DELETE_BATCH_SIZE
+        for start in range(0, len(paths), size):
+            chunk = paths[start:start + size]
+            placeholders = ",".join("?" * len(chunk))
+            for table in DatabaseManager.IMAGE_CHILD_TABLES:
+                conn.execute(
+                    f"DELETE FROM {table} WHERE image_id IN "
+                    f"(SELECT id FROM images WHERE path IN ({placeholders}))", chunk
+                )
+            deleted += conn.execute(
+                f"DELETE FROM images WHERE path IN ({placeholders})", chunk
+            ).rowcount
+        return deleted
+
+    @staticmethod
+    def prune_orphans(conn) -> int:
+        """Deletes analysis results and thumbnail levels of images that no
+        longer exist. Does not commit.
+
+        Returns:
+            int: The number of deleted rows.
+        """
+        deleted = 0
+        for table in DatabaseManager.IMAGE_CHILD_TABLES:
+            deleted += conn.execute(
+                f"DELETE FROM {table} WHERE image_id NOT IN (SELECT id FROM images)"
+            ).rowcount
+        return deleted
+
+    @staticmethod
+    def compact(conn, time_budget: float = MAINTENANCE_TIME_BUDGET, convert: bool = False) -> bool:
+        """Returns free pages to the filesystem and refreshes planner statistics.
+
+        Free pages are released in small incremental vacuum steps until none
+        are left or ``time_budget`` is spent, so the database file shrinks
+        along with the library without blocking for long. ANALYZE runs with
+        a sampling limit if time remains.
+
+        Args:
+            conn (sqlite3.Connection): An open connection without a pending transaction.
+            time_budget (float): Seconds to spend at most, give or take one step.
+            convert (bool): Switch databases created without incremental
+                auto-vacuum over with a full VACUUM, which is not bounded by
+                ``time_budget``.
+
+        Returns:
+            bool: True if all free pages were released and statistics updated.
+        """
+        deadline = time.monotonic() + time_budget
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2: # INCREMENTAL
+            if not convert:
+                return False
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+            logger.info("Converted workspace database to incremental auto-vacuum")
+
+        while conn.execute("PRAGMA freelist_count").fetchone()[0]:
+            if time.monotonic() >= deadline:
+                break
+            conn.execute(f"PRAGMA incremental_vacuum({DatabaseManager.VACUUM_STEP_PAGES})").fetchall()
+        # In WAL mode, the file only shrinks once the log is written back
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+
+        if time.monotonic() >= deadline:
+            return False
+        conn.execute(f"PRAGMA analysis_limit = {DatabaseManager.ANALYSIS_LIMIT}")
+        conn.execute("ANALYZE")
+        conn.commit()
+        return True
+
+    def run_maintenance(self, time_budget: float = None) -> dict:
+        """Prunes the workspace database on demand and shrinks it.
+
+        Images whose files no longer exist are deleted with their analysis
+        results and thumbnail levels, orphaned rows are dropped and the
+        thumbnail pack and database are compacted. Unlike the pass that
+        follows every full scan, this checks every indexed path and converts
+        databases created without incremental auto-vacuum.
+
+        Args:
+            time_budget (float, optional): Seconds the incremental vacuum may
+                take. Defaults to ``MAINTENANCE_TIME_BUDGET``.
+
+        Returns:
+            dict: ``removed_paths`` (list[str]), ``orphans`` (int) and
+            ``bytes_freed`` (int, database and thumbnail pack).
+        """
+        if time_budget is None:
+            time_budget = self.MAINTENANCE_TIME_BUDGET
+        pack = ThumbnailPack.for_database(self.db_path)
+        before = os.path.getsize(self.db_path) + pack.size()
+        conn = self._connection()
+        try:
+            removed = sorted(
+                path for path, in conn.execute("SELECT path FROM images")
+                if not path_exists(path, follow_symlinks=False)
+            )
+            self.delete_images(conn, removed)
+            orphans = self.prune_orphans(conn)
+            conn.commit()
+            try:
+                pack.compact_if_needed(conn)
+            except Exception as e:
+                logger.warning(f"Failed to compact thumbnail pack: {e}")
+            self.compact(conn, time_budget, convert=True)
+        except Exception:
+            conn.rollback()
+            raise
+        freed = before - os.path.getsize(self.db_path) - pack.size()
+        logger.info(f"Workspace maintenance removed {len(removed)} images and "
+                    f"{orphans} orphaned rows, freed {freed} bytes")
+        return {"removed_paths": removed, "orphans": orphans, "bytes_freed": freed}
+
     def get_numeric_metrics(self) -> list[str]:
         """
         Returns a list of keys (from images table or analysis_results) that contain numeric values.
@@ -92,11 +345,15 @@ class DatabaseManager:
         Returns:
             list[str]: A list of metric keys that can be used for numeric sorting.
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self._connection().cursor()
         
         # Start with standard numeric columns from the images table
         numeric_keys = ["file_size", "modified_at"]
+        for key, expression in self.IMAGE_METRICS.items():
+            if key not in numeric_keys:
+                cursor.execute(f"SELECT 1 FROM images WHERE {expression} IS NOT NULL LIMIT 1")
+                if cursor.fetchone():
+                    numeric_keys.append(key)
         
         # Get unique keys from analysis_results
         try:
@@ -110,14 +367,14 @@ class DatabaseManager:
                 if row:
                     try:
                         float(row[0])
-                        numeric_keys.append(key)
+                        if key not in numeric_keys:
+                            numeric_keys.append(key)
                     except (ValueError, TypeError):
                         pass
         except sqlite3.OperationalError:
             # Table might not exist yet
             pass
-        
-        conn.close()
+
         return numeric_keys
 
     def get_metric_values(self, metric_key: str) -> dict[str, float]:
@@ -130,14 +387,21 @@ class DatabaseManager:
         Returns:
             dict[str, float]: A dictionary mapping file paths to numeric values.
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self._connection().cursor()
         results = {}
         
         if metric_key in ["file_size", "modified_at"]:
             cursor.execute(f"SELECT path, {metric_key} FROM images")
             for path, val in cursor.fetchall():
                 results[path] = float(val) if val is not None else 0.0
+        elif metric_key in self.IMAGE_METRICS:
+            # Images whose header could not be read have no value
+            expression = self.IMAGE_METRICS[metric_key]
+            cursor.execute(
+                f"SELECT path, {expression} FROM images WHERE {expression} IS NOT NULL"
+            )
+            for path, val in cursor.fetchall():
+                results[path] = float(val)
         else:
             cursor.execute("""
                 SELECT images.path, analysis_results.result_value 
@@ -150,8 +414,7 @@ class DatabaseManager:
                     results[path] = float(val)
                 except (ValueError, TypeError):
                     pass
-        
-        conn.close()
+
         return results
 
     def get_image_metadata(self, path: str) -> dict:
@@ -164,22 +427,34 @@ class DatabaseManager:
         Returns:
             dict: A dictionary of metadata keys and values.
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self._connection().cursor()
         
         # Get basic info from images table
-        cursor.execute("SELECT id, filename, file_size, modified_at FROM images WHERE path = ?", (path,))
+        cursor.execute(
+            """SELECT id, filename, file_size, modified_at, thumbnail_source,
+            width, height, format, frame_count, taken_at FROM images WHERE path = ?""",
+            (path,)
+        )
         row = cursor.fetchone()
         if not row:
-            conn.close()
             return {}
             
-        img_id, filename, size, modified = row
+        img_id, filename, size, modified, thumb_source, width, height, fmt, frames, taken_at = row
         metadata = {
             "Filename": filename,
             "Size": f"{size / 1024:.2f} KB" if size else "Unknown",
             "Modified": modified
         }
+        if width and height:
+            metadata["Dimensions"] = f"{width} x {height} ({width * height / 1e6:.1f} MP)"
+        if fmt:
+            metadata["Format"] = fmt
+        if frames and frames > 1:
+            metadata["Frames"] = frames
+        if taken_at is not None:
+            metadata["Taken"] = datetime.fromtimestamp(taken_at).isoformat(sep=" ")
+        if thumb_source:
+            metadata["Thumbnail Source"] = thumb_source
         
         # Get analysis results
         cursor.execute("SELECT result_key, result_value FROM analysis_results WHERE image_id = ?", (img_id,))
@@ -190,6 +465,5 @@ class DatabaseManager:
                 metadata[key] = f"{f_val:.4f}" if "." in val else val
             except (ValueError, TypeError):
                 metadata[key] = val
-                
-        conn.close()
+
         return metadata
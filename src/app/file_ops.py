@@ -1,6 +1,7 @@
 import os
-import shutil
 import sys
+import shutil
+import hashlib
 
 def hide_file(path):
     """
@@ -19,6 +20,63 @@ def hide_file(path):
         return bool(success)
     return True
 
+def content_fingerprint(path, size=None, block_size=64 * 1024):
+    """
+    Returns a fast content fingerprint of a file.
+
+    Only the first, middle and last ``block_size`` bytes are hashed, together
+    with the file size, so the cost does not grow with the file. Identical
+    files always match; distinct files of the same size that only differ
+    outside the sampled blocks would collide, which is acceptable for
+    thumbnail reuse.
+
+    Args:
+        path (str): The file to fingerprint.
+        size (int, optional): The file size if already known.
+        block_size (int): Bytes hashed per sampled block.
+
+    Returns:
+        str: The fingerprint, or None if the file could not be read.
+    """
+    try:
+        with open(path, "rb") as f:
+            if size is None:
+                size = os.fstat(f.fileno()).st_size
+            if size <= 3 * block_size:
+                return fingerprint_data(f.read(), size, block_size)
+            blocks = []
+            for offset in _fingerprint_offsets(size, block_size):
+                f.seek(offset)
+                blocks.append(f.read(block_size))
+    except OSError:
+        return None
+    return _fingerprint(size, blocks)
+
+def fingerprint_data(data, size=None, block_size=64 * 1024):
+    """
+    Returns ``content_fingerprint`` of a file whose content is already in memory.
+
+    Args:
+        data (bytes | mmap.mmap): The whole file content.
+        size (int, optional): ``len(data)`` if None.
+        block_size (int): Bytes hashed per sampled block.
+    """
+    if size is None:
+        size = len(data)
+    if size <= 3 * block_size:
+        return _fingerprint(size, [data[:size]])
+    return _fingerprint(size, [data[offset:offset + block_size]
+                               for offset in _fingerprint_offsets(size, block_size)])
+
+def _fingerprint_offsets(size, block_size):
+    return (0, (size - block_size) // 2, size - block_size)
+
+def _fingerprint(size, blocks):
+    digest = hashlib.blake2b(digest_size=16)
+    for block in blocks:
+        digest.update(block)
+    return f"{size:x}-{digest.hexdigest()}"
+
 class FileManager:
     """Provides utilities for safe file operations, including conflict resolution."""
 
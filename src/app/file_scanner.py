@@ -1,98 +1,1524 @@
 import os
-import sqlite3
+import json
+import time
 import logging
-from PySide6.QtCore import QRunnable, QObject, Signal
+import threading
+import multiprocessing
+from concurrent.futures import (
+    ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED, ALL_COMPLETED
+)
+from PIL import Image
+from src.app.qt_compat import QRunnable, QObject, Signal
 from src.ui.thumbnail_gen import ThumbnailGenerator
+from src.app.thumb_store import ThumbnailPack, ThumbnailPyramid
+from src.app.global_cache import GlobalThumbnailCache, CacheLookup
+from src.app.file_ops import content_fingerprint
+from src.app.database import DatabaseManager
+from src.app.connections import open_connection
+from src.app.scan_rules import ScanRules
+from src.app.ingest import ingest_file, prefetch, read_header, pixel_count
+from src.app.archives import (
+    is_archive, member_path, container_of, path_exists, list_members,
+    MEMBER_SEPARATOR
+)
+from src.app.io_tuning import ConcurrencyTuner, storage_class, timed_call, STORAGE_HDD
 
 logger = logging.getLogger(__name__)
 
 class ScannerSignals(QObject):
     """Signals for the FolderScanner."""
-    file_found = Signal(str, bytes) # path, thumbnail_bytes
+    files_found = Signal(list) # batch of (path, thumbnail bytes, memoryview or None (placeholder))
+    files_removed = Signal(list) # paths no longer on disk
     finished = Signal()
+    cancelled = Signal()
     error = Signal(str)
 
 class FolderScanner(QRunnable):
     """
     Worker thread for recursively scanning a folder for image files.
+
+    Discovery and database access always happen on the scanner thread. When
+    ``max_workers`` is greater than one, thumbnail decoding/encoding is fanned
+    out to a process pool and results are emitted in completion order.
+    Directory listings are fetched ahead of the walk by ``listing_workers``
+    threads.
+
+    How many thumbnail jobs run at once is tuned while scanning (see
+    ``ConcurrencyTuner``) from the measured time and size of each job. On
+    spinning disks (``storage``, detected if None) tuning starts from a
+    single reader, fewer directories are listed at once and the files of
+    each directory are read in inode order, which approximates their
+    physical order.
+
+    Scans can be paused, resumed and cancelled from any thread. These are
+    cooperative: the scanner checks for them between files and directories.
+    A cancelled scan emits ``cancelled`` instead of ``finished`` and discards
+    results that have not been delivered yet.
+
+    Thumbnails are stored in the workspace's ``ThumbnailPack``; cached ones
+    are emitted as ``memoryview`` slices of the mapped pack. With
+    ``global_cache_dir`` set, thumbnails are looked up by content in the
+    ``GlobalThumbnailCache`` before generating them and stored there as
+    well, so identical images are only decoded once across workspaces.
+
+    Files that were moved or renamed are recognized by their (device, inode)
+    with unchanged size and mtime, or failing that by their content
+    fingerprint. Their existing row is rewritten to the new path, so the
+    thumbnail and analysis results carry over without decoding anything.
+
+    Which directories are entered and which files are indexed is decided by
+    the workspace's ``ScanRules``. Directories and files reached twice
+    through symlinks or hard links are walked once.
+
+    Images too large to decode within the decode budget (see
+    ``_pixel_budget``) do not hold up the rest of the folder: they are
+    emitted with an empty thumbnail as a placeholder right away, and decoded
+    once everything else has been published. Those that still cannot be
+    decoded, like decompression bombs Pillow refuses, are indexed as
+    ``SOURCE_UNDECODABLE`` and keep their placeholder. With a process pool,
+    decodes running longer than ``DECODE_SECONDS`` stop counting against the
+    queue limit, so the other workers are kept busy meanwhile.
+
+    With ``snapshot`` set, the indexed images are emitted straight from the
+    database before the walk, which then only emits what changed (see
+    ``_emit_snapshot``). Scans resuming an interrupted one always do this.
     """
     SUPPORTED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp'}
+    # Number of queued thumbnail jobs allowed per worker process. Keeps every
+    # worker busy without holding the whole tree's futures in memory.
+    QUEUE_DEPTH = 4
+    # Number of cache hits whose thumbnails are fetched per query.
+    HIT_BATCH_SIZE = 256
+    # ``files_found`` is emitted once this many results are buffered, or once
+    # the oldest buffered result is BATCH_INTERVAL seconds old.
+    BATCH_SIZE = 256
+    BATCH_INTERVAL = 0.03
+    # Seconds between two scan journal checkpoints
+    JOURNAL_INTERVAL = 5.0
+    # Coarsest directory mtime resolution expected (FAT, some SMB servers).
+    # Entries added this long after a listing may leave the mtime unchanged.
+    MTIME_GRANULARITY_NS = 2_000_000_000
+    # Directories listed concurrently by default, and how many upcoming
+    # directories are queued per listing thread
+    DEFAULT_LISTING_WORKERS = 8
+    LISTING_LOOKAHEAD = 4
+    # Directories listed concurrently on spinning disks
+    HDD_LISTING_WORKERS = 2
+    # Decode budget: images are decoded in walk order as long as they have
+    # at most MAX_DECODE_PIXELS pixels and, at the decode rate measured so
+    # far, take at most DECODE_SECONDS. Images with MIN_DECODE_PIXELS or
+    # fewer are never deferred.
+    MAX_DECODE_PIXELS = 64_000_000
+    MIN_DECODE_PIXELS = 16_000_000
+    DECODE_SECONDS = 2.0
+    # Decoded images needed before the measured decode rate is trusted
+    DECODE_RATE_SAMPLES = 8
+    # Seconds between checks for overdue decodes while waiting on the pool
+    DECODE_POLL_INTERVAL = 0.25
+    # Thumbnail source of images indexed without a thumbnail because even
+    # their deferred decode failed
+    SOURCE_UNDECODABLE = "undecodable"
 
-    def __init__(self, folder_path, db_path=None):
+    def __init__(self, folder_path, db_path=None, max_workers=1, incremental=False,
+                 thumbnail_quality=ThumbnailGenerator.QUALITY_FAST,
+                 use_embedded_thumbnails=False,
+                 thumbnail_encoding=ThumbnailGenerator.ENCODING_JPEG,
+                 global_cache_dir=None, global_cache_max_bytes=None, snapshot=False,
+                 rules=None, listing_workers=DEFAULT_LISTING_WORKERS, storage=None):
         super().__init__()
         self.folder_path = folder_path
         self.db_path = db_path
+        self.max_workers = max(1, int(max_workers or 1))
+        self.listing_workers = max(1, int(listing_workers or 1))
+        # Storage class of the folder (see io_tuning); detected if None
+        self.storage = storage
+        self._inode_order = False
+        self._tuner = ConcurrencyTuner(1, self.max_workers)
+        self.incremental = incremental
+        # Emit the indexed images before walking the filesystem
+        self.snapshot = snapshot
+        # ScanRules; loaded from the workspace database if None
+        self.rules = rules
+        self.thumbnail_quality = thumbnail_quality
+        self.use_embedded_thumbnails = use_embedded_thumbnails
+        self.thumbnail_encoding = thumbnail_encoding
+        self.global_cache_dir = global_cache_dir
+        self.global_cache_max_bytes = global_cache_max_bytes
+        self._global_cache = None
+        # Handed to ingest_file while the global cache is open
+        self._cache_lookup = None
+        self._cache_variant = GlobalThumbnailCache.variant(
+            ThumbnailGenerator.THUMBNAIL_SIZE, thumbnail_quality,
+            use_embedded_thumbnails, thumbnail_encoding
+        )
+        # Whether unchanged (cache hit) images are emitted as well.
+        self.emit_cached = True
+        # Whether progress is checkpointed in the scan journal
+        self.journal = True
+        # Whether this scan continues one that was interrupted
+        self.resumed = False
+        self._journal_written = 0.0
+        self._pending_dirs = None
+        self._batch = []
+        self._batch_started = 0.0
+        self._cancel_event = threading.Event()
+        self._resume_event = threading.Event()
+        self._resume_event.set()
         self.signals = ScannerSignals()
         self.thumbnail_gen = ThumbnailGenerator()
+        self._pack = None
+        # Images over the decode budget: path -> (stats, content_key)
+        self._deferred = {}
+        # Pool jobs seen running: future -> when first seen
+        self._job_started = {}
+        self._overdue = set()
+        self._decoded_pixels = 0
+        self._decode_seconds = 0.0
+        self._decode_samples = 0
+        self.removed_paths = []
+        # Directories and archives holding images that failed to ingest
+        self._failed_dirs = set()
+        # Images whose thumbnail was generated or taken from the global
+        # cache rather than the workspace's pack
+        self.generated_count = 0
 
     def run(self):
         logger.info(f"Starting scan for folder: {self.folder_path}")
         conn = None
         if self.db_path:
             try:
-                conn = sqlite3.connect(self.db_path)
+                conn = open_connection(self.db_path)
+                self._pack = ThumbnailPack.for_database(self.db_path)
                 logger.debug(f"Connected to database at {self.db_path}")
             except Exception as e:
                 logger.error(f"Failed to connect to database: {e}")
-        
+        if conn and self.global_cache_dir:
+            try:
+                self._global_cache = GlobalThumbnailCache.for_directory(
+                    self.global_cache_dir, self.global_cache_max_bytes
+                )
+                self._cache_lookup = CacheLookup(self.global_cache_dir, self._cache_variant)
+            except Exception as e:
+                logger.warning(f"Global thumbnail cache unavailable: {e}")
+        if self.rules is None:
+            self.rules = ScanRules.load(conn) if conn else ScanRules()
+        self._tune_for_storage()
+
+        executor = None
         try:
+            if self.max_workers > 1:
+                # 'spawn' avoids forking a process that already runs Qt threads.
+                executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+                logger.info(f"Generating thumbnails with {self.max_workers} worker processes")
+
             count = 0
-            for root, _, files in os.walk(self.folder_path):
-                for file in files:
-                    ext = os.path.splitext(file)[1].lower()
-                    if ext in self.SUPPORTED_EXTENSIONS:
-                        file_path = os.path.join(root, file)
-                        logger.debug(f"Processing image: {file_path}")
-                        
-                        thumb_bytes = None
-                        stats = os.stat(file_path)
-                        if conn:
-                            # Check if already in DB and if it has changed
-                            try:
-                                cursor = conn.cursor()
-                                cursor.execute(
-                                    "SELECT thumbnail, file_size, modified_at FROM images WHERE path = ?", 
-                                    (file_path,)
-                                )
-                                row = cursor.fetchone()
-                                if row and row[0]:
-                                    db_thumb, db_size, db_mtime = row
-                                    if db_size == int(stats.st_size) and db_mtime == int(stats.st_mtime):
-                                        logger.debug(f"Loading thumbnail from cache for {file}")
-                                        thumb_bytes = db_thumb
-                            except Exception as db_e:
-                                logger.warning(f"Database read error for {file}: {db_e}")
-                        
-                        if not thumb_bytes:
-                            logger.debug(f"Generating new thumbnail for {file}")
-                            thumb_bytes = self.thumbnail_gen.generate(file_path)
-                            if thumb_bytes and conn:
-                                try:
-                                    # Save to DB
-                                    filename = os.path.basename(file_path)
-                                    cursor = conn.cursor()
-                                    cursor.execute(
-                                        """INSERT OR REPLACE INTO images 
-                                        (path, filename, file_size, modified_at, thumbnail) 
-                                        VALUES (?, ?, ?, ?, ?)""",
-                                        (file_path, filename, int(stats.st_size), 
-                                         int(stats.st_mtime), thumb_bytes)
-                                    )
-                                    conn.commit()
-                                except Exception as db_e:
-                                    logger.warning(f"Database write error for {file}: {db_e}")
-                        
-                        if thumb_bytes:
-                            self.signals.file_found.emit(file_path, thumb_bytes)
-                            count += 1
+            seeded = set()
+            self._pending_dirs = self._load_journal(conn)
+            self.resumed = self._pending_dirs is not None
+            if conn and self.emit_cached and (self.snapshot or self.resumed):
+                count += self._emit_snapshot(conn, seeded)
+
+            index = self._load_index(conn)
+            dir_index = self._load_dir_index(conn)
+            pending = {}
+            hits = []
+            self._seen_paths = set()
+            self._index_moves(index)
+            file_ids = []
+            headerless = []
+            self._journal_written = time.monotonic()
+            for file_path, stats in self._discover(index, dir_index):
+                if not self._checkpoint():
+                    break
+                if file_path is None:
+                    # Directory boundary, ``stats`` holds the directories left
+                    count += self._write_journal(conn, hits, executor, pending, stats)
+                    continue
+                self._seen_paths.add(file_path)
+                entry = index.get(file_path)
+                if (entry and entry[0] == stats[0] and entry[1] == stats[1]
+                        and (len(stats) < 5 or self._member_crcs.get(file_path) == stats[4])):
+                    if entry[4] is None and stats[3]:
+                        file_ids.append((stats[2], stats[3], entry[2])) # indexed before
+                    if file_path in self._headerless:
+                        headerless.append((entry[2], file_path))
+                    if not self.emit_cached or file_path in seeded:
+                        continue
+                    hits.append((entry[2], file_path, stats))
+                else:
+                    content_key = None
+                    if conn and stats[0] in self._content_sizes:
+                        # Could be a moved copy of an indexed image (fingerprints
+                        # include the size, so only same-sized files can match)
+                        content_key = content_fingerprint(file_path, stats[0])
+                    moved = None
+                    if entry is None and conn and len(stats) < 5:
+                        moved = self._adopt_moved(conn, index, file_path, stats, content_key)
+                    if moved is None:
+                        copy = self._stored_copy(conn, content_key)
+                        if copy is not None:
+                            # A copy of an indexed image: reuse its thumbnail
+                            count += self._publish(conn, file_path, stats, copy,
+                                                   content_key=content_key, reused=True)
                         else:
-                            logger.warning(f"No thumbnail generated for {file_path}")
-            
+                            count += self._generate(conn, executor, pending, file_path,
+                                                    stats, content_key)
+                        continue
+                    # Moved files are new to the gallery, even when refreshing
+                    hits.append((moved[2], file_path, stats))
+                if len(hits) >= self.HIT_BATCH_SIZE:
+                    count += self._flush_hits(conn, hits, executor, pending)
+
+            if hits and not self.is_cancelled:
+                count += self._flush_hits(conn, hits, executor, pending)
+            if pending and not self.is_cancelled:
+                count += self._drain(conn, pending, ALL_COMPLETED)
+            if self._deferred and not self.is_cancelled:
+                count += self._generate_deferred(conn, executor, pending)
+            if self.is_cancelled:
+                logger.info(f"Scan cancelled for folder: {self.folder_path}")
+                self._batch = []
+                self.signals.cancelled.emit()
+                return
+            self._flush_batch()
+            if conn and file_ids:
+                conn.executemany("UPDATE images SET device = ?, inode = ? WHERE id = ?", file_ids)
+                conn.commit()
+            if conn and headerless:
+                self._backfill_headers(conn, headerless)
+            self._finish_scan(conn, index, dir_index)
+
             logger.info(f"Scan finished. Found {count} images.")
+            if self._tuner.reads:
+                logger.info(f"Thumbnail jobs on {self.storage} storage: "
+                            f"{self._tuner.mean_latency() * 1000:.1f} ms each, "
+                            f"{self.read_concurrency} concurrent at the end")
             self.signals.finished.emit()
         except Exception as e:
             logger.exception(f"Unexpected error during scan: {e}")
             self.signals.error.emit(str(e))
+        finally:
+            if executor:
+                executor.shutdown(wait=True, cancel_futures=True)
+            if conn:
+                conn.close()
+
+    def cancel(self):
+        """Requests the scan to stop as soon as possible."""
+        self._cancel_event.set()
+        self._resume_event.set()
+
+    def pause(self):
+        """Suspends the scan at the next file or directory boundary."""
+        self._resume_event.clear()
+
+    def resume(self):
+        """Continues a paused scan."""
+        self._resume_event.set()
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    @property
+    def is_paused(self) -> bool:
+        return not self._resume_event.is_set()
+
+    @property
+    def read_concurrency(self) -> int:
+        """The number of thumbnail jobs currently allowed to run at once."""
+        return self._tuner.limit
+
+    def _tune_for_storage(self):
+        """Adapts listing, read order and read concurrency to the storage class."""
+        if self.storage is None:
+            self.storage = storage_class(self.folder_path)
+        hdd = self.storage == STORAGE_HDD
+        self._inode_order = hdd
+        if hdd:
+            self.listing_workers = min(self.listing_workers, self.HDD_LISTING_WORKERS)
+        self._tuner = ConcurrencyTuner(1, self.max_workers,
+                                       initial=1 if hdd else self.max_workers)
+        logger.debug(f"Scanning {self.storage} storage, starting with "
+                     f"{self._tuner.limit} concurrent thumbnail jobs")
+
+    def _queue_limit(self) -> int:
+        """Returns how many thumbnail jobs may be queued on the process pool."""
+        limit = self._tuner.limit
+        if limit < self.max_workers:
+            # Fewer queued jobs than processes caps how many run at once
+            return limit
+        return self.max_workers * self.QUEUE_DEPTH
+
+    def _checkpoint(self):
+        """Blocks while the scan is paused, and delivers the buffered batch once it is due.
+
+        Called for every directory and image the walk reaches, so results
+        are not held back while slow listings yield nothing new.
+
+        Returns:
+            bool: False once the scan has been cancelled, otherwise True.
+        """
+        if self._batch_timeout() == 0:
+            self._flush_batch()
+        if not self._resume_event.is_set():
+            # Deliver what we have before going idle
+            self._flush_batch()
+            self._resume_event.wait()
+        return not self._cancel_event.is_set()
+
+    def _discover(self, index, dir_index):
+        """Yields ``(path, (file_size, modified_at, device, inode))`` for every supported image.
+
+        The tree is walked top-down with ``os.scandir``. In incremental mode, a
+        directory whose mtime matches the persisted directory index has not
+        gained, lost or renamed entries, so its cached listing is reused and
+        neither the directory nor its files are listed or stat'ed again.
+        In-place edits that keep a file's name are then only picked up once
+        their directory changes. Directories modified within
+        ``MTIME_GRANULARITY_NS`` of their listing, and those holding images
+        that failed to ingest, are recorded without an mtime and always
+        listed again.
+
+        Every visited directory is recorded in ``self.visited_dirs`` so the
+        index can be refreshed once the scan completes, and every listed
+        subdirectory ``_should_descend`` declined in ``self.skipped_dirs``. When a journal
+        checkpoint is due, ``(None, directories_left)`` is yielded between
+        two directories; all directories visited before it have been yielded
+        completely.
+
+        Args:
+            index (dict): The image cache index from ``_load_index``.
+            dir_index (dict): The directory index from ``_load_dir_index``.
+        """
+        self.visited_dirs = {}
+        self.skipped_dirs = set()
+        yield from self._walk([self.folder_path], index, dir_index)
+
+    def _walk(self, roots, index, dir_index):
+        """Walks ``roots`` top-down, yielding supported images (see ``_discover``).
+
+        With ``listing_workers`` above one, the directories next in line are
+        listed ahead of time on a thread pool (see ``_list_directory``), so
+        on high-latency filesystems many listings are in flight at once.
+        Results are still consumed, and images yielded, in walk order.
+        """
+        files_by_dir = {}
+        subdirs_by_dir = {}
+        if self.incremental and dir_index:
+            for path, (size, mtime, _, device, inode, _) in index.items():
+                files_by_dir.setdefault(container_of(path), []).append(
+                    (path, (size, mtime, device, inode))
+                )
+            for path, (parent, _, _) in dir_index.items():
+                subdirs_by_dir.setdefault(parent, []).append(path)
+            # Directories an interrupted scan had queued but not listed yet
+            for path in self._pending_dirs or ():
+                siblings = subdirs_by_dir.setdefault(os.path.dirname(path), [])
+                if path not in siblings and path != self.folder_path:
+                    siblings.append(path)
+
+        rules = self.rules
+        # (device, inode) of everything walked, to skip symlink loops and
+        # hard-linked or symlinked duplicates
+        dir_ids = set()
+        file_ids = set()
+        stack = list(reversed(roots))
+        lister = None
+        if self.listing_workers > 1:
+            lister = ThreadPoolExecutor(self.listing_workers, thread_name_prefix="scan-list")
+        listings = {}
+        try:
+            while stack and self._checkpoint():
+                if self._journal_due():
+                    yield None, list(stack)
+                if lister is not None:
+                    self._prefetch(lister, listings, stack, dir_index)
+                directory = stack.pop()
+                is_root = directory == self.folder_path
+                try:
+                    future = listings.pop(directory, None)
+                    if future is not None:
+                        st, listing = future.result()
+                    else:
+                        st, listing = self._list_directory(directory, dir_index.get(directory))
+                except OSError as e:
+                    if is_root:
+                        raise
+                    logger.warning(f"Skipping unreadable directory {directory}: {e}")
+                    continue
+                if (st.st_dev, st.st_ino) in dir_ids:
+                    logger.debug(f"Skipping directory or archive already walked: {directory}")
+                    continue
+                dir_ids.add((st.st_dev, st.st_ino))
+
+                if listing is None:
+                    logger.debug(f"Directory unchanged, reusing listing: {directory}")
+                    self.visited_dirs[directory] = dir_index[directory]
+                    files = sorted(files_by_dir.get(directory, ()))
+                    if self._inode_order:
+                        files.sort(key=lambda item: item[1][3] or 0)
+                    for file_path, stats in files:
+                        if not rules.accepts_file(self._relative(file_path), stats[0]):
+                            continue
+                        if stats[3]:
+                            if (stats[2], stats[3]) in file_ids:
+                                continue
+                            file_ids.add((stats[2], stats[3]))
+                        yield file_path, stats
+                    stack.extend(sorted(
+                        (path for path in subdirs_by_dir.get(directory, ())
+                         if not rules.excludes_dir(self._relative(path))),
+                        reverse=True
+                    ))
+                    continue
+
+                entry_count, entries = listing
+                parent = None if is_root else os.path.dirname(directory)
+                mtime = st.st_mtime_ns
+                if time.time_ns() - mtime < self.MTIME_GRANULARITY_NS:
+                    # Racy: changes right after the listing could keep this
+                    # mtime, so the next incremental scan lists it again
+                    mtime = None
+                self.visited_dirs[directory] = (parent, mtime, entry_count)
+                subdirs = []
+                files = []
+                for path, is_dir, file_st in entries:
+                    if is_dir:
+                        if rules.excludes_dir(self._relative(path)):
+                            continue
+                        if self._should_descend(path, dir_index):
+                            subdirs.append(path)
+                        else:
+                            self.skipped_dirs.add(path)
+                    elif isinstance(file_st, OSError):
+                        logger.warning(f"Cannot stat {path}: {file_st}")
+                        # Unreadable this time, not gone: keep its row, as for
+                        # images in directories that could not be listed
+                        self._seen_paths.add(path)
+                    else:
+                        files.append((path, file_st))
+                if self._inode_order:
+                    files.sort(key=lambda item: item[1].st_ino or 0)
+                for path, file_st in files:
+                    if not rules.accepts_file(self._relative(path), file_st.st_size):
+                        continue
+                    stats = (int(file_st.st_size), int(file_st.st_mtime),
+                             file_st.st_dev, file_st.st_ino)
+                    if file_st.st_ino is None:
+                        # Archive member, identified by its checksum
+                        stats += (file_st.crc,)
+                    elif file_st.st_ino:
+                        # Zero on Windows, where DirEntry.stat() has no inodes
+                        if (file_st.st_dev, file_st.st_ino) in file_ids:
+                            logger.debug(f"Skipping duplicate link: {path}")
+                            continue
+                        file_ids.add((file_st.st_dev, file_st.st_ino))
+                    logger.debug(f"Processing image: {path}")
+                    yield path, stats
+                stack.extend(reversed(subdirs))
+        finally:
+            if lister is not None:
+                lister.shutdown(wait=False, cancel_futures=True)
+
+    def _prefetch(self, lister, listings, stack, dir_index):
+        """Starts listing the directories that are next on ``stack``."""
+        lookahead = self.listing_workers * self.LISTING_LOOKAHEAD
+        for directory in stack[:-lookahead - 1:-1]:
+            if directory not in listings:
+                listings[directory] = lister.submit(
+                    self._list_directory, directory, dir_index.get(directory)
+                )
+
+    def _list_directory(self, directory, cached):
+        """Stats and lists one directory. Runs on the listing pool if there is one.
+
+        Every filesystem round trip of a directory happens here: its stat,
+        the listing and the stat of each candidate image. Entry types come
+        from the ``DirEntry`` cache, so subdirectories cost nothing extra.
+
+        Archives are listed like directories, and appear in their parent's
+        listing as subdirectories. Their cached listing stays valid while
+        both their mtime and size are unchanged.
+
+        Args:
+            directory (str): The directory or archive to list.
+            cached: Its directory index record, or None.
+
+        Returns:
+            tuple: The directory's ``os.stat_result`` and, unless its cached
+            listing is still valid (None), ``(entry_count, entries)`` where
+            ``entries`` holds ``(path, is_dir, stat_result or OSError)`` of
+            every subdirectory, archive and candidate image, sorted by name.
+            For archives, ``entry_count`` is the archive size and the stat
+            results are ``ArchiveMember``.
+        """
+        st = os.stat(directory)
+        archive = is_archive(directory)
+        if (self.incremental and cached and cached[1] == st.st_mtime_ns
+                and (not archive or cached[2] == st.st_size)):
+            return st, None
+        rules = self.rules
+        if archive:
+            return st, (st.st_size, [
+                (member_path(directory, name), False, member)
+                for name, member in list_members(directory, self.SUPPORTED_EXTENSIONS)
+                if rules.accepts_file(self._relative(member_path(directory, name)))
+            ])
+        with os.scandir(directory) as it:
+            entries = sorted(it, key=lambda e: e.name)
+        listing = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=rules.follow_symlinks):
+                    listing.append((entry.path, True, None))
+                elif is_archive(entry.name) and entry.is_file():
+                    listing.append((entry.path, True, None))
+                elif (os.path.splitext(entry.name)[1].lower() in self.SUPPORTED_EXTENSIONS
+                        and rules.accepts_file(self._relative(entry.path))):
+                    listing.append((entry.path, False, entry.stat()))
+            except OSError as e:
+                listing.append((entry.path, False, e))
+        return st, (len(entries), listing)
+
+    def _should_descend(self, path, dir_index):
+        """Returns whether the walk should enter the subdirectory ``path``."""
+        return True
+
+    def _relative(self, path):
+        """Returns ``path`` relative to the scanned folder, as matched by ``ScanRules``."""
+        rel = path[len(self.folder_path) + 1:]
+        return rel if os.sep == "/" else rel.replace(os.sep, "/")
+
+    def _journal_due(self):
+        """Returns whether a scan journal checkpoint should be written now."""
+        return (self.journal and self.db_path is not None
+                and time.monotonic() - self._journal_written >= self.JOURNAL_INTERVAL)
+
+    def _load_journal(self, conn):
+        """Returns the directories an interrupted scan of this folder had left.
+
+        Returns:
+            list[str]: The queued directories, or None if the last scan of
+            the folder completed (or journaling is off).
+        """
+        if not conn or not self.journal or not self.incremental:
+            return None
+        try:
+            row = conn.execute(
+                "SELECT pending FROM scan_journal WHERE root = ?", (self.folder_path,)
+            ).fetchone()
+            if row:
+                pending = json.loads(row[0])
+                logger.info(f"Resuming interrupted scan of {self.folder_path} "
+                            f"with {len(pending)} directories queued")
+                return pending
+        except Exception as db_e:
+            logger.warning(f"Failed to read scan journal: {db_e}")
+        return None
+
+    def _write_journal(self, conn, hits, executor, pending, directories_left):
+        """Checkpoints the scan so an interruption resumes from here.
+
+        Outstanding thumbnails are persisted first, so every directory visited
+        so far is complete. Those directories are recorded in the directory
+        index, which lets a resumed incremental scan reuse their listings, and
+        ``directories_left`` is stored as the queue still to walk. Directories
+        holding deferred images are not complete yet, so they are queued
+        again instead of recorded (see ``_dir_records`` for failed images).
+
+        Returns:
+            int: The number of images published while finishing outstanding work.
+        """
+        count = 0
+        if hits:
+            count += self._flush_hits(conn, hits, executor, pending)
+        if pending:
+            count += self._drain(conn, pending, ALL_COMPLETED)
+        self._journal_written = time.monotonic()
+        if not conn or self.is_cancelled:
+            return count
+        unfinished = {container_of(path) for path in self._deferred}
+        try:
+            conn.executemany(
+                """INSERT OR REPLACE INTO directories (path, parent, mtime_ns, entry_count)
+                VALUES (?, ?, ?, ?)""",
+                [record for record in self._dir_records() if record[0] not in unfinished]
+            )
+            now = time.time()
+            conn.execute(
+                """INSERT INTO scan_journal (root, pending, started_at, updated_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (root) DO UPDATE SET
+                pending = excluded.pending, updated_at = excluded.updated_at""",
+                (self.folder_path, json.dumps(directories_left + sorted(unfinished)), now, now)
+            )
+            conn.commit()
+            logger.debug(f"Scan checkpoint: {len(self.visited_dirs)} directories done, "
+                         f"{len(directories_left)} queued")
+        except Exception as db_e:
+            logger.warning(f"Failed to write scan journal: {db_e}")
+        return count
+
+    def _emit_snapshot(self, conn, seeded):
+        """Emits every indexed image of the folder before the walk starts.
+
+        Paths and thumbnails are streamed in path order from a single query,
+        so the gallery fills within moments however large the workspace is.
+        The walk then only emits deltas: emitted paths are added to
+        ``seeded`` and not emitted again unless they changed, and images that
+        turn out to be gone are reported through ``files_removed``. Images
+        whose thumbnail cannot be read here are left to the walk.
+
+        Returns:
+            int: The number of images emitted.
+        """
+        prefix = os.path.join(self.folder_path, "")
+        # Every path starting with ``prefix`` sorts below this bound
+        bound = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        count = 0
+        try:
+            cursor = conn.execute(
+                """SELECT path, thumb_offset, thumb_length, content_key, thumbnail_source
+                FROM images WHERE path >= ? AND path < ? ORDER BY path""", (prefix, bound)
+            )
+            while not self.is_cancelled:
+                rows = cursor.fetchmany(self.HIT_BATCH_SIZE)
+                if not rows:
+                    break
+                shared = {}
+                if self._global_cache is not None:
+                    keys = [key for _, _, length, key, _ in rows if key and not length]
+                    if keys:
+                        shared = self._global_cache.get_many(keys, self._cache_variant)
+                for path, offset, length, content_key, source in rows:
+                    if source == self.SOURCE_UNDECODABLE:
+                        seeded.add(path)
+                        count += self._publish(conn, path, None, (None, source), cached=True)
+                        continue
+                    if length:
+                        thumb_bytes = self._pack.read(offset, length)
+                    else:
+                        thumb_bytes = shared.get(content_key, (None, None))[0]
+                    if thumb_bytes is not None:
+                        seeded.add(path)
+                        count += self._publish(conn, path, None, (thumb_bytes, None), cached=True)
+        except Exception as db_e:
+            logger.warning(f"Failed to load the indexed snapshot: {db_e}")
+        self._flush_batch()
+        logger.debug(f"Emitted {count} indexed images before walking {self.folder_path}")
+        return count
+
+    def _load_dir_index(self, conn):
+        """Loads the persisted directory index.
+
+        Returns:
+            dict: Maps directory path to ``(parent, mtime_ns, entry_count)``.
+        """
+        dir_index = {}
+        if not conn:
+            return dir_index
+        try:
+            cursor = conn.execute("SELECT path, parent, mtime_ns, entry_count FROM directories")
+            for path, parent, mtime_ns, entry_count in cursor:
+                dir_index[path] = (parent, mtime_ns, entry_count)
+        except Exception as db_e:
+            logger.warning(f"Failed to load directory index: {db_e}")
+        return dir_index
+
+    def _finish_scan(self, conn, index, dir_index):
+        """Runs once discovery and thumbnail generation have completed.
+
+        Images that were not seen are deleted with their analysis results and
+        thumbnail levels and reported through ``files_removed``, as are the
+        old paths of moved images, which keep their row. Images that
+        could not be stat'ed, and images in directories that still exist but
+        could not be listed, are kept unless the scan rules exclude them. The
+        database is then pruned and compacted within
+        ``DatabaseManager.MAINTENANCE_TIME_BUDGET``.
+        """
+        stale = [path for path in dir_index if path not in self.visited_dirs]
+        self._save_dir_index(conn, stale)
+        if not conn:
+            return
+        if self.journal:
+            try:
+                conn.execute("DELETE FROM scan_journal WHERE root = ?", (self.folder_path,))
+                conn.commit()
+            except Exception as db_e:
+                logger.warning(f"Failed to clear scan journal: {db_e}")
+
+        prefix = os.path.join(self.folder_path, "")
+        unlisted = {}
+        removed_paths = []
+        for path in index:
+            if path in self._seen_paths or not path.startswith(prefix):
+                continue
+            directory = container_of(path)
+            if directory not in self.visited_dirs and not self.rules.excludes_path(
+                    self._relative(path)):
+                if directory not in unlisted:
+                    unlisted[directory] = path_exists(directory)
+                if unlisted[directory]:
+                    continue # Unreadable this time, not gone
+            removed_paths.append(path)
+        self.removed_paths = sorted(removed_paths)
+
+        try:
+            deleted = DatabaseManager.delete_images(conn, self.removed_paths)
+            orphans = DatabaseManager.prune_orphans(conn)
+            conn.commit()
+            if deleted or orphans:
+                logger.info(f"Pruned {deleted} vanished images and {orphans} orphaned rows")
+        except Exception as db_e:
+            logger.warning(f"Failed to prune stale images: {db_e}")
+        try:
+            self._pack.compact_if_needed(conn)
+        except Exception as e:
+            logger.warning(f"Failed to compact thumbnail pack: {e}")
+        try:
+            DatabaseManager.compact(conn, DatabaseManager.MAINTENANCE_TIME_BUDGET)
+        except Exception as db_e:
+            logger.warning(f"Failed to compact workspace database: {db_e}")
+
+        self._emit_removed()
+
+    def _emit_removed(self):
+        """Reports ``removed_paths`` and the old paths of moved images as gone."""
+        gone = self.removed_paths + [old_path for old_path, _ in self.moved_paths]
+        if gone:
+            self.signals.files_removed.emit(sorted(gone))
+
+    def _save_dir_index(self, conn, stale):
+        """Stores the directories seen by this scan and drops ``stale`` ones.
+
+        Only called after a complete scan, so a directory is never recorded
+        before all of its images have been persisted (see ``_dir_records``).
+        """
+        if not conn:
+            return
+        try:
+            conn.executemany("DELETE FROM directories WHERE path = ?", [(path,) for path in stale])
+            conn.executemany(
+                """INSERT OR REPLACE INTO directories (path, parent, mtime_ns, entry_count)
+                VALUES (?, ?, ?, ?)""",
+                self._dir_records()
+            )
+            conn.commit()
+        except Exception as db_e:
+            logger.warning(f"Failed to save directory index: {db_e}")
+
+    def _dir_records(self):
+        """Returns the ``directories`` rows of the visited directories.
+
+        Directories holding images that failed to ingest, such as a JPEG
+        still being copied, are stored without an mtime. The next
+        incremental scan then lists them again and retries those images,
+        which have no row of their own.
+        """
+        return [
+            (path, parent, None if path in self._failed_dirs else mtime, entry_count)
+            for path, (parent, mtime, entry_count) in self.visited_dirs.items()
+        ]
+
+    def _load_index(self, conn):
+        """Loads the freshness index of every indexed image in one query.
+
+        Only integer columns are read, so legacy thumbnail BLOBs stay on disk
+        until a cache hit actually needs them.
+
+        Returns:
+            dict: Maps path to
+            ``(file_size, modified_at, id, device, inode, content_key)``.
+        """
+        index = {}
+        # Indexed before image headers were recorded (see _backfill_headers)
+        self._headerless = set()
+        # CRC-32 of every indexed archive member
+        self._member_crcs = {}
+        if not conn:
+            return index
+        try:
+            cursor = conn.execute(
+                """SELECT path, file_size, modified_at, id, device, inode, content_key,
+                format IS NULL, member_crc FROM images"""
+            )
+            for path, *entry, headerless, member_crc in cursor:
+                index[path] = tuple(entry)
+                if headerless:
+                    self._headerless.add(path)
+                if member_crc is not None:
+                    self._member_crcs[path] = member_crc
+            logger.debug(f"Loaded cache index with {len(index)} entries")
+        except Exception as db_e:
+            logger.warning(f"Failed to load cache index: {db_e}")
+        return index
+
+    def _flush_hits(self, conn, hits, executor, pending):
+        """Fetches thumbnails for a batch of cache hits and emits them.
+
+        Hits whose stored thumbnail turns out to be missing are regenerated.
+        Thumbnails still stored as BLOBs by older versions are moved into the
+        pack. ``hits`` is cleared in place.
+
+        Returns:
+            int: The number of images published.
+        """
+        thumbs = {}
+        undecodable = set()
+        try:
+            ids = [img_id for img_id, _, _ in hits]
+            placeholders = ",".join("?" * len(ids))
+            cursor = conn.execute(
+                f"""SELECT id, thumb_offset, thumb_length, content_key,
+                CASE WHEN thumb_length IS NULL THEN thumbnail END, thumbnail_source
+                FROM images WHERE id IN ({placeholders})""", ids
+            )
+            shared = {}
+            for img_id, offset, length, content_key, legacy_blob, source in cursor:
+                if source == self.SOURCE_UNDECODABLE:
+                    undecodable.add(img_id)
+                elif legacy_blob:
+                    thumbs[img_id] = self._migrate_blob(conn, img_id, legacy_blob)
+                elif length is None and content_key and self._global_cache:
+                    shared[img_id] = content_key
+                else:
+                    thumbs[img_id] = self._pack.read(offset, length)
+            if shared:
+                found = self._global_cache.get_many(shared.values(), self._cache_variant)
+                for img_id, content_key in shared.items():
+                    thumb_bytes = found.get(content_key, (None, None))[0]
+                    if thumb_bytes is not None:
+                        # Written when workspaces only referenced the cache
+                        thumb_bytes = self._migrate_blob(conn, img_id, thumb_bytes)
+                    thumbs[img_id] = thumb_bytes
+        except Exception as db_e:
+            logger.warning(f"Database read error while loading cached thumbnails: {db_e}")
+
+        count = 0
+        for img_id, file_path, stats in hits:
+            thumb_bytes = thumbs.get(img_id)
+            if img_id in undecodable:
+                count += self._publish(conn, file_path, stats,
+                                       (None, self.SOURCE_UNDECODABLE), cached=True)
+            elif thumb_bytes is not None:
+                logger.debug(f"Loading thumbnail from cache for {file_path}")
+                count += self._publish(conn, file_path, stats, (thumb_bytes, None), cached=True)
+            else:
+                count += self._generate(conn, executor, pending, file_path, stats)
+        hits.clear()
+        return count
+
+    def _index_moves(self, index):
+        """Indexes known images by (device, inode) and by content fingerprint."""
+        self.moved_paths = []
+        self._adopted = set()
+        self._by_file_id = {}
+        self._by_content = {}
+        # Content fingerprint -> an indexed path whose thumbnail copies can share
+        self._copies = {}
+        self._content_sizes = set()
+        for path, (size, _, _, device, inode, content_key) in index.items():
+            if inode:
+                self._by_file_id[(device, inode)] = path
+            if content_key:
+                self._copies[content_key] = path
+            if content_key and path not in self._member_crcs:
+                # Archive members never move; their archive does
+                self._by_content.setdefault(content_key, []).append(path)
+                self._content_sizes.add(size)
+
+    def _adopt_moved(self, conn, index, file_path, stats, content_key):
+        """Rewrites the row of an indexed image that was moved to ``file_path``.
+
+        A known image matches if it has the same (device, inode), size and
+        mtime, or else the same content fingerprint, and its old path no
+        longer exists. Copies and hard links are therefore never adopted.
+
+        The old path is dropped from ``index``, so it is not counted as
+        removed once the scan finishes.
+
+        Returns:
+            tuple: The adopted index entry, or None if nothing matches.
+        """
+        size, mtime, device, inode = stats
+        candidates = []
+        old_path = self._by_file_id.get((device, inode)) if inode else None
+        if old_path:
+            entry = index.get(old_path)
+            if entry and entry[0] == size and entry[1] == mtime:
+                candidates.append(old_path)
+        if content_key:
+            candidates.extend(self._by_content.get(content_key, ()))
+
+        for old_path in candidates:
+            if old_path == file_path or old_path in self._seen_paths:
+                continue
+            if old_path in self._adopted or path_exists(old_path, follow_symlinks=False):
+                continue
+            entry = index[old_path]
+            try:
+                conn.execute(
+                    """UPDATE images SET path = ?, filename = ?, modified_at = ?,
+                    device = ?, inode = ?, content_key = COALESCE(?, content_key)
+                    WHERE id = ?""",
+                    (file_path, os.path.basename(file_path), mtime,
+                     device, inode, content_key, entry[2])
+                )
+                conn.commit()
+            except Exception as db_e:
+                logger.warning(f"Failed to record move of {old_path}: {db_e}")
+                return None
+            logger.info(f"Detected move: {old_path} -> {file_path}")
+            self.moved_paths.append((old_path, file_path))
+            self._adopted.add(old_path)
+            if entry[5] and self._copies.get(entry[5]) == old_path:
+                self._copies[entry[5]] = file_path
+            del index[old_path]
+            entry = (size, mtime, entry[2], device, inode, content_key or entry[5])
+            index[file_path] = entry
+            return entry
+        return None
+
+    def _backfill_headers(self, conn, images):
+        """Records the header properties of images indexed without them.
+
+        Headers are small, so this only reads the first blocks of each file,
+        on the listing threads.
+
+        Args:
+            images (list[tuple[int, str]]): ``(id, path)`` of each image.
+        """
+        logger.info(f"Reading the headers of {len(images)} indexed images")
+        with ThreadPoolExecutor(self.listing_workers, thread_name_prefix="scan-header") as pool:
+            for start in range(0, len(images), self.BATCH_SIZE):
+                if not self._checkpoint():
+                    return
+                chunk = images[start:start + self.BATCH_SIZE]
+                headers = pool.map(read_header, [path for _, path in chunk])
+                rows = [self._header_values(header) + (img_id,)
+                        for (img_id, _), header in zip(chunk, headers)]
+                try:
+                    conn.executemany(
+                        """UPDATE images SET width = ?, height = ?, format = ?,
+                        frame_count = ?, taken_at = ? WHERE id = ?""", rows
+                    )
+                    conn.commit()
+                except Exception as db_e:
+                    logger.warning(f"Failed to store image headers: {db_e}")
+                    return
+
+    @staticmethod
+    def _header_values(header):
+        """Returns the images columns holding ``header`` (see ``ingest.read_header``)."""
+        if not header:
+            # Unreadable: an empty format keeps it from being read again
+            return None, None, "", None, None
+        return (header["width"], header["height"], header["format"] or "",
+                header["frame_count"], header["taken_at"])
+
+    def _migrate_blob(self, conn, img_id, blob):
+        """Moves a thumbnail stored in the images table or the global cache into the pack."""
+        try:
+            with self._pack.lock:
+                offset = self._pack.append(blob)
+                conn.execute(
+                    """UPDATE images SET thumbnail = NULL, thumb_offset = ?, thumb_length = ?
+                    WHERE id = ?""",
+                    (offset, len(blob), img_id)
+                )
+                conn.commit()
+        except Exception as e:
+            logger.warning(f"Failed to move thumbnail {img_id} into the pack: {e}")
+        return blob
+
+    def _generate(self, conn, executor, pending, file_path, stats, content_key=None,
+                  budget=True):
+        """Ingests an image inline, or queues it on the process pool.
+
+        The file is read once by ``ingest_file``, which fingerprints it,
+        looks it up in the global cache (if enabled) and only decodes the
+        thumbnail from the same bytes on a miss.
+
+        Args:
+            content_key (str, optional): The file's content fingerprint, if
+                already computed.
+            budget (bool): Defer the image if it is over the decode budget.
+
+        Returns:
+            int: The number of images published.
+        """
+        max_pixels = self._pixel_budget() if budget else None
+        if executor is None:
+            logger.debug(f"Ingesting {file_path}")
+            (thumbnail, source, content_key, header, cached), seconds = timed_call(
+                ingest_file, file_path, content_key, quality=self.thumbnail_quality,
+                use_embedded=self.use_embedded_thumbnails, encoding=self.thumbnail_encoding,
+                max_pixels=max_pixels, lookup=self._cache_lookup
+            )
+            self._tuner.record(stats[0], seconds)
+            if self._over_budget(thumbnail, header, max_pixels):
+                self._defer(file_path, stats, content_key)
+                return 0
+            result = (thumbnail, source)
+            if cached:
+                logger.debug(f"Reusing thumbnail from the global cache for {file_path}")
+            else:
+                self._record_decode(header, seconds)
+                result = self._mark_undecodable(result, header, max_pixels)
+                self._share(content_key, result)
+            return self._publish(conn, file_path, stats, result, content_key=content_key,
+                                 header=header)
+
+        # Have the kernel read the file while it waits for a worker
+        prefetch(file_path)
+        future = executor.submit(
+            timed_call, ingest_file, file_path, content_key, quality=self.thumbnail_quality,
+            use_embedded=self.use_embedded_thumbnails, encoding=self.thumbnail_encoding,
+            max_pixels=max_pixels, lookup=self._cache_lookup
+        )
+        pending[future] = (file_path, stats, content_key, max_pixels)
+        count = 0
+        while self._busy_jobs(pending) >= self._queue_limit() and not self.is_cancelled:
+            count += self._drain(conn, pending, FIRST_COMPLETED)
+        return count
+
+    def _drain(self, conn, pending, return_when):
+        """Publishes finished thumbnail jobs and removes them from ``pending``.
+
+        Args:
+            conn: The open database connection, or None.
+            pending (dict): Maps futures to their
+                ``(path, (size, mtime), content_key, max_pixels)``.
+            return_when: ``FIRST_COMPLETED`` or ``ALL_COMPLETED``.
+
+        Returns:
+            int: The number of images published.
+        """
+        count = 0
+        while pending and self._checkpoint():
+            # Wake up in time to deliver a buffered batch while workers are
+            # busy, and to notice decodes running over budget
+            timeout = self._batch_timeout()
+            if return_when == FIRST_COMPLETED:
+                timeout = min(timeout if timeout is not None else self.DECODE_POLL_INTERVAL,
+                              self.DECODE_POLL_INTERVAL)
+            done, _ = wait(pending, timeout=timeout, return_when=return_when)
+            if not done:
+                self._flush_batch()
+                if (return_when == FIRST_COMPLETED
+                        and self._busy_jobs(pending) < self._queue_limit()):
+                    break
+                continue
+            for future in done:
+                file_path, stats, content_key, max_pixels = pending.pop(future)
+                self._job_started.pop(future, None)
+                self._overdue.discard(future)
+                header, cached = None, False
+                try:
+                    (thumbnail, source, content_key, header, cached), seconds = future.result()
+                    self._tuner.record(stats[0], seconds)
+                    result = (thumbnail, source)
+                except Exception as e:
+                    logger.error(f"Thumbnail worker failed for {file_path}: {e}")
+                    result = (None, None)
+                if self._over_budget(result[0], header, max_pixels):
+                    self._defer(file_path, stats, content_key)
+                    continue
+                if not cached:
+                    if result[0] is not None:
+                        self._record_decode(header, seconds)
+                    result = self._mark_undecodable(result, header, max_pixels)
+                    self._share(content_key, result)
+                count += self._publish(conn, file_path, stats, result, content_key=content_key,
+                                       header=header)
+            if return_when == FIRST_COMPLETED:
+                break
+        return count
+
+    def _busy_jobs(self, pending) -> int:
+        """Returns how many pool jobs count against the queue limit.
+
+        Jobs decoding for longer than ``DECODE_SECONDS`` do not, so one slow
+        image cannot hold up the images queued behind it.
+        """
+        now = time.monotonic()
+        overdue = 0
+        for future, (file_path, *_) in pending.items():
+            if not future.running():
+                continue
+            started = self._job_started.setdefault(future, now)
+            if now - started > self.DECODE_SECONDS:
+                if future not in self._overdue:
+                    self._overdue.add(future)
+                    logger.info(f"Still decoding {file_path} after {self.DECODE_SECONDS}s, "
+                                "continuing with other images")
+                overdue += 1
+        return len(pending) - overdue
+
+    def _mark_undecodable(self, result, header, max_pixels):
+        """Flags a deferred image that still failed to decode.
+
+        Returns:
+            tuple: ``result``, or ``(None, SOURCE_UNDECODABLE)`` if the image
+            was decoded without a budget (``max_pixels`` None) and failed
+            although its header could be read.
+        """
+        if result[0] is None and max_pixels is None and header and pixel_count(header):
+            logger.warning(f"Cannot decode {pixel_count(header)} pixel image, "
+                           "indexing it without a thumbnail")
+            return None, self.SOURCE_UNDECODABLE
+        return result
+
+    def _pixel_budget(self) -> int:
+        """Returns how many pixels an image may have to be decoded in walk order."""
+        budget = self.MAX_DECODE_PIXELS
+        if self._decode_samples >= self.DECODE_RATE_SAMPLES and self._decode_seconds > 0:
+            rate = self._decoded_pixels / self._decode_seconds
+            budget = min(budget, max(self.MIN_DECODE_PIXELS, int(rate * self.DECODE_SECONDS)))
+        if Image.MAX_IMAGE_PIXELS:
+            # Pillow refuses larger images as decompression bombs
+            budget = min(budget, 2 * Image.MAX_IMAGE_PIXELS)
+        return budget
+
+    @staticmethod
+    def _over_budget(thumbnail, header, max_pixels) -> bool:
+        """Returns whether ``ingest_file`` skipped decoding for the pixel budget."""
+        return (thumbnail is None and max_pixels is not None and bool(header)
+                and pixel_count(header) > max_pixels)
+
+    def _record_decode(self, header, seconds):
+        """Adds one decoded image to the measured decode rate."""
+        pixels = pixel_count(header) if header else 0
+        if pixels and seconds > 0:
+            self._decoded_pixels += pixels
+            self._decode_seconds += seconds
+            self._decode_samples += 1
+
+    def _defer(self, file_path, stats, content_key):
+        """Queues an image over the decode budget and emits its placeholder."""
+        logger.info(f"Deferring {file_path}: too large to decode in walk order")
+        self._deferred[file_path] = (stats, content_key)
+        self._emit(file_path, None)
+
+    def _generate_deferred(self, conn, executor, pending):
+        """Decodes the images deferred for exceeding the decode budget.
+
+        Returns:
+            int: The number of images published.
+        """
+        deferred, self._deferred = self._deferred, {}
+        logger.info(f"Decoding {len(deferred)} deferred images")
+        count = 0
+        for file_path, (stats, content_key) in deferred.items():
+            if not self._checkpoint():
+                break
+            count += self._generate(conn, executor, pending, file_path, stats, content_key,
+                                    budget=False)
+        if pending and not self.is_cancelled:
+            count += self._drain(conn, pending, ALL_COMPLETED)
+        return count
+
+    def _share(self, content_key, result):
+        """Stores a generated thumbnail in the global cache."""
+        if self._global_cache is not None and content_key and result[0]:
+            try:
+                self._global_cache.put(content_key, self._cache_variant, result[0], result[1])
+            except Exception as e:
+                logger.warning(f"Failed to store thumbnail in the global cache: {e}")
+
+    def _copy_record(self, conn, content_key):
+        """Returns ``(offset, length, source)`` of the stored thumbnail of an
+        indexed image with the same content, or None."""
+        path = self._copies.get(content_key) if content_key else None
+        if path is None:
+            return None
+        row = conn.execute(
+            "SELECT thumb_offset, thumb_length, thumbnail_source FROM images "
+            "WHERE path = ? AND content_key = ?", (path, content_key)
+        ).fetchone()
+        return row if row and row[1] else None
+
+    def _stored_copy(self, conn, content_key):
+        """Returns the ``(thumbnail, source)`` of an indexed copy of an image, or None."""
+        if not conn:
+            return None
+        try:
+            record = self._copy_record(conn, content_key)
+        except Exception as db_e:
+            logger.warning(f"Failed to look up an indexed copy: {db_e}")
+            return None
+        thumb_bytes = self._pack.read(record[0], record[1]) if record else None
+        return None if thumb_bytes is None else (thumb_bytes, record[2])
+
+    def _publish(self, conn, file_path, stats, result, cached=False, content_key=None,
+                 header=None, reused=False):
+        """Persists a freshly generated thumbnail and emits it.
+
+        Args:
+            conn: The open database connection, or None.
+            file_path (str): The image path.
+            stats (tuple): The image's ``(file_size, modified_at, device, inode)``,
+                plus the member CRC for images inside archives.
+            result (tuple[bytes, str]): The thumbnail bytes and the path that
+                produced them (see ``ThumbnailGenerator.generate_with_source``).
+            cached (bool): True if the thumbnail came from the pack.
+            content_key (str): The image's content fingerprint, under which
+                the global cache holds the thumbnail.
+            header (dict): The image's header properties (see
+                ``ingest.read_header``), or None if they were not read.
+            reused (bool): True if the thumbnail is that of an indexed copy
+                (see ``_stored_copy``).
+
+        Identical images share one pack record, so copies of an image cost
+        the pack nothing.
+
+        Returns:
+            int: 1 if the image was emitted, otherwise 0.
+        """
+        thumb_bytes, source = result
+        if not thumb_bytes and source != self.SOURCE_UNDECODABLE:
+            logger.warning(f"No thumbnail generated for {file_path}")
+            self._failed_dirs.add(container_of(file_path))
+            return 0
+
+        if not cached and not reused and thumb_bytes:
+            self.generated_count += 1
+        if conn and not cached:
+            header_values = ((None,) * 5 if header is None
+                             else self._header_values(header))
+            try:
+                filename = os.path.basename(file_path)
+                # Hold the pack lock so a compaction cannot run in between
+                with self._pack.lock:
+                    offset = length = None
+                    if thumb_bytes:
+                        record = self._copy_record(conn, content_key)
+                        if (record is None or record[1] != len(thumb_bytes)
+                                or self._pack.read(record[0], record[1]) != thumb_bytes):
+                            record = self._pack.append(thumb_bytes), len(thumb_bytes)
+                        offset, length = record[:2]
+                    # Levels derived from the previous version are stale
+                    conn.execute(
+                        """DELETE FROM thumbnail_levels
+                        WHERE image_id IN (SELECT id FROM images WHERE path = ?)""",
+                        (file_path,)
+                    )
+                    # Upsert so the image keeps its id, and with it its
+                    # analysis results
+                    conn.execute(
+                        """INSERT INTO images
+                        (path, filename, file_size, modified_at,
+                         thumb_offset, thumb_length, content_key, thumbnail_source,
+                         device, inode, width, height, format, frame_count, taken_at,
+                         member_crc)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT (path) DO UPDATE SET
+                        filename = excluded.filename, file_size = excluded.file_size,
+                        modified_at = excluded.modified_at, thumbnail = NULL,
+                        thumb_offset = excluded.thumb_offset,
+                        thumb_length = excluded.thumb_length,
+                        content_key = excluded.content_key,
+                        thumbnail_source = excluded.thumbnail_source,
+                        device = excluded.device, inode = excluded.inode,
+                        width = excluded.width, height = excluded.height,
+                        format = excluded.format, frame_count = excluded.frame_count,
+                        taken_at = excluded.taken_at, member_crc = excluded.member_crc""",
+                        (file_path, filename, stats[0], stats[1],
+                         offset, length, content_key, source, stats[2], stats[3])
+                        + header_values + (stats[4] if len(stats) > 4 else None,)
+                    )
+                    conn.commit()
+                if content_key and thumb_bytes:
+                    self._copies[content_key] = file_path
+                    if len(stats) < 5:
+                        # Have later copies fingerprinted before decoding them
+                        self._content_sizes.add(stats[0])
+            except Exception as db_e:
+                logger.warning(f"Database write error for {file_path}: {db_e}")
+                self._failed_dirs.add(container_of(file_path))
+
+        self._emit(file_path, thumb_bytes)
+        return 1
+
+    def _emit(self, file_path, thumb_bytes):
+        """Buffers one image for the next ``files_found`` batch."""
+        if not self._batch:
+            self._batch_started = time.monotonic()
+        self._batch.append((file_path, thumb_bytes))
+        if len(self._batch) >= self.BATCH_SIZE or self._batch_timeout() == 0:
+            self._flush_batch()
+
+    def _batch_timeout(self):
+        """Returns seconds until the buffered batch is due, or None if empty."""
+        if not self._batch:
+            return None
+        return max(0.0, self._batch_started + self.BATCH_INTERVAL - time.monotonic())
+
+    def _flush_batch(self):
+        """Emits all buffered results as a single ``files_found`` batch."""
+        if self._batch:
+            batch, self._batch = self._batch, []
+            self.signals.files_found.emit(batch)
+
+
+class DirectoryRefresher(FolderScanner):
+    """
+    Re-indexes a set of changed directories of an already scanned workspace.
+
+    Each directory is listed again without descending into known
+    subdirectories; subdirectories missing from the directory index are new
+    and get walked completely. New or modified images are persisted and
+    emitted through ``files_found``, unchanged ones are skipped, and images
+    or directories that disappeared are deleted from the database and
+    reported through ``files_removed``.
+    """
+
+    def __init__(self, folder_path, directories, db_path, **scanner_options):
+        super().__init__(folder_path, db_path, **scanner_options)
+        self.directories = sorted(set(directories))
+        self.emit_cached = False
+        self.journal = False
+        self.removed_paths = []
+        self.removed_dirs = []
+
+    def _discover(self, index, dir_index):
+        self.visited_dirs = {}
+        self.skipped_dirs = set()
+        roots = [d for d in self.directories
+                 if os.path.isdir(d) or (is_archive(d) and os.path.isfile(d))]
+        yield from self._walk(roots, index, dir_index)
+
+    def _should_descend(self, path, dir_index):
+        # Archives are checked whenever their folder is; unchanged ones
+        # reuse their listing
+        return path not in dir_index or is_archive(path)
+
+    def _finish_scan(self, conn, index, dir_index):
+        removed_dirs = {d for d in self.directories if d not in self.visited_dirs}
+        # Known subdirectories that were listed again but not entered still exist
+        removed_dirs.update(
+            path for path, (parent, _, _) in dir_index.items()
+            if parent in self.visited_dirs and path not in self.visited_dirs
+            and path not in self.skipped_dirs
+        )
+        prefixes = tuple(d + os.sep for d in removed_dirs)
+        prefixes += tuple(d + MEMBER_SEPARATOR for d in removed_dirs if is_archive(d))
+        if prefixes:
+            removed_dirs.update(path for path in dir_index if path.startswith(prefixes))
+
+        relisted = set(self.visited_dirs)
+        removed_paths = {
+            path for path in index
+            if path not in self._seen_paths and (
+                container_of(path) in relisted or path.startswith(prefixes)
+            )
+        }
+        self.removed_paths = sorted(removed_paths)
+        self.removed_dirs = sorted(d for d in removed_dirs if d in dir_index)
+
+        if conn and self.removed_paths:
+            try:
+                DatabaseManager.delete_images(conn, self.removed_paths)
+                conn.commit()
+            except Exception as db_e:
+                logger.warning(f"Failed to delete removed images: {db_e}")
+        self._save_dir_index(conn, self.removed_dirs)
+
+        if self.removed_paths:
+            logger.info(f"{len(self.removed_paths)} images removed from {self.folder_path}")
+        self._emit_removed()
+
+
+class ThumbnailLevelLoader(QRunnable):
+    """
+    Loads the thumbnails of indexed images at one pyramid level.
+
+    Missing levels are generated on the way (see ``ThumbnailPyramid``).
+    Results are emitted in batches through ``files_found``, so the gallery
+    can swap its tiles in place. Loads can be cancelled from any thread.
+    """
+    BATCH_SIZE = 64
+
+    def __init__(self, db_path, paths, level,
+                 thumbnail_quality=ThumbnailGenerator.QUALITY_FAST,
+                 use_embedded_thumbnails=False,
+                 thumbnail_encoding=ThumbnailGenerator.ENCODING_JPEG,
+                 global_cache_dir=None, global_cache_max_bytes=None):
+        super().__init__()
+        self.db_path = db_path
+        self.paths = list(paths)
+        self.level = level
+        self.thumbnail_quality = thumbnail_quality
+        self.use_embedded_thumbnails = use_embedded_thumbnails
+        self.thumbnail_encoding = thumbnail_encoding
+        self.global_cache_dir = global_cache_dir
+        self.global_cache_max_bytes = global_cache_max_bytes
+        self._cancel_event = threading.Event()
+        self.signals = ScannerSignals()
+
+    def run(self):
+        conn = None
+        try:
+            conn = open_connection(self.db_path)
+            global_cache = None
+            if self.global_cache_dir:
+                global_cache = GlobalThumbnailCache.for_directory(
+                    self.global_cache_dir, self.global_cache_max_bytes
+                )
+            pyramid = ThumbnailPyramid(
+                conn, ThumbnailPack.for_database(self.db_path),
+                thumbnail_quality=self.thumbnail_quality,
+                use_embedded_thumbnails=self.use_embedded_thumbnails,
+                thumbnail_encoding=self.thumbnail_encoding, global_cache=global_cache
+            )
+            for start in range(0, len(self.paths), self.BATCH_SIZE):
+                if self.is_cancelled:
+                    self.signals.cancelled.emit()
+                    return
+                batch = pyramid.load(self.paths[start:start + self.BATCH_SIZE], self.level)
+                if batch:
+                    self.signals.files_found.emit(batch)
+            self.signals.finished.emit()
+        except Exception as e:
+            logger.exception(f"Failed to load {self.level}px thumbnails: {e}")
+            self.signals.error.emit(str(e))
         finally:
             if conn:
                 conn.close()
+
+    def cancel(self):
+        """Requests the load to stop after the current batch."""
+        self._cancel_event.set()
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+
+class WorkspaceMaintenance(QRunnable):
+    """
+    Runs ``DatabaseManager.run_maintenance`` on a workspace in the background.
+
+    Deleted images are reported through ``files_removed``; the summary is
+    kept in ``result`` once ``finished`` is emitted.
+    """
+
+    def __init__(self, db_path):
+        super().__init__()
+        self.db_path = db_path
+        self.result = None
+        self.signals = ScannerSignals()
+
+    def run(self):
+        try:
+            self.result = DatabaseManager(self.db_path).run_maintenance()
+            if self.result["removed_paths"]:
+                self.signals.files_removed.emit(self.result["removed_paths"])
+            self.signals.finished.emit()
+        except Exception as e:
+            logger.exception(f"Workspace maintenance failed: {e}")
+            self.signals.error.emit(str(e))
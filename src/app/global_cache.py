@@ -0,0 +1,272 @@
+import os
+import sys
+import time
+import sqlite3
+import logging
+import threading
+import contextlib
+from src.app.thumb_store import ThumbnailPack
+
+if sys.platform == "win32":
+    import msvcrt
+else:
+    import fcntl
+
+logger = logging.getLogger(__name__)
+
+def default_cache_dir() -> str:
+    """Returns the per-user directory for caches shared by all workspaces."""
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser(r"~\AppData\Local")
+        return os.path.join(base, "Pic-Analyzer", "Cache")
+    if sys.platform == "darwin":
+        return os.path.expanduser("~/Library/Caches/Pic-Analyzer")
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "pic-analyzer")
+
+
+def _lock_file(f):
+    """Blocks until the calling process holds an exclusive lock on ``f``."""
+    if sys.platform == "win32":
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                pass # LK_LOCK gives up after 10 seconds
+    else:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+
+def _unlock_file(f):
+    if sys.platform == "win32":
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class _CachePack(ThumbnailPack):
+    """Thumbnail pack whose records are referenced by the cache index.
+
+    Unlike workspace packs, it is shared by every process of the user, so
+    ``locked`` also serializes those through a lock file.
+    """
+    TABLES = ("entries",)
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._lock_file = None
+        self._lock_depth = 0
+        self._identity = None
+
+    @contextlib.contextmanager
+    def locked(self):
+        """Holds ``lock`` and the lock file, so no other process appends or
+        compacts meanwhile. Reentrant within a thread."""
+        with self.lock:
+            if self._lock_depth == 0:
+                if self._lock_file is None:
+                    self._lock_file = open(self.path + ".lock", "a+b")
+                _lock_file(self._lock_file)
+                self._reopen_if_replaced()
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0:
+                    _unlock_file(self._lock_file)
+
+    def _reopen_if_replaced(self):
+        """Drops the open file and mapping once another process compacted the pack."""
+        try:
+            st = os.stat(self.path)
+            identity = (st.st_dev, st.st_ino)
+        except OSError:
+            identity = None
+        if identity != self._identity:
+            self.close()
+            self._identity = identity
+
+    def _prune_dead_rows(self, conn):
+        pass
+
+
+class GlobalThumbnailCache:
+    """User-level thumbnail cache shared by every workspace.
+
+    Entries are keyed by a content fingerprint (see
+    ``file_ops.content_fingerprint``) and a variant describing how the
+    thumbnail was produced, so the same sticker copied into thousands of
+    folders is only thumbnailed once. Workspaces still keep their own copy,
+    so they stay complete when entries are evicted or the cache is cleared.
+
+    Thumbnails live in a ``ThumbnailPack`` next to a small SQLite index.
+    Once the stored thumbnails exceed ``max_bytes``, the least recently used
+    entries are evicted; the pack is compacted when enough of it is dead.
+
+    Use ``for_directory`` to get the instance shared by all threads. Every
+    method is thread-safe, and several processes may share the directory.
+    """
+    DB_NAME = "thumbnails.db"
+    DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+    # Eviction frees space down to this fraction of ``max_bytes``, so it does
+    # not run again on the next insertion.
+    EVICT_TO_RATIO = 0.9
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        db_path = os.path.join(directory, self.DB_NAME)
+        self.pack = _CachePack(ThumbnailPack.path_for(db_path))
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS entries (
+                fingerprint TEXT NOT NULL,
+                variant TEXT NOT NULL,
+                source TEXT,
+                thumb_offset INTEGER,
+                thumb_length INTEGER,
+                last_used REAL,
+                PRIMARY KEY (fingerprint, variant)
+            )
+        ''')
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_last_used ON entries (last_used)")
+        self._conn.commit()
+        self._size = self._conn.execute(
+            "SELECT COALESCE(SUM(thumb_length), 0) FROM entries"
+        ).fetchone()[0]
+
+    @classmethod
+    def for_directory(cls, directory: str, max_bytes: int = None) -> "GlobalThumbnailCache":
+        """Returns the cache shared by everyone using ``directory``.
+
+        Args:
+            directory (str): The cache directory, created if needed.
+            max_bytes (int, optional): Updates the size bound of the cache.
+        """
+        directory = os.path.abspath(directory)
+        with cls._instances_lock:
+            cache = cls._instances.get(directory)
+            if cache is None:
+                cache = cls._instances[directory] = cls(directory)
+        if max_bytes is not None and max_bytes != cache.max_bytes:
+            with cache.pack.locked():
+                cache.max_bytes = max_bytes
+                cache._evict()
+        return cache
+
+    @staticmethod
+    def variant(size, quality, use_embedded, encoding) -> str:
+        """Returns the variant key of thumbnails generated with these options."""
+        return f"{size[0]}x{size[1]}:{quality}:{'embedded' if use_embedded else 'decoded'}:{encoding}"
+
+    @property
+    def total_bytes(self) -> int:
+        """Returns the size of all cached thumbnails."""
+        return self._size
+
+    def get(self, fingerprint, variant):
+        """Returns ``(thumbnail, source)`` of a cached entry, or ``(None, None)``."""
+        return self.get_many([fingerprint], variant).get(fingerprint, (None, None))
+
+    def get_many(self, fingerprints, variant) -> dict:
+        """Looks up several entries and marks them as recently used.
+
+        Returns:
+            dict: Maps each cached fingerprint to ``(thumbnail, source)``.
+        """
+        fingerprints = list(dict.fromkeys(fingerprints))
+        found = {}
+        with self.pack.locked():
+            for start in range(0, len(fingerprints), 256):
+                chunk = fingerprints[start:start + 256]
+                placeholders = ",".join("?" * len(chunk))
+                for fingerprint, source, offset, length in self._conn.execute(
+                    f"SELECT fingerprint, source, thumb_offset, thumb_length FROM entries "
+                    f"WHERE variant = ? AND fingerprint IN ({placeholders})",
+                    [variant] + chunk
+                ):
+                    data = self.pack.read(offset, length)
+                    if data is not None:
+                        found[fingerprint] = (data, source)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE entries SET last_used = ? WHERE fingerprint = ? AND variant = ?",
+                    [(now, fingerprint, variant) for fingerprint in found]
+                )
+                self._conn.commit()
+        return found
+
+    def put(self, fingerprint, variant, data, source=None):
+        """Stores a thumbnail, evicting least recently used entries if needed."""
+        if len(data) > self.max_bytes:
+            return
+        with self.pack.locked():
+            old = self._conn.execute(
+                "SELECT thumb_length FROM entries WHERE fingerprint = ? AND variant = ?",
+                (fingerprint, variant)
+            ).fetchone()
+            offset = self.pack.append(data)
+            self._conn.execute(
+                """INSERT OR REPLACE INTO entries
+                (fingerprint, variant, source, thumb_offset, thumb_length, last_used)
+                VALUES (?, ?, ?, ?, ?, ?)""",
+                (fingerprint, variant, source, offset, len(data), time.time())
+            )
+            self._conn.commit()
+            previous = (old[0] or 0) if old else 0
+            self._size += len(data) - previous
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Drops least recently used entries until the cache is under its bound."""
+        target = self.max_bytes * self.EVICT_TO_RATIO
+        if self._size <= target:
+            return
+        evicted = []
+        for fingerprint, variant, length in self._conn.execute(
+            "SELECT fingerprint, variant, thumb_length FROM entries ORDER BY last_used"
+        ):
+            if self._size <= target:
+                break
+            evicted.append((fingerprint, variant))
+            self._size -= length or 0
+        self._conn.executemany(
+            "DELETE FROM entries WHERE fingerprint = ? AND variant = ?", evicted
+        )
+        self._conn.commit()
+        logger.info(f"Evicted {len(evicted)} thumbnails from the global cache")
+        try:
+            self.pack.compact_if_needed(self._conn)
+        except Exception as e:
+            logger.warning(f"Failed to compact the global thumbnail cache: {e}")
+
+
+class CacheLookup:
+    """Looks thumbnails up in the cache at ``directory`` by fingerprint.
+
+    Instances are picklable, so process pool workers can check the cache
+    with the fingerprint of the bytes they read anyway (see
+    ``ingest.ingest_file``). Each process opens the cache once.
+    """
+
+    def __init__(self, directory: str, variant: str):
+        self.directory = directory
+        self.variant = variant
+
+    def __call__(self, fingerprint):
+        """Returns the cached ``(thumbnail, source)``, or ``(None, None)``."""
+        data, source = GlobalThumbnailCache.for_directory(self.directory).get(
+            fingerprint, self.variant
+        )
+        # Views of the mapped pack cannot be sent back from a worker
+        return (bytes(data) if data is not None else None), source
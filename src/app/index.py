@@ -0,0 +1,247 @@
+"""Indexes a folder into its workspace database without starting the GUI.
+
+Usage (from the repository root):
+    python -m src.app.index FOLDER [--workers N] [--full] [--summary FILE]
+
+Runs the same ``FolderScanner`` pipeline as the application and writes the
+same ``.pic_analyzer.db`` and thumbnail pack, so the folder opens fully
+indexed. Qt is not loaded (see ``src.app.qt_compat``), so this works
+without a display or PySide6. Progress is written to stderr; a JSON summary
+of the run is printed to stdout, or written to ``--summary``.
+
+Exit status is 0 when the scan finished, 1 when it failed and 130 when it
+was interrupted.
+"""
+import os
+import sys
+
+if __name__ == "__main__":
+    # Must be set before the scanner is imported
+    os.environ.setdefault("PIC_ANALYZER_NO_QT", "1")
+
+import json
+import time
+import sqlite3
+import argparse
+import signal
+import logging
+from src.app.state import AppState
+from src.app.database import DatabaseManager
+from src.app.file_ops import hide_file
+from src.app.file_scanner import FolderScanner
+from src.app.scan_rules import ScanRules
+from src.app.io_tuning import STORAGE_CLASSES
+from src.app.global_cache import default_cache_dir
+from src.ui.thumbnail_gen import ThumbnailGenerator
+
+logger = logging.getLogger(__name__)
+
+
+class ProgressReporter:
+    """Counts indexed images and reports the rate at most every ``interval`` seconds."""
+
+    def __init__(self, stream=sys.stderr, interval=1.0):
+        self.stream = stream
+        self.interval = interval
+        self.images = 0
+        self.started = time.monotonic()
+        self._last_report = self.started
+
+    def on_batch(self, batch):
+        # Placeholders of deferred images are counted once decoded
+        self.images += sum(1 for _, thumb in batch if thumb is not None)
+        now = time.monotonic()
+        if self.stream is not None and now - self._last_report >= self.interval:
+            self._last_report = now
+            self.stream.write(f"\r{self.images} images ({self.rate(now):.0f}/s)")
+            self.stream.flush()
+
+    def rate(self, now=None) -> float:
+        elapsed = (now or time.monotonic()) - self.started
+        return self.images / elapsed if elapsed > 0 else 0.0
+
+    def close(self):
+        if self.stream is not None and self.images:
+            self.stream.write(f"\r{self.images} images ({self.rate():.0f}/s)\n")
+            self.stream.flush()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    defaults = AppState().scanner_options()
+    parser = argparse.ArgumentParser(
+        prog="python -m src.app.index", description=__doc__.splitlines()[0]
+    )
+    parser.add_argument("folder", help="Folder to index")
+    parser.add_argument("--db", help=f"Workspace database "
+                        f"(default: FOLDER/{DatabaseManager.WORKSPACE_DB_NAME})")
+    parser.add_argument("--workers", type=int, default=defaults["max_workers"],
+                        help="Thumbnail worker processes (default: %(default)s)")
+    parser.add_argument("--listing-threads", type=int,
+                        default=FolderScanner.DEFAULT_LISTING_WORKERS,
+                        help="Directories listed concurrently; raise it for network "
+                             "shares (default: %(default)s)")
+    parser.add_argument("--storage", choices=STORAGE_CLASSES,
+                        help="Storage the folder is on (default: detected)")
+    parser.add_argument("--full", action="store_true",
+                        help="List every directory instead of reusing unchanged listings")
+    parser.add_argument("--quality", choices=ThumbnailGenerator.QUALITIES,
+                        default=defaults["thumbnail_quality"])
+    parser.add_argument("--encoding", choices=ThumbnailGenerator.ENCODINGS,
+                        default=defaults["thumbnail_encoding"])
+    parser.add_argument("--no-embedded", dest="embedded", action="store_false",
+                        default=defaults["use_embedded_thumbnails"],
+                        help="Never use embedded EXIF previews")
+    parser.add_argument("--global-cache", nargs="?", const=default_cache_dir(),
+                        default=defaults["global_cache_dir"], metavar="DIR",
+                        help="Share thumbnails with other workspaces through a user-level "
+                             "cache (DIR defaults to %(const)s)")
+    parser.add_argument("--no-global-cache", dest="global_cache", action="store_const",
+                        const=None, help="Store every thumbnail in the workspace (default)")
+    rules = parser.add_argument_group(
+        "scan rules", "Stored in the workspace and used by every later scan of it"
+    )
+    rules.add_argument("--exclude", action="append", default=[], metavar="GLOB",
+                       help="Skip matching directories and files (repeatable)")
+    rules.add_argument("--include", action="append", metavar="GLOB",
+                       help="Only index images whose name matches (repeatable)")
+    rules.add_argument("--min-size", type=int, metavar="BYTES", help="Skip smaller files")
+    rules.add_argument("--max-size", type=int, metavar="BYTES", help="Skip larger files")
+    rules.add_argument("--follow-symlinks", action="store_true", default=None,
+                       help="Enter symlinked directories")
+    rules.add_argument("--reset-rules", action="store_true",
+                       help="Start from the default rules instead of the stored ones")
+    parser.add_argument("--summary", metavar="FILE",
+                        help="Write the JSON summary to FILE instead of stdout")
+    parser.add_argument("-q", "--quiet", action="store_true", help="No progress output")
+    parser.add_argument("-v", "--verbose", action="count", default=0,
+                        help="Log scanner messages (repeat for debug output)")
+    return parser
+
+
+def update_rules(db_path, exclude=(), include=None, min_size=None, max_size=None,
+                 follow_symlinks=None, reset=False) -> ScanRules:
+    """Applies rule options to the rules stored in a workspace database.
+
+    ``exclude`` patterns are added to the stored ones; every other option
+    replaces its stored value when given.
+
+    Returns:
+        ScanRules: The rules now stored.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        rules = ScanRules() if reset else ScanRules.load(conn)
+        data = rules.to_dict()
+        data["exclude"] += [p for p in exclude if p not in data["exclude"]]
+        if include is not None:
+            data["include"] = list(include)
+        if min_size is not None:
+            data["min_size"] = min_size
+        if max_size is not None:
+            data["max_size"] = max_size
+        if follow_symlinks is not None:
+            data["follow_symlinks"] = follow_symlinks
+        rules = ScanRules.from_dict(data)
+        rules.save(conn)
+        return rules
+    finally:
+        conn.close()
+
+
+def run_index(folder, db_path=None, workers=1, incremental=True, progress=None,
+              **scanner_options) -> dict:
+    """Indexes ``folder`` and returns the summary of the run.
+
+    Args:
+        folder (str): The folder to index.
+        db_path (str, optional): The workspace database. Defaults to the one
+            the application uses for ``folder``.
+        workers (int): Thumbnail worker processes.
+        incremental (bool): Reuse the listings of unchanged directories.
+        progress (ProgressReporter, optional): Receives every result batch.
+        **scanner_options: Further ``FolderScanner`` keyword arguments.
+
+    Returns:
+        dict: ``status`` (``"finished"``, ``"cancelled"`` or ``"error"``),
+        ``folder``, ``database``, ``workers``, ``storage``, ``read_concurrency``
+        (thumbnail jobs running at once at the end), ``resumed``, ``images``, ``generated``,
+        ``removed``, ``moved``, ``seconds`` and ``images_per_second``, plus
+        ``error`` if the scan failed.
+    """
+    folder = os.path.abspath(folder)
+    db_path = db_path or DatabaseManager.workspace_db_path(folder)
+    DatabaseManager(db_path)
+    hide_file(db_path)
+
+    progress = progress or ProgressReporter(stream=None)
+    scanner = FolderScanner(folder, db_path, max_workers=workers,
+                            incremental=incremental, **scanner_options)
+    errors = []
+    scanner.signals.files_found.connect(progress.on_batch)
+    scanner.signals.error.connect(errors.append)
+
+    started = time.monotonic()
+    # Runs on this thread, so signals are delivered directly without an
+    # event loop. Ctrl+C cancels the scan cleanly instead of aborting it.
+    previous = signal.signal(signal.SIGINT, lambda *_: scanner.cancel())
+    try:
+        scanner.run()
+    finally:
+        signal.signal(signal.SIGINT, previous)
+    progress.close()
+    seconds = time.monotonic() - started
+
+    status = "error" if errors else "cancelled" if scanner.is_cancelled else "finished"
+    summary = {
+        "status": status,
+        "folder": folder,
+        "database": db_path,
+        "workers": scanner.max_workers,
+        "storage": scanner.storage,
+        "read_concurrency": scanner.read_concurrency,
+        "resumed": scanner.resumed,
+        "images": progress.images,
+        "generated": scanner.generated_count,
+        "removed": len(scanner.removed_paths),
+        "moved": len(scanner.moved_paths),
+        "seconds": round(seconds, 3),
+        "images_per_second": round(progress.images / seconds, 1) if seconds > 0 else 0.0,
+    }
+    if errors:
+        summary["error"] = errors[0]
+    return summary
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    level = {0: logging.WARNING, 1: logging.INFO}.get(args.verbose, logging.DEBUG)
+    logging.basicConfig(level=level, stream=sys.stderr,
+                        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+
+    if not os.path.isdir(args.folder):
+        print(f"Not a directory: {args.folder}", file=sys.stderr)
+        return 1
+
+    db_path = args.db or DatabaseManager.workspace_db_path(os.path.abspath(args.folder))
+    DatabaseManager(db_path)
+    update_rules(db_path, args.exclude, args.include, args.min_size, args.max_size,
+                 args.follow_symlinks, args.reset_rules)
+
+    summary = run_index(
+        args.folder, db_path, workers=args.workers, incremental=not args.full,
+        progress=ProgressReporter(stream=None if args.quiet else sys.stderr),
+        thumbnail_quality=args.quality, use_embedded_thumbnails=args.embedded,
+        thumbnail_encoding=args.encoding, global_cache_dir=args.global_cache,
+        listing_workers=args.listing_threads, storage=args.storage,
+    )
+    output = json.dumps(summary, indent=2)
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return {"finished": 0, "cancelled": 130}.get(summary["status"], 1)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
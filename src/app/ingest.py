@@ -0,0 +1,242 @@
+"""Reads each new image once and feeds every consumer from the same bytes.
+
+A scan needs three things from a new or changed image: its content
+fingerprint, the properties in its header and a thumbnail. ``ingest_file``
+reads the file in one sequential pass (or maps it, for large files) and
+hands the same buffer to ``fingerprint_data``, ``read_header`` and
+``ThumbnailGenerator``, so no byte is read from disk twice. With a thumbnail
+cache, the image is looked up by that fingerprint and only decoded on a miss.
+
+Decoding a huge image can take seconds, so callers may pass a pixel budget:
+images whose header announces more pixels are parsed but not decoded,
+leaving it to the caller to decode them later (see ``FolderScanner``).
+
+``prefetch`` asks the kernel to start reading a file in the background.
+Scanners call it when queueing a file, so it is in the page cache by the
+time a worker gets to it.
+"""
+import io
+import os
+import mmap
+import struct
+import logging
+from datetime import datetime
+from PIL import Image, ExifTags
+from src.app.file_ops import fingerprint_data
+from src.app.archives import split_member_path, read_member, image_source
+from src.ui.thumbnail_gen import ThumbnailGenerator
+
+logger = logging.getLogger(__name__)
+
+# Files at least this large are mapped instead of read into memory
+MMAP_MIN_BYTES = 8 * 1024 * 1024
+
+EXIF_DATE_FORMAT = "%Y:%m:%d %H:%M:%S"
+
+
+def prefetch(path):
+    """Hints the kernel to read ``path`` ahead. Does nothing where unsupported."""
+    if not hasattr(os, "posix_fadvise") or split_member_path(path) is not None:
+        return
+    try:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        finally:
+            os.close(fd)
+    except OSError as e:
+        logger.debug(f"Read-ahead hint failed for {path}: {e}")
+
+
+class MappedFile:
+    """Read-only file object over a memory map of a whole file.
+
+    Pillow reads through it like through an open file; ``name`` keeps its
+    log messages readable.
+    """
+
+    def __init__(self, name, mapping):
+        self.name = name
+        self._map = mapping
+
+    def read(self, size=-1):
+        return self._map.read(size if size is not None else -1)
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        self._map.seek(offset, whence)
+        return self._map.tell()
+
+    def tell(self):
+        return self._map.tell()
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def close(self):
+        self._map.close()
+
+
+def read_file(path):
+    """Reads a whole file or archive member in one sequential pass.
+
+    Returns:
+        tuple: ``(data, stream)``. ``data`` (bytes or mmap) supports slicing
+        and ``len``; ``stream`` is a file object over the same memory. Close
+        ``stream`` once done.
+    """
+    if split_member_path(path) is not None:
+        data = read_member(path)
+        stream = io.BytesIO(data)
+        stream.name = path
+        return data, stream
+    with open(path, "rb") as f:
+        fd = f.fileno()
+        size = os.fstat(fd).st_size
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        if size >= MMAP_MIN_BYTES:
+            mapping = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+            if hasattr(mapping, "madvise"):
+                mapping.madvise(mmap.MADV_SEQUENTIAL)
+            return mapping, MappedFile(path, mapping)
+        data = f.read()
+    stream = io.BytesIO(data)
+    stream.name = path
+    return data, stream
+
+
+def read_header(source):
+    """Returns the properties stored in an image header, without decoding pixels.
+
+    Args:
+        source (str | file object): The image path (which may point into an
+            archive), or a file object positioned anywhere in the image.
+
+    Images Pillow refuses to open as decompression bombs are parsed without
+    that check, so their announced size is still reported.
+
+    Returns:
+        dict: ``width``, ``height``, ``format``, ``frame_count`` and
+        ``taken_at`` (the EXIF capture time as a Unix timestamp, or None),
+        or an empty dict if the header cannot be read.
+    """
+    try:
+        if hasattr(source, "seek"):
+            source.seek(0)
+        else:
+            source = image_source(source)
+        try:
+            img = Image.open(source)
+        except Image.DecompressionBombError:
+            img = _open_unchecked(source)
+        with img:
+            taken_at = None
+            exif = img.getexif()
+            value = (exif.get_ifd(ExifTags.IFD.Exif).get(ExifTags.Base.DateTimeOriginal)
+                     or exif.get(ExifTags.Base.DateTime))
+            if isinstance(value, str):
+                try:
+                    taken_at = datetime.strptime(value.strip("\x00 "), EXIF_DATE_FORMAT).timestamp()
+                except ValueError:
+                    pass
+            return {
+                "width": img.width,
+                "height": img.height,
+                "format": img.format,
+                # Animated formats count their frames without decoding them
+                "frame_count": getattr(img, "n_frames", 1),
+                "taken_at": taken_at,
+            }
+    except Exception as e:
+        logger.debug(f"Unreadable image header: {e}")
+        return {}
+
+
+def _open_unchecked(source):
+    """Parses an image header like ``Image.open``, minus the decompression bomb check.
+
+    Only for reading the header: nothing is decoded.
+
+    Raises:
+        OSError: If no format plugin accepts the image.
+    """
+    Image.init()
+    if hasattr(source, "seek"):
+        source.seek(0)
+        prefix = source.read(16)
+    else:
+        with open(source, "rb") as f:
+            prefix = f.read(16)
+    for factory, accept in Image.OPEN.values():
+        accepted = not accept or accept(prefix)
+        if not accepted or isinstance(accepted, str):
+            continue
+        if hasattr(source, "seek"):
+            source.seek(0)
+        try:
+            return factory(source, getattr(source, "name", source))
+        except (SyntaxError, IndexError, TypeError, struct.error):
+            continue
+    raise OSError("cannot identify image")
+
+
+def pixel_count(header) -> int:
+    """Returns the pixels per frame announced by a ``read_header`` result, or 0."""
+    return (header.get("width") or 0) * (header.get("height") or 0)
+
+
+def ingest_file(path, content_key=None, size=ThumbnailGenerator.THUMBNAIL_SIZE,
+                quality=ThumbnailGenerator.QUALITY_FAST, use_embedded=False,
+                encoding=ThumbnailGenerator.ENCODING_JPEG, max_pixels=None, lookup=None):
+    """Fingerprints, parses and thumbnails an image from a single read.
+
+    Args:
+        path (str): The image.
+        content_key (str, optional): The fingerprint, if the caller already
+            computed it. Otherwise it is computed from the buffer.
+        size, quality, use_embedded, encoding: See
+            ``ThumbnailGenerator.generate_with_source``.
+        max_pixels (int, optional): Images with more pixels than this are
+            not decoded; ``pixel_count(header)`` tells them apart from
+            images that failed to decode.
+        lookup (callable, optional): Maps the fingerprint to a cached
+            ``(thumbnail, source)``, or ``(None, None)``; see
+            ``global_cache.CacheLookup``. Cached thumbnails are not decoded
+            again, whatever their pixel count.
+
+    Returns:
+        tuple: ``(thumbnail, source, content_key, header, cached)``.
+        ``thumbnail`` and ``source`` are None if the image could not or may
+        not be decoded, and the first four are empty if it could not be
+        read. ``cached`` is True if the thumbnail came from ``lookup``.
+    """
+    try:
+        data, stream = read_file(path)
+    except (OSError, ValueError) as e:
+        logger.error(f"Error reading {path}: {e}")
+        return None, None, content_key, {}, False
+    try:
+        if content_key is None:
+            content_key = fingerprint_data(data)
+        header = read_header(stream)
+        if lookup is not None and content_key:
+            try:
+                thumbnail, source = lookup(content_key)
+            except Exception as e:
+                logger.warning(f"Thumbnail cache lookup failed for {path}: {e}")
+                thumbnail = None
+            if thumbnail is not None:
+                return thumbnail, source, content_key, header, True
+        if max_pixels is not None and pixel_count(header) > max_pixels:
+            logger.debug(f"Not decoding {path}: {pixel_count(header)} pixels over budget")
+            return None, None, content_key, header, False
+        stream.seek(0)
+        thumbnail, source = ThumbnailGenerator.generate_with_source(
+            stream, size=size, quality=quality, use_embedded=use_embedded, encoding=encoding
+        )
+        return thumbnail, source, content_key, header, False
+    finally:
+        stream.close()
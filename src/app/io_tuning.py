@@ -0,0 +1,163 @@
+import os
+import sys
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+STORAGE_SSD = "ssd"
+STORAGE_HDD = "hdd"
+STORAGE_NETWORK = "network"
+STORAGE_UNKNOWN = "unknown"
+STORAGE_CLASSES = (STORAGE_SSD, STORAGE_HDD, STORAGE_NETWORK, STORAGE_UNKNOWN)
+
+NETWORK_FILESYSTEMS = {
+    "nfs", "nfs4", "cifs", "smb3", "smbfs", "sshfs", "fuse.sshfs", "afpfs",
+    "9p", "ceph", "glusterfs", "fuse.glusterfs", "lustre", "davfs", "fuse.rclone",
+}
+
+
+def _mount_fstype(path, mounts="/proc/self/mounts"):
+    """Returns the filesystem type of the mount holding ``path``, or None."""
+    try:
+        with open(mounts, encoding="utf-8", errors="replace") as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+    path = os.path.realpath(path)
+    best, fstype = "", None
+    for line in lines:
+        fields = line.split()
+        if len(fields) < 3:
+            continue
+        # Spaces in mount points are escaped as \040
+        mount_point = fields[1].replace("\\040", " ")
+        inside = path == mount_point or path.startswith(mount_point.rstrip("/") + "/")
+        if inside and len(mount_point) >= len(best):
+            best, fstype = mount_point, fields[2]
+    return fstype
+
+
+def _rotational(device, sysfs="/sys/dev/block"):
+    """Returns whether the block device ``device`` (an ``st_dev``) spins, or None."""
+    base = os.path.join(sysfs, f"{os.major(device)}:{os.minor(device)}")
+    # Partitions keep the queue attributes on their parent device
+    for candidate in (base, os.path.join(base, "..")):
+        try:
+            with open(os.path.join(candidate, "queue", "rotational")) as f:
+                return f.read().strip() == "1"
+        except OSError:
+            continue
+    return None
+
+
+def storage_class(path) -> str:
+    """Guesses which kind of storage ``path`` lives on.
+
+    Only Linux exposes enough to tell: network filesystems are recognized by
+    their mount type, local disks by the ``rotational`` flag of their block
+    device. Everything else is ``STORAGE_UNKNOWN``.
+
+    Returns:
+        str: One of ``STORAGE_CLASSES``.
+    """
+    if not sys.platform.startswith("linux"):
+        return STORAGE_UNKNOWN
+    try:
+        fstype = _mount_fstype(path)
+        if fstype in NETWORK_FILESYSTEMS:
+            return STORAGE_NETWORK
+        rotational = _rotational(os.stat(path).st_dev)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Cannot determine storage class of {path}: {e}")
+        return STORAGE_UNKNOWN
+    if rotational is None:
+        return STORAGE_UNKNOWN
+    return STORAGE_HDD if rotational else STORAGE_SSD
+
+
+def timed_call(func, *args, **kwargs):
+    """Calls ``func`` and returns ``(result, seconds it took)``.
+
+    Module-level so it can wrap jobs sent to a process pool.
+    """
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+class ConcurrencyTuner:
+    """Finds the number of concurrent reads that maximizes throughput.
+
+    Callers report every finished read with ``record``. Once a window of
+    ``WINDOW`` reads spanning at least ``MIN_WINDOW_SECONDS`` is complete,
+    its throughput (bytes per second) is compared with the previous window's:
+    the limit keeps moving in the same direction while throughput improves
+    by more than ``TOLERANCE`` and turns around when it drops, so it settles
+    where adding readers stops paying off. On a spinning disk that is
+    usually one or two readers, on SSDs and network shares the maximum.
+
+    ``limit`` may be read from any thread.
+    """
+    WINDOW = 32
+    MIN_WINDOW_SECONDS = 0.25
+    TOLERANCE = 0.05
+
+    def __init__(self, minimum=1, maximum=1, initial=None):
+        self.minimum = max(1, int(minimum))
+        self.maximum = max(self.minimum, int(maximum))
+        initial = self.maximum if initial is None else initial
+        self.limit = min(self.maximum, max(self.minimum, int(initial)))
+        self._step = 1 if self.limit < self.maximum else -1
+        self._lock = threading.Lock()
+        self._previous = None
+        self._reset_window()
+        # Totals over the whole run
+        self.reads = 0
+        self.bytes_read = 0
+        self.read_seconds = 0.0
+
+    def _reset_window(self):
+        self._window_reads = 0
+        self._window_bytes = 0
+        self._window_started = time.monotonic()
+
+    def record(self, size, seconds):
+        """Records one finished read of ``size`` bytes that took ``seconds``.
+
+        Returns:
+            int: The concurrency limit to use from now on.
+        """
+        with self._lock:
+            self.reads += 1
+            self.bytes_read += size
+            self.read_seconds += seconds
+            self._window_reads += 1
+            self._window_bytes += size
+            elapsed = time.monotonic() - self._window_started
+            if self._window_reads >= self.WINDOW and elapsed >= self.MIN_WINDOW_SECONDS:
+                self._adjust(self._window_bytes / elapsed)
+                self._reset_window()
+            return self.limit
+
+    def _adjust(self, throughput):
+        if self.minimum == self.maximum:
+            return
+        previous, self._previous = self._previous, throughput
+        if previous is not None and throughput < previous * (1 - self.TOLERANCE):
+            self._step = -self._step
+        elif previous is not None and throughput < previous * (1 + self.TOLERANCE):
+            # No measurable difference: hold until the workload changes
+            return
+        limit = min(self.maximum, max(self.minimum, self.limit + self._step))
+        if limit == self.limit:
+            self._step = -self._step
+            return
+        logger.debug(f"Read concurrency {self.limit} -> {limit} "
+                     f"({throughput / 1e6:.1f} MB/s)")
+        self.limit = limit
+
+    def mean_latency(self) -> float:
+        """Returns the mean seconds per read so far."""
+        return self.read_seconds / self.reads if self.reads else 0.0
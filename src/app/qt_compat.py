@@ -0,0 +1,79 @@
+"""QtCore classes used by the indexing pipeline, with a fallback without Qt.
+
+Scanners only rely on ``QRunnable``, ``QObject`` and ``Signal``. When
+PySide6 is not installed, or ``PIC_ANALYZER_NO_QT`` is set in the
+environment (as ``python -m src.app.index`` does), minimal stand-ins are
+used instead. Their signals call connected slots directly on the emitting
+thread, which is what Qt does for the direct connections the headless
+indexer makes.
+"""
+import os
+import threading
+
+HAS_QT = False
+if not os.environ.get("PIC_ANALYZER_NO_QT"):
+    try:
+        from PySide6.QtCore import QRunnable, QObject, Signal
+        HAS_QT = True
+    except ImportError:
+        pass
+
+if not HAS_QT:
+
+    class _BoundSignal:
+        def __init__(self):
+            self._slots = []
+            self._lock = threading.Lock()
+
+        def connect(self, slot):
+            # Signals can be connected to other signals
+            slot = getattr(slot, "emit", slot)
+            with self._lock:
+                self._slots.append(slot)
+
+        def disconnect(self, slot=None):
+            with self._lock:
+                if slot is None:
+                    self._slots.clear()
+                else:
+                    self._slots.remove(getattr(slot, "emit", slot))
+
+        def emit(self, *args):
+            with self._lock:
+                slots = list(self._slots)
+            for slot in slots:
+                slot(*args)
+
+    class Signal:
+        """Class attribute creating one ``_BoundSignal`` per instance."""
+
+        def __init__(self, *types):
+            self._name = None
+
+        def __set_name__(self, owner, name):
+            self._name = "_signal_" + name
+
+        def __get__(self, instance, owner):
+            if instance is None:
+                return self
+            bound = instance.__dict__.get(self._name)
+            if bound is None:
+                bound = instance.__dict__.setdefault(self._name, _BoundSignal())
+            return bound
+
+    class QObject:
+        def __init__(self, parent=None):
+            pass
+
+    class QRunnable:
+        def __init__(self):
+            self._auto_delete = True
+
+        def setAutoDelete(self, auto_delete):
+            self._auto_delete = auto_delete
+
+        def autoDelete(self):
+            return self._auto_delete
+
+        def run(self):
+            pass
@@ -0,0 +1,136 @@
+import json
+import fnmatch
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ScanRules:
+    """Per-workspace rules deciding which directories and files a scan visits.
+
+    ``exclude`` holds glob patterns. A pattern without a slash is matched
+    against the name of every directory and file, one with a slash against
+    the path relative to the workspace root (always with forward slashes).
+    A trailing slash restricts a pattern to directories. Excluded
+    directories are pruned before they are listed, so nothing below them is
+    walked.
+
+    ``include`` optionally restricts files to names matching one of its
+    patterns, on top of the supported extensions. Files outside
+    ``[min_size, max_size]`` bytes are skipped; None disables a bound.
+    Symlinked directories are only entered with ``follow_symlinks``.
+
+    Rules are stored in the workspace database (see ``load`` and ``save``).
+    """
+    DEFAULT_EXCLUDE = (
+        ".*", # hidden files and directories, AppleDouble "._" files
+        "@eaDir", "#recycle", "#snapshot", # NAS metadata and bins
+        "$RECYCLE.BIN", "System Volume Information",
+        "__pycache__", "node_modules",
+    )
+    SETTINGS_KEY = "scan_rules"
+
+    def __init__(self, exclude=DEFAULT_EXCLUDE, include=(), min_size=None, max_size=None,
+                 follow_symlinks=False):
+        self.exclude = list(exclude)
+        self.include = list(include)
+        self.min_size = min_size
+        self.max_size = max_size
+        self.follow_symlinks = follow_symlinks
+        self._dir_names, self._dir_paths = self._split(
+            [p.rstrip("/") for p in self.exclude]
+        )
+        self._file_names, self._file_paths = self._split(
+            [p for p in self.exclude if not p.endswith("/")]
+        )
+
+    @staticmethod
+    def _split(patterns):
+        names = [p for p in patterns if "/" not in p]
+        paths = [p.lstrip("/") for p in patterns if "/" in p]
+        return names, paths
+
+    @staticmethod
+    def _matches(name, rel_path, names, paths) -> bool:
+        return (any(fnmatch.fnmatchcase(name, p) for p in names)
+                or any(fnmatch.fnmatchcase(rel_path, p) for p in paths))
+
+    def excludes_dir(self, rel_path: str) -> bool:
+        """Returns whether the directory at ``rel_path`` (relative, '/'-separated) is pruned."""
+        return self._matches(rel_path.rsplit("/", 1)[-1], rel_path,
+                             self._dir_names, self._dir_paths)
+
+    def accepts_file(self, rel_path: str, size: int = None) -> bool:
+        """Returns whether a supported image at ``rel_path`` is indexed.
+
+        Args:
+            rel_path (str): Path relative to the workspace root, '/'-separated.
+            size (int, optional): The file size. Size bounds are skipped if None.
+        """
+        name = rel_path.rsplit("/", 1)[-1]
+        if self._matches(name, rel_path, self._file_names, self._file_paths):
+            return False
+        if self.include and not any(fnmatch.fnmatchcase(name, p) for p in self.include):
+            return False
+        if size is not None:
+            if self.min_size is not None and size < self.min_size:
+                return False
+            if self.max_size is not None and size > self.max_size:
+                return False
+        return True
+
+    def excludes_path(self, rel_path: str) -> bool:
+        """Returns whether an indexed image at ``rel_path`` falls outside the rules.
+
+        Checks every parent directory and the file name, but not the size.
+        """
+        parts = rel_path.split("/")
+        for i in range(1, len(parts)):
+            if self.excludes_dir("/".join(parts[:i])):
+                return True
+        return not self.accepts_file(rel_path)
+
+    def to_dict(self) -> dict:
+        return {
+            "exclude": self.exclude,
+            "include": self.include,
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "follow_symlinks": self.follow_symlinks,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ScanRules":
+        defaults = cls().to_dict()
+        defaults.update({k: v for k, v in data.items() if k in defaults})
+        return cls(**defaults)
+
+    def __eq__(self, other):
+        return isinstance(other, ScanRules) and self.to_dict() == other.to_dict()
+
+    @classmethod
+    def load(cls, conn) -> "ScanRules":
+        """Returns the rules stored in a workspace database, or the defaults."""
+        try:
+            row = conn.execute(
+                "SELECT value FROM workspace_settings WHERE key = ?", (cls.SETTINGS_KEY,)
+            ).fetchone()
+            if row:
+                return cls.from_dict(json.loads(row[0]))
+        except Exception as e:
+            logger.warning(f"Failed to load scan rules, using defaults: {e}")
+        return cls()
+
+    def save(self, conn):
+        """Stores the rules in a workspace database.
+
+        If they changed, the directory index is dropped, so the next scan
+        lists every directory again and picks up newly included subtrees.
+        """
+        if self == ScanRules.load(conn):
+            return
+        conn.execute(
+            "INSERT OR REPLACE INTO workspace_settings (key, value) VALUES (?, ?)",
+            (self.SETTINGS_KEY, json.dumps(self.to_dict()))
+        )
+        conn.execute("DELETE FROM directories")
+        conn.commit()
@@ -1,8 +1,10 @@
 import os
 import logging
+import threading
 from typing import Optional, List
 from src.plugin.manager import PluginManager
 from src.app.database import DatabaseManager
+from src.app.global_cache import GlobalThumbnailCache
 
 logger = logging.getLogger(__name__)
 
@@ -11,7 +13,28 @@ class AppState:
     def __init__(self):
         self.current_folder: Optional[str] = None
         self.active_scanners: List = []
+        self._scanner_lock = threading.Lock()
         self.current_viewer_index: int = -1
+
+        # Settings
+        # Upper bound on thumbnail worker processes used by folder scans.
+        self.max_scan_workers: int = os.cpu_count() or 1
+        # Thumbnail decode path: "fast" (reduced decode) or "exact" (full decode).
+        self.thumbnail_quality: str = "fast"
+        # Use embedded EXIF previews when they are large enough.
+        self.use_embedded_thumbnails: bool = True
+        # Thumbnail storage: "jpeg" (smallest), "raw" (no decode when painting)
+        # or "raw-zlib" (raw pixels, deflated).
+        self.thumbnail_encoding: str = "jpeg"
+        # Opt-in user-level thumbnail cache shared by all workspaces (None, the
+        # default, keeps every thumbnail in the workspace) and the size its
+        # thumbnails are bounded to.
+        self.global_cache_dir: Optional[str] = None
+        self.global_cache_max_bytes: int = GlobalThumbnailCache.DEFAULT_MAX_BYTES
+        # Keep the open workspace in sync with the filesystem.
+        self.watch_workspace: bool = True
+        # Poll directory mtimes instead of using native change notifications.
+        self.watch_polling: bool = False
         
         # Core Services
         self.db_manager: Optional[DatabaseManager] = None
@@ -34,5 +57,40 @@ class AppState:
         self.current_folder = folder
         logger.info(f"Workspace changed to: {folder}")
 
+    def scanner_options(self) -> dict:
+        """Returns the scanner keyword arguments derived from the settings."""
+        return {
+            "max_workers": self.max_scan_workers,
+            "thumbnail_quality": self.thumbnail_quality,
+            "use_embedded_thumbnails": self.use_embedded_thumbnails,
+            "thumbnail_encoding": self.thumbnail_encoding,
+            "global_cache_dir": self.global_cache_dir,
+            "global_cache_max_bytes": self.global_cache_max_bytes,
+        }
+
+    def register_scanner(self, scanner):
+        """Tracks a scanner until it finishes, fails or is cancelled."""
+        with self._scanner_lock:
+            self.active_scanners.append(scanner)
+        signals = scanner.signals
+        signals.finished.connect(lambda: self.unregister_scanner(scanner))
+        signals.cancelled.connect(lambda: self.unregister_scanner(scanner))
+        signals.error.connect(lambda _message: self.unregister_scanner(scanner))
+
+    def unregister_scanner(self, scanner):
+        """Stops tracking a scanner. Safe to call from the scanner's thread."""
+        with self._scanner_lock:
+            if scanner in self.active_scanners:
+                self.active_scanners.remove(scanner)
+
+    def cancel_active_scans(self):
+        """Cancels every running scan, e.g. when the workspace is superseded."""
+        with self._scanner_lock:
+            scanners = list(self.active_scanners)
+        for scanner in scanners:
+            scanner.cancel()
+        if scanners:
+            logger.info(f"Cancelled {len(scanners)} superseded scan(s).")
+
 # Global instance
 state = AppState()
@@ -0,0 +1,357 @@
+import os
+import mmap
+import struct
+import logging
+import threading
+from src.ui.thumbnail_gen import ThumbnailGenerator
+from src.app.archives import image_source
+
+logger = logging.getLogger(__name__)
+
+class ThumbnailPack:
+    """Append-only file holding the encoded thumbnails of one workspace.
+
+    The pack lives next to the workspace database, which only stores the
+    ``(thumb_offset, thumb_length)`` of each thumbnail. Keeping the BLOBs out
+    of the ``images`` table keeps its rows small, so metadata queries stay
+    fast however many thumbnails exist.
+
+    Every record is a small header (magic and payload length) followed by
+    the payload. Offsets point at the payload; the header lets readers reject
+    offsets that no longer match the file, e.g. after an interrupted
+    compaction. Thumbnails are read through ``mmap`` and returned as
+    read-only ``memoryview`` slices, so no copy is made until they are
+    decoded.
+
+    Use ``ThumbnailPack.for_database`` to get the shared instance of a
+    workspace. Appends and compaction are serialized by ``lock``; callers
+    that also update the database should hold it until they committed.
+    """
+    MAGIC = b"PAT1"
+    HEADER = struct.Struct("<4sI")
+    # Compact once dead records take up this fraction of a pack that is at
+    # least COMPACT_MIN_BYTES large.
+    COMPACT_DEAD_RATIO = 0.5
+    COMPACT_MIN_BYTES = 1 << 20
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.RLock()
+        self._file = None
+        self._map = None
+
+    @staticmethod
+    def path_for(db_path: str) -> str:
+        """Returns the pack file that belongs to the database at ``db_path``."""
+        return os.path.splitext(db_path)[0] + ".thumbs"
+
+    @classmethod
+    def for_database(cls, db_path: str) -> "ThumbnailPack":
+        """Returns the pack shared by everyone using the database at ``db_path``."""
+        path = os.path.abspath(cls.path_for(db_path))
+        with cls._instances_lock:
+            pack = cls._instances.get(path)
+            if pack is None:
+                pack = cls._instances[path] = cls(path)
+            return pack
+
+    def append(self, data) -> int:
+        """Appends one thumbnail and returns the offset of its payload."""
+        with self.lock:
+            if self._file is None:
+                self._file = open(self.path, "ab")
+            self._file.seek(0, os.SEEK_END)
+            offset = self._file.tell() + self.HEADER.size
+            self._file.write(self.HEADER.pack(self.MAGIC, len(data)))
+            self._file.write(data)
+            self._file.flush()
+            return offset
+
+    def read(self, offset, length):
+        """Returns the thumbnail at ``offset`` as a ``memoryview``, or None.
+
+        None is returned when the entry does not match the pack, so callers
+        can regenerate the thumbnail. The view keeps the mapping alive, which
+        on Windows blocks ``compact``; copy it before keeping it around.
+        """
+        if offset is None or not length:
+            return None
+        start = offset - self.HEADER.size
+        if start < 0:
+            return None
+        with self.lock:
+            view = self._view(offset + length)
+        if view is None:
+            return None
+        magic, stored_length = self.HEADER.unpack_from(view, start)
+        if magic != self.MAGIC or stored_length != length:
+            return None
+        return view[offset:offset + length]
+
+    def _view(self, end):
+        """Returns a view of the mapped pack, remapping it if it grew past ``end``."""
+        if self._map is None or len(self._map) < end:
+            if self._file is not None:
+                self._file.flush()
+            try:
+                with open(self.path, "rb") as f:
+                    size = os.fstat(f.fileno()).st_size
+                    if size < end:
+                        return None
+                    # Views handed out earlier keep the previous mapping alive
+                    self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                return None
+        return memoryview(self._map)
+
+    def size(self) -> int:
+        """Returns the size of the pack file in bytes."""
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    # Tables referencing pack records through (thumb_offset, thumb_length)
+    TABLES = ("images", "thumbnail_levels")
+
+    def compact_if_needed(self, conn) -> bool:
+        """Compacts the pack when enough of it is dead records.
+
+        Args:
+            conn: An open connection to the workspace database.
+
+        Returns:
+            bool: True if the pack was compacted.
+        """
+        with self.lock:
+            size = self.size()
+            if size < self.COMPACT_MIN_BYTES:
+                return False
+            live_bytes = sum(
+                length + self.HEADER.size
+                for _, length in {entry[2:] for entry in self._live_entries(conn)}
+            )
+            if size - live_bytes < size * self.COMPACT_DEAD_RATIO:
+                # Keep the pruned rows, and leave no transaction open behind
+                conn.commit()
+                return False
+            self.compact(conn)
+            return True
+
+    def _prune_dead_rows(self, conn):
+        """Deletes rows whose records are dead although they are still referenced."""
+        # Levels of images that no longer exist
+        conn.execute(
+            "DELETE FROM thumbnail_levels WHERE image_id NOT IN (SELECT id FROM images)"
+        )
+
+    def _live_entries(self, conn):
+        """Returns ``(table, rowid, offset, length)`` of every referenced record."""
+        self._prune_dead_rows(conn)
+        entries = []
+        for table in self.TABLES:
+            entries.extend(
+                (table,) + row for row in conn.execute(
+                    f"SELECT rowid, thumb_offset, thumb_length FROM {table} "
+                    "WHERE thumb_length IS NOT NULL"
+                )
+            )
+        entries.sort(key=lambda entry: entry[2])
+        return entries
+
+    def compact(self, conn):
+        """Rewrites the pack with only the thumbnails referenced by ``conn``.
+
+        Records shared by several rows, such as those of identical images,
+        are copied once and stay shared. Entries that cannot be read are
+        dropped from the database, so their thumbnails are regenerated when
+        they are needed next. On failure the
+        database is rolled back and the partial copy removed. On Windows the
+        pack cannot be replaced while any view of it is alive, so views must
+        not be kept beyond decoding them (see ``read``).
+        """
+        with self.lock:
+            tmp_path = self.path + ".tmp"
+            updates = {table: [] for table in self.TABLES}
+            copied = {} # (old offset, length) -> new offset
+            try:
+                with open(tmp_path, "wb") as out:
+                    for table, rowid, offset, length in self._live_entries(conn):
+                        if (offset, length) in copied:
+                            updates[table].append((copied[offset, length], length, rowid))
+                            continue
+                        data = self.read(offset, length)
+                        if data is None:
+                            updates[table].append((None, None, rowid))
+                            continue
+                        copied[offset, length] = out.tell() + self.HEADER.size
+                        updates[table].append((copied[offset, length], length, rowid))
+                        out.write(self.HEADER.pack(self.MAGIC, length))
+                        out.write(data)
+                    out.flush()
+                    os.fsync(out.fileno())
+
+                before = self.size()
+                self.close()
+                for table, rows in updates.items():
+                    conn.executemany(
+                        f"UPDATE {table} SET thumb_offset = ?, thumb_length = ? WHERE rowid = ?",
+                        rows
+                    )
+                os.replace(tmp_path, self.path)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                raise
+            logger.info(f"Compacted thumbnail pack {self.path}: "
+                        f"{before} -> {self.size()} bytes")
+
+    def close(self):
+        """Closes the pack file. Views handed out earlier stay valid."""
+        with self.lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            # Dropping the reference keeps the mapping alive for exported views
+            self._map = None
+
+
+class ThumbnailPyramid:
+    """Serves thumbnails of one workspace at several resolutions.
+
+    Scans only produce the ``BASE_LEVEL`` thumbnail. Every other level is
+    generated the first time it is requested, from the smallest cached level
+    that is larger than it, so originals are only decoded again for levels
+    larger than anything cached. Generated levels are appended to the
+    workspace's ``ThumbnailPack`` and recorded in ``thumbnail_levels``.
+
+    Levels are identified by their bounding box in device pixels, so the
+    HiDPI variant of the 150px level is level 300. Base thumbnails held by the
+    ``GlobalThumbnailCache`` are found through ``global_cache``.
+    """
+    BASE_LEVEL = 150
+    # Logical cell sizes offered by the gallery
+    LEVELS = (64, 150, 300)
+    # Device pixel ratios for which sharp variants are kept
+    HIDPI_SCALES = (1, 2)
+    # Number of paths looked up per query
+    QUERY_BATCH_SIZE = 256
+
+    def __init__(self, conn, pack, thumbnail_quality=ThumbnailGenerator.QUALITY_FAST,
+                 use_embedded_thumbnails=False,
+                 thumbnail_encoding=ThumbnailGenerator.ENCODING_JPEG, global_cache=None):
+        self.conn = conn
+        self.pack = pack
+        self.global_cache = global_cache
+        self.thumbnail_quality = thumbnail_quality
+        self.use_embedded_thumbnails = use_embedded_thumbnails
+        self.thumbnail_encoding = thumbnail_encoding
+
+    @classmethod
+    def level_sizes(cls) -> list[int]:
+        """Returns every level in device pixels, smallest first."""
+        return sorted({size * scale for size in cls.LEVELS for scale in cls.HIDPI_SCALES})
+
+    @classmethod
+    def level_for(cls, size: int, device_pixel_ratio: float = 1.0) -> int:
+        """Returns the smallest level that covers a ``size`` px cell sharply."""
+        needed = size * device_pixel_ratio
+        sizes = cls.level_sizes()
+        return next((level for level in sizes if level >= needed), sizes[-1])
+
+    def load(self, paths, level):
+        """Returns the thumbnails of ``paths`` at ``level``.
+
+        Args:
+            paths (list[str]): Indexed image paths. Unknown paths are skipped.
+            level (int): One of ``level_sizes()``.
+
+        Returns:
+            list[tuple[str, bytes | memoryview]]: ``(path, thumbnail)`` pairs.
+        """
+        results = []
+        for start in range(0, len(paths), self.QUERY_BATCH_SIZE):
+            chunk = paths[start:start + self.QUERY_BATCH_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT id, path, thumb_offset, thumb_length, content_key FROM images "
+                f"WHERE path IN ({placeholders})", chunk
+            ).fetchall()
+            cached = {}
+            shared = {}
+            for img_id, _, offset, length, content_key in rows:
+                cached[img_id] = {}
+                if length:
+                    cached[img_id][self.BASE_LEVEL] = (offset, length)
+                elif content_key:
+                    shared[img_id] = content_key
+            if shared and self.global_cache is not None:
+                variant = self.global_cache.variant(
+                    ThumbnailGenerator.THUMBNAIL_SIZE, self.thumbnail_quality,
+                    self.use_embedded_thumbnails, self.thumbnail_encoding
+                )
+                found = self.global_cache.get_many(shared.values(), variant)
+                for img_id, content_key in shared.items():
+                    if content_key in found:
+                        cached[img_id][self.BASE_LEVEL] = found[content_key][0]
+            ids = list(cached)
+            id_placeholders = ",".join("?" * len(ids))
+            for img_id, cached_level, offset, length in self.conn.execute(
+                f"SELECT image_id, level, thumb_offset, thumb_length FROM thumbnail_levels "
+                f"WHERE image_id IN ({id_placeholders}) AND thumb_length IS NOT NULL", ids
+            ):
+                cached[img_id][cached_level] = (offset, length)
+
+            for img_id, path, _, _, _ in rows:
+                data = self._get(img_id, path, level, cached[img_id])
+                if data is not None:
+                    results.append((path, data))
+        return results
+
+    def _read(self, entry):
+        """Reads a cached level given as pack coordinates or as resolved data."""
+        return self.pack.read(*entry) if isinstance(entry, tuple) else entry
+
+    def _get(self, img_id, path, level, cached):
+        """Returns one thumbnail, generating and storing it if needed."""
+        if level in cached:
+            data = self._read(cached[level])
+            if data is not None:
+                return data
+
+        data = None
+        for larger in sorted(size for size in cached if size > level):
+            source = self._read(cached[larger])
+            if source is not None:
+                data = ThumbnailGenerator.downscale(
+                    source, (level, level), encoding=self.thumbnail_encoding
+                )
+                if data:
+                    break
+        if not data:
+            data, _ = ThumbnailGenerator.generate_with_source(
+                image_source(path), size=(level, level), quality=self.thumbnail_quality,
+                use_embedded=self.use_embedded_thumbnails, encoding=self.thumbnail_encoding
+            )
+        if not data:
+            return None
+
+        try:
+            with self.pack.lock:
+                offset = self.pack.append(data)
+                self.conn.execute(
+                    """INSERT OR REPLACE INTO thumbnail_levels
+                    (image_id, level, thumb_offset, thumb_length) VALUES (?, ?, ?, ?)""",
+                    (img_id, level, offset, len(data))
+                )
+                self.conn.commit()
+        except Exception as e:
+            logger.warning(f"Failed to store {level}px thumbnail for {path}: {e}")
+        return data
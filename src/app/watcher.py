@@ -0,0 +1,305 @@
+import os
+import sqlite3
+import logging
+import time
+import threading
+from PySide6.QtCore import QObject, QFileSystemWatcher, QThreadPool, QTimer, Qt, Signal
+from src.app.file_scanner import FolderScanner, DirectoryRefresher
+from src.app.archives import is_archive
+from src.app.io_tuning import storage_class, STORAGE_NETWORK
+
+logger = logging.getLogger(__name__)
+
+
+def entry_signature(path):
+    """Returns what a refresh of ``path`` depends on, or None if it is unreadable.
+
+    A directory is described by its subdirectories and the size and mtime of
+    the images and archives in it. Changes to anything else, such as the
+    workspace database with its WAL or journal, the thumbnail pack or
+    temporary files, leave the signature alone. An archive is described by
+    its own size and mtime.
+    """
+    try:
+        if is_archive(path):
+            st = os.stat(path)
+            return st.st_size, st.st_mtime_ns
+        signature = []
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir():
+                        signature.append((entry.name,))
+                    elif (is_archive(entry.name) or os.path.splitext(entry.name)[1].lower()
+                            in FolderScanner.SUPPORTED_EXTENSIONS):
+                        st = entry.stat()
+                        signature.append((entry.name, st.st_size, st.st_mtime_ns))
+                except OSError:
+                    continue
+        return frozenset(signature)
+    except OSError:
+        return None
+
+
+class WorkspaceWatcher(QObject):
+    """Keeps an indexed workspace in sync with the filesystem.
+
+    Every directory of the workspace is watched with ``QFileSystemWatcher``
+    (inotify on Linux). Directories the native watcher refuses, for example
+    when the inotify watch limit is exhausted or on some network shares, are
+    polled by comparing their mtimes instead, and so are archives, which are
+    indexed like directories but are files to the native watcher, and every
+    directory of a workspace on a network share, where native notifications
+    miss remote changes.
+
+    Notified and polled paths are checked on a probe thread, so thousands of
+    them never stall the GUI. A path only counts as changed when its
+    ``entry_signature`` did; the workspace database lives in the root, and
+    each refresh touching it must not trigger the next one. Changes are
+    debounced and batched into a single ``DirectoryRefresher`` run, so only
+    the affected directories are re-indexed and only the deltas are emitted.
+    """
+    files_found = Signal(list) # new or modified (path, thumbnail_bytes)
+    files_removed = Signal(list) # paths no longer on disk
+    # (generation, paths) whose signature changed, from the probe thread
+    _paths_changed = Signal(int, list)
+
+    DEBOUNCE_MS = 500
+    POLL_INTERVAL = 5.0 # seconds
+
+    def __init__(self, parent=None, force_polling=False):
+        super().__init__(parent)
+        self.force_polling = force_polling
+        self.poll_interval = self.POLL_INTERVAL
+        self.scanner_options = {}
+        self.folder_path = None
+        self.db_path = None
+        self.polling = force_polling
+
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.directoryChanged.connect(self._on_directory_changed)
+        self._dirty = set()
+        self._refresher = None
+
+        # Shared with the probe thread, guarded by ``_lock``
+        self._lock = threading.Lock()
+        self._polled = {} # path -> last seen mtime_ns, or None if unknown
+        self._notified = set()
+        self._generation = 0
+        self._wake = threading.Event()
+        self._probe_thread = None
+        self._paths_changed.connect(self._on_paths_changed, Qt.QueuedConnection)
+
+        self._debounce_timer = QTimer(self)
+        self._debounce_timer.setSingleShot(True)
+        self._debounce_timer.setInterval(self.DEBOUNCE_MS)
+        self._debounce_timer.timeout.connect(self._flush)
+
+    @property
+    def is_active(self) -> bool:
+        return self.folder_path is not None
+
+    def watched_directories(self) -> list[str]:
+        """Returns every directory currently watched natively or by polling."""
+        with self._lock:
+            polled = set(self._polled)
+        return sorted(set(self._watcher.directories()) | polled)
+
+    def start(self, folder_path: str, db_path: str, **scanner_options):
+        """Starts watching the directories indexed for ``folder_path``.
+
+        Args:
+            folder_path (str): The workspace root.
+            db_path (str): The workspace database holding the directory index.
+            **scanner_options: Keyword arguments for each ``DirectoryRefresher``.
+        """
+        self.stop()
+        self.folder_path = folder_path
+        self.db_path = db_path
+        self.scanner_options = scanner_options
+        self.polling = self.force_polling or storage_class(folder_path) == STORAGE_NETWORK
+
+        directories = {folder_path: None}
+        try:
+            conn = sqlite3.connect(db_path)
+            try:
+                directories.update(conn.execute("SELECT path, mtime_ns FROM directories"))
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Could not read directory index for watching: {e}")
+
+        self._add_directories(directories)
+        with self._lock:
+            polled = len(self._polled)
+        logger.info(f"Watching {len(directories)} directories under {folder_path} "
+                    f"({polled} polled)")
+        self._wake = threading.Event()
+        self._probe_thread = threading.Thread(
+            target=self._probe, args=(self._generation, self._wake),
+            name="watch-probe", daemon=True
+        )
+        self._probe_thread.start()
+
+    def stop(self):
+        """Stops watching and discards pending changes."""
+        if self._refresher is not None:
+            self._refresher.cancel()
+        self._debounce_timer.stop()
+        watched = self._watcher.directories()
+        if watched:
+            self._watcher.removePaths(watched)
+        with self._lock:
+            # Ends the probe thread of this workspace
+            self._generation += 1
+            self._polled.clear()
+            self._notified.clear()
+        self._wake.set()
+        if self._probe_thread is not None:
+            self._probe_thread.join()
+            self._probe_thread = None
+        self._dirty.clear()
+        self.folder_path = None
+        self.db_path = None
+
+    def _add_directories(self, directories: dict):
+        """Watches ``directories`` (path -> known mtime_ns or None)."""
+        failed = list(directories)
+        if not self.polling:
+            native = [path for path in directories if not is_archive(path)]
+            failed = [path for path in directories if is_archive(path)]
+            if native:
+                failed += self._watcher.addPaths(native)
+        with self._lock:
+            for path in failed:
+                self._polled[path] = directories[path]
+
+    def _remove_directories(self, directories):
+        directories = list(directories)
+        native = set(self._watcher.directories())
+        to_unwatch = [d for d in directories if d in native]
+        if to_unwatch:
+            self._watcher.removePaths(to_unwatch)
+        with self._lock:
+            for path in directories:
+                self._polled.pop(path, None)
+
+    def _on_directory_changed(self, path: str):
+        with self._lock:
+            self._notified.add(path)
+        self._wake.set()
+
+    def _probe(self, generation, wake):
+        """Checks notified paths, and polls the others, until ``stop``.
+
+        Runs on its own thread. Paths whose ``entry_signature`` changed are
+        handed to the GUI thread through ``_paths_changed``.
+        """
+        signatures = {} # path -> entry signature when last checked
+        next_poll = time.monotonic() + self.poll_interval
+        while True:
+            wake.wait(max(0.0, next_poll - time.monotonic()))
+            wake.clear()
+            polling = time.monotonic() >= next_poll
+            with self._lock:
+                if generation != self._generation:
+                    return
+                candidates, self._notified = self._notified, set()
+                polled = dict(self._polled) if polling else {}
+            if polling:
+                next_poll = time.monotonic() + self.poll_interval
+            mtimes = {}
+            for path, mtime in polled.items():
+                if generation != self._generation:
+                    return
+                try:
+                    current = os.stat(path).st_mtime_ns
+                except OSError:
+                    current = None
+                if current != mtime or mtime is None:
+                    # An unknown mtime was too recent to trust, or recorded
+                    # for a directory with images that failed to ingest
+                    mtimes[path] = current
+                    candidates.add(path)
+            changed = []
+            for path in candidates:
+                if generation != self._generation:
+                    return
+                signature = entry_signature(path)
+                if path not in signatures or signatures[path] != signature:
+                    changed.append(path)
+                signatures[path] = signature
+            with self._lock:
+                if generation != self._generation:
+                    return
+                for path, mtime in mtimes.items():
+                    if path in self._polled:
+                        self._polled[path] = mtime
+                if changed:
+                    # Under the lock, so nothing is emitted once ``stop`` returned
+                    self._paths_changed.emit(generation, sorted(changed))
+
+    def _on_paths_changed(self, generation: int, paths: list):
+        if generation != self._generation:
+            return # Probed for a previous workspace
+        self._dirty.update(paths)
+        self._debounce_timer.start()
+
+    def _flush(self):
+        """Starts one refresh for every directory that changed since the last one."""
+        if not self._dirty or not self.is_active:
+            return
+        if self._refresher is not None:
+            # A refresh is still running; pick these changes up afterwards.
+            return
+
+        directories = sorted(self._dirty)
+        self._dirty.clear()
+        logger.debug(f"Refreshing {len(directories)} changed directories")
+        refresher = DirectoryRefresher(
+            self.folder_path, directories, self.db_path, **self.scanner_options
+        )
+        refresher.setAutoDelete(False)
+        refresher.signals.files_found.connect(self._on_refresh_found)
+        refresher.signals.files_removed.connect(self._on_refresh_removed)
+        refresher.signals.finished.connect(self._on_refresh_done)
+        refresher.signals.error.connect(self._on_refresh_done)
+        refresher.signals.cancelled.connect(self._on_refresh_done)
+        self._refresher = refresher
+        QThreadPool.globalInstance().start(refresher)
+
+    def _is_current_refresh_sender(self) -> bool:
+        refresher = self._refresher
+        return (refresher is not None and self.sender() is refresher.signals
+                and not refresher.is_cancelled)
+
+    def _on_refresh_found(self, batch: list):
+        # Batches queued before ``stop`` belong to the previous workspace
+        if self._is_current_refresh_sender():
+            self.files_found.emit(batch)
+
+    def _on_refresh_removed(self, paths: list):
+        if self._is_current_refresh_sender():
+            self.files_removed.emit(paths)
+
+    def _on_refresh_done(self, *args):
+        refresher, self._refresher = self._refresher, None
+        if refresher is not None and self.is_active and refresher.folder_path == self.folder_path:
+            self._track_refreshed(refresher)
+        if self._dirty:
+            self._debounce_timer.start()
+
+    def _track_refreshed(self, refresher):
+        """Starts watching new directories and forgets removed ones."""
+        known = set(self.watched_directories())
+        new_dirs = {
+            path: record[1] for path, record in refresher.visited_dirs.items()
+            if path not in known
+        }
+        if new_dirs:
+            self._add_directories(new_dirs)
+        with self._lock:
+            for path, record in refresher.visited_dirs.items():
+                if path in self._polled:
+                    self._polled[path] = record[1]
+        self._remove_directories(refresher.removed_dirs)
@@ -39,11 +39,14 @@ class GroupedListWidget(QListWidget):
         self.setResizeMode(QListView.Adjust)
         self.setMovement(QListView.Static)
         self.setSpacing(2)
-        self.setIconSize(QSize(148, 148))
-        self.setGridSize(QSize(150, 150))
+        self.set_cell_size(150)
         self.setFrameShape(QListWidget.NoFrame)
         self.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
         self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
         self.setSelectionMode(QListWidget.ExtendedSelection)
         self.setItemDelegate(GalleryItemDelegate(self))
         self.setFocusPolicy(Qt.NoFocus)
+
+    def set_cell_size(self, size: int):
+        self.setIconSize(QSize(size - 2, size - 2))
+        self.setGridSize(QSize(size, size))
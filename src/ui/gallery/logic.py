@@ -1,9 +1,15 @@
 from PySide6.QtWidgets import QScrollArea, QListWidgetItem, QMenu, QLabel, QWidget
-from PySide6.QtCore import Qt, QSize, Signal, QTimer
-from PySide6.QtGui import QPixmap, QIcon
+from PySide6.QtCore import Qt, QPoint, QSize, Signal, QTimer
+from PySide6.QtGui import QPixmap, QIcon, QImage
+from src.ui.thumbnail_gen import ThumbnailGenerator
 from .layout import GalleryLayout, GroupedListWidget as BaseGroupedListWidget
 from .style import get_gallery_style
 
+RAW_IMAGE_FORMATS = {
+    ThumbnailGenerator.RAW_RGB888: QImage.Format_RGB888,
+    ThumbnailGenerator.RAW_ARGB32_PREMULTIPLIED: QImage.Format_ARGB32_Premultiplied,
+}
+
 class GroupedListWidget(BaseGroupedListWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -102,15 +108,31 @@ class GroupedListWidget(BaseGroupedListWidget):
         if self.count() == 0:
             self.setFixedHeight(0)
             return
-        width = self.width() if self.width() > 150 else 800
-        items_per_row = max(1, width // 150)
+        cell = self.gridSize()
+        width = self.width() if self.width() > cell.width() else 800
+        items_per_row = max(1, width // cell.width())
         rows = (self.count() + items_per_row - 1) // items_per_row
-        self.setFixedHeight(rows * 150 + 10)
+        self.setFixedHeight(rows * cell.height() + 10)
+
+    def rows_between(self, top, bottom):
+        """Returns the range of item rows drawn between the ``top`` and ``bottom`` y offsets."""
+        cell = self.gridSize()
+        items_per_row = max(1, self.viewport().width() // cell.width())
+        # One line of slack on each side for the spacing between cells
+        first = max(0, top // cell.height() - 1) * items_per_row
+        last = min(self.count(), (bottom // cell.height() + 2) * items_per_row)
+        return range(first, max(first, last))
 
 class GalleryView(QScrollArea):
     item_selected = Signal(str)
     item_activated = Signal(str)
     selection_mode_changed = Signal(bool)
+    thumbnail_size_changed = Signal(int)
+    # Emitted once scrolling, resizing or relayouting has settled
+    viewport_changed = Signal()
+
+    # Cell sizes the gallery can be zoomed through
+    THUMBNAIL_SIZES = (64, 150, 300)
 
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -120,6 +142,8 @@ class GalleryView(QScrollArea):
         
         self._items = []
         self._visible_items = []
+        self._item_map = {} # path -> item data
+        self._list_items = {} # path -> QListWidgetItem currently shown
         self._selection_mode_enabled = False
         self._group_widgets = []
         self._current_plugin = None
@@ -127,6 +151,18 @@ class GalleryView(QScrollArea):
         self._show_stats = False
         self._current_sort_plugin = None
         self._current_sort_metric = None
+        self._thumbnail_size = 150
+
+        self._refresh_timer = QTimer(self)
+        self._refresh_timer.setSingleShot(True)
+        self._refresh_timer.setInterval(50) # 50ms is enough for responsiveness
+        self._refresh_timer.timeout.connect(self.refresh_view)
+
+        self._viewport_timer = QTimer(self)
+        self._viewport_timer.setSingleShot(True)
+        self._viewport_timer.setInterval(100)
+        self._viewport_timer.timeout.connect(self.viewport_changed)
+        self.verticalScrollBar().valueChanged.connect(lambda _value: self._viewport_timer.start())
         
         # Overlays
         self.selection_overlay = None
@@ -174,6 +210,7 @@ class GalleryView(QScrollArea):
     def clear(self):
         self._items = []
         self._visible_items = []
+        self._item_map = {}
         self._clear_layout()
 
     def _clear_layout(self):
@@ -181,34 +218,131 @@ class GalleryView(QScrollArea):
             item = self.layout_engine.container_layout.takeAt(0)
             if item.widget(): item.widget().deleteLater()
         self._group_widgets = []
+        self._list_items = {}
+
+    def _new_list_item(self, item_data):
+        item = QListWidgetItem()
+        item.setData(Qt.UserRole, item_data['path'])
+        self._set_item_thumbnail(item, item_data['thumb'])
+        self._list_items[item_data['path']] = item
+        return item
+
+    def _set_item_thumbnail(self, item, thumb_bytes):
+        if thumb_bytes:
+            raw = ThumbnailGenerator.read_raw(thumb_bytes)
+            if raw:
+                # Raw thumbnails are wrapped as they are, no decode needed
+                width, height, bytes_per_line, pixel_format, pixels = raw
+                image = QImage(pixels, width, height, bytes_per_line, RAW_IMAGE_FORMATS[pixel_format])
+                item.setIcon(QIcon(QPixmap.fromImage(image)))
+                return
+            pixmap = QPixmap()
+            if pixmap.loadFromData(thumb_bytes):
+                item.setIcon(QIcon(pixmap))
 
     def add_item(self, file_path, thumb_bytes=None):
-        item_data = {'path': file_path, 'thumb': thumb_bytes}
-        self._items.append(item_data)
-        
-        # Debounce the refresh to avoid O(N^2) UI freezing
-        if not hasattr(self, "_refresh_timer"):
-            self._refresh_timer = QTimer()
-            self._refresh_timer.setSingleShot(True)
-            self._refresh_timer.setInterval(50) # 50ms is enough for responsiveness
-            self._refresh_timer.timeout.connect(self.refresh_view)
+        self.add_items([(file_path, thumb_bytes)])
+
+    def add_items(self, items):
+        """Adds a batch of ``(path, thumb_bytes)`` with a single layout update."""
+        new_items = []
+        for file_path, thumb_bytes in items:
+            if isinstance(thumb_bytes, memoryview):
+                # Pack views pin the pack's mapping, which blocks its compaction on Windows
+                thumb_bytes = thumb_bytes.tobytes()
+            # A path that is already known (e.g. modified on disk) is updated in place
+            item_data = self._item_map.get(file_path)
+            if item_data is not None:
+                item_data['thumb'] = thumb_bytes
+                list_item = self._list_items.get(file_path)
+                if list_item is not None:
+                    self._set_item_thumbnail(list_item, thumb_bytes)
+                continue
+
+            item_data = {'path': file_path, 'thumb': thumb_bytes}
+            self._items.append(item_data)
+            self._item_map[file_path] = item_data
+            new_items.append(item_data)
+        if not new_items: return
         
         # If no grouping and already initialized, we can append directly for better perf
         if not self._current_plugin and self._group_widgets:
-            self._visible_items.append(item_data)
+            self._visible_items.extend(new_items)
             list_widget = self._group_widgets[0]
-            item = QListWidgetItem()
-            item.setData(Qt.UserRole, file_path)
-            if thumb_bytes:
-                pixmap = QPixmap()
-                if pixmap.loadFromData(thumb_bytes):
-                    item.setIcon(QIcon(pixmap))
-            list_widget.addItem(item)
+            list_widget.setUpdatesEnabled(False)
+            for item_data in new_items:
+                list_widget.addItem(self._new_list_item(item_data))
+            list_widget.setUpdatesEnabled(True)
             # Re-adjust height after adding
             QTimer.singleShot(0, list_widget.adjust_height)
-        else:
-            if not self._refresh_timer.isActive():
-                self._refresh_timer.start()
+            self._viewport_timer.start()
+        elif not self._refresh_timer.isActive():
+            # Debounce the refresh to avoid O(N^2) UI freezing
+            self._refresh_timer.start()
+
+    def remove_items(self, file_paths):
+        """Removes the given paths from the gallery without rebuilding it."""
+        removed = {path for path in file_paths if self._item_map.pop(path, None) is not None}
+        if not removed: return
+        self._items = [item for item in self._items if item['path'] not in removed]
+        self._visible_items = [item for item in self._visible_items if item['path'] not in removed]
+        touched = set()
+        for path in removed:
+            list_item = self._list_items.pop(path, None)
+            if list_item is None: continue
+            list_widget = list_item.listWidget()
+            if list_widget is not None:
+                list_widget.takeItem(list_widget.row(list_item))
+                touched.add(list_widget)
+        for list_widget in touched:
+            list_widget.adjust_height()
+
+    def paths(self):
+        return [item['path'] for item in self._items]
+
+    def paths_near_viewport(self, margin=1.0):
+        """Returns the paths of the tiles in view, or within ``margin`` viewport heights of it."""
+        viewport = self.viewport()
+        extra = int(viewport.height() * margin)
+        top, bottom = -extra, viewport.height() + extra
+        paths = []
+        for group in self._group_widgets:
+            offset = group.mapTo(viewport, QPoint(0, 0)).y()
+            if offset + group.height() < top or offset > bottom:
+                continue
+            for row in group.rows_between(top - offset, bottom - offset):
+                paths.append(group.item(row).data(Qt.UserRole))
+        return paths
+
+    @property
+    def thumbnail_size(self):
+        return self._thumbnail_size
+
+    def set_thumbnail_size(self, size):
+        """Resizes every cell; the thumbnails themselves are swapped by the owner."""
+        if size == self._thumbnail_size: return
+        self._thumbnail_size = size
+        for group in self._group_widgets:
+            group.set_cell_size(size)
+            group.adjust_height()
+        self.thumbnail_size_changed.emit(size)
+        self._viewport_timer.start()
+
+    def zoom_in(self):
+        larger = [s for s in self.THUMBNAIL_SIZES if s > self._thumbnail_size]
+        if larger: self.set_thumbnail_size(larger[0])
+
+    def zoom_out(self):
+        smaller = [s for s in self.THUMBNAIL_SIZES if s < self._thumbnail_size]
+        if smaller: self.set_thumbnail_size(smaller[-1])
+
+    def wheelEvent(self, event):
+        if event.modifiers() & Qt.ControlModifier:
+            if event.angleDelta().y() > 0: self.zoom_in()
+            elif event.angleDelta().y() < 0: self.zoom_out()
+            event.accept()
+            return
+        super().wheelEvent(event)
 
     def set_grouping(self, plugin, granularity="month"):
         self._current_plugin = plugin
@@ -241,20 +375,16 @@ class GalleryView(QScrollArea):
             
             for group_name in sorted(groups.keys(), reverse=True):
                 self._create_group(group_name, groups[group_name])
+        self._viewport_timer.start()
 
     def _create_group(self, title, items):
         group_container, group_layout = self.layout_engine.create_group_container(title)
         
         list_widget = GroupedListWidget()
+        list_widget.set_cell_size(self._thumbnail_size)
         list_widget.set_selection_mode_enabled(self._selection_mode_enabled)
         for item_data in items:
-            item = QListWidgetItem()
-            item.setData(Qt.UserRole, item_data['path'])
-            if item_data['thumb']:
-                pixmap = QPixmap()
-                if pixmap.loadFromData(item_data['thumb']):
-                    item.setIcon(QIcon(pixmap))
-            list_widget.addItem(item)
+            list_widget.addItem(self._new_list_item(item_data))
         
         list_widget.itemClicked.connect(lambda it: self.item_selected.emit(it.data(Qt.UserRole)))
         # Only emit activated signal if NOT in selection mode
@@ -283,6 +413,7 @@ class GalleryView(QScrollArea):
         for group in self._group_widgets:
             group.adjust_height()
         self._reposition_overlays()
+        self._viewport_timer.start()
 
     def keyPressEvent(self, event):
         if event.key() == Qt.Key_Escape and self._selection_mode_enabled:
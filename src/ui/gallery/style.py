@@ -1,4 +1,4 @@
-from PySide6.QtWidgets import QStyledItemDelegate, QStyle
+from PySide6.QtWidgets import QApplication, QStyledItemDelegate, QStyle
 from PySide6.QtCore import Qt, QSize, QRect, QPoint
 from PySide6.QtGui import QColor, QPen, QPalette
 from src.ui.theme import Theme
@@ -27,11 +27,13 @@ class GalleryItemDelegate(QStyledItemDelegate):
             bg_color.setAlpha(30)
             painter.fillRect(option.rect, bg_color)
 
-        # Draw Icon
+        # Draw Icon, or a placeholder while there is no thumbnail
         icon = index.data(Qt.DecorationRole)
-        if icon:
-            icon_rect = option.rect.adjusted(4, 4, -4, -4)
+        icon_rect = option.rect.adjusted(4, 4, -4, -4)
+        if icon and not icon.isNull():
             icon.paint(painter, icon_rect, Qt.AlignCenter)
+        else:
+            self._paint_placeholder(painter, icon_rect, palette)
 
         # Draw Checkbox
         view = self.parent()
@@ -58,8 +60,22 @@ class GalleryItemDelegate(QStyledItemDelegate):
         
         painter.restore()
 
+    def _paint_placeholder(self, painter, rect, palette):
+        placeholder = QColor(palette.color(QPalette.Mid))
+        placeholder.setAlpha(80)
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(placeholder)
+        painter.drawRoundedRect(rect, Theme.RADIUS_S, Theme.RADIUS_S)
+        view = self.parent()
+        style = view.style() if view is not None else QApplication.style()
+        glyph = style.standardIcon(QStyle.SP_FileIcon)
+        size = max(16, min(rect.width(), rect.height()) // 3)
+        glyph.paint(painter, QRect(rect.center().x() - size // 2, rect.center().y() - size // 2,
+                                   size, size), Qt.AlignCenter)
+
     def sizeHint(self, option, index) -> QSize:
-        return QSize(150, 150)
+        view = self.parent()
+        return view.gridSize() if view is not None else QSize(150, 150)
 
 def get_gallery_style():
     # Rely more on system colors for text
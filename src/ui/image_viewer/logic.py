@@ -1,6 +1,7 @@
 from PySide6.QtWidgets import QFrame, QLabel, QGraphicsOpacityEffect
-from PySide6.QtCore import Qt, QSize, Signal, QPropertyAnimation, QEasingCurve, QParallelAnimationGroup, QPoint, QMargins
+from PySide6.QtCore import Qt, QSize, Signal, QPropertyAnimation, QEasingCurve, QParallelAnimationGroup, QPoint, QMargins, QBuffer, QByteArray
 from PySide6.QtGui import QPixmap, QMovie
+from src.app.archives import split_member_path, read_member
 from .layout import ImageViewerLayout
 from .style import get_style
 
@@ -42,10 +43,33 @@ class ImageViewer(QFrame):
         if movie_size.isEmpty(): return target_rect_size
         return movie_size.scaled(target_rect_size, Qt.KeepAspectRatio)
 
+    def _load_movie(self, file_path: str) -> QMovie:
+        if split_member_path(file_path) is None:
+            return QMovie(file_path)
+        # Archive members are played from memory
+        movie = QMovie()
+        try:
+            buffer = QBuffer(movie)
+            buffer.setData(QByteArray(read_member(file_path)))
+            movie.setDevice(buffer)
+        except OSError:
+            pass
+        return movie
+
+    def _load_pixmap(self, file_path: str) -> QPixmap:
+        if split_member_path(file_path) is None:
+            return QPixmap(file_path)
+        pixmap = QPixmap()
+        try:
+            pixmap.loadFromData(read_member(file_path))
+        except OSError:
+            pass
+        return pixmap
+
     def _set_media(self, label: QLabel, file_path: str) -> QMovie:
         label.clear()
         if file_path.lower().endswith(('.gif', '.webp')):
-            movie = QMovie(file_path)
+            movie = self._load_movie(file_path)
             if movie.isValid():
                 label.setMovie(movie)
                 movie.jumpToFrame(0)
@@ -56,7 +80,7 @@ class ImageViewer(QFrame):
                 movie.start()
                 return movie
         
-        pixmap = QPixmap(file_path)
+        pixmap = self._load_pixmap(file_path)
         if not pixmap.isNull():
             label.setPixmap(pixmap.scaled(
                 self.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation
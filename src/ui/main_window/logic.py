@@ -8,8 +8,12 @@ from PySide6.QtCore import Qt, QThreadPool, QPoint, QEvent
 from PySide6.QtGui import QStandardItemModel, QStandardItem, QPixmap, QAction, QCursor
 
 from src.app.state import state
-from src.app.file_scanner import FolderScanner
+from src.app.file_scanner import FolderScanner, ThumbnailLevelLoader, WorkspaceMaintenance
+from src.app.watcher import WorkspaceWatcher
 from src.app.file_ops import hide_file
+from src.app.archives import path_exists, container_of, split_member_path
+from src.app.database import DatabaseManager
+from src.app.thumb_store import ThumbnailPack, ThumbnailPyramid
 from src.ui.overlays.sort.logic import SortOverlay
 from src.ui.common.toast.logic import Toast
 
@@ -52,6 +56,16 @@ class MainWindow(QMainWindow):
             self.layout_engine.image_viewer
         )
         
+        # Filesystem watcher for the open workspace
+        self._active_scanner = None
+        self._level_loader = None
+        # Pyramid level the gallery tiles should hold, and the paths loaded
+        # at it; None while every tile holds the base level scans deliver
+        self._tile_level = ThumbnailPyramid.BASE_LEVEL
+        self._level_paths = None
+        self._maintenance = None
+        self.watcher = WorkspaceWatcher(self, force_polling=state.watch_polling)
+
         self._setup_connections()
         self._setup_menus()
 
@@ -75,6 +89,8 @@ class MainWindow(QMainWindow):
         l.gallery.item_selected.connect(self._on_item_selected)
         l.gallery.item_activated.connect(self._open_image_viewer)
         l.gallery.selection_mode_changed.connect(l.selection_overlay.setVisible)
+        l.gallery.thumbnail_size_changed.connect(lambda _size: self._load_thumbnail_level())
+        l.gallery.viewport_changed.connect(self._load_thumbnail_level)
         
         l.image_viewer.next_requested.connect(self._on_next_image)
         l.image_viewer.prev_requested.connect(self._on_prev_image)
@@ -83,6 +99,10 @@ class MainWindow(QMainWindow):
         l.selection_overlay.invertSelectionRequested.connect(self._on_invert_selection)
         l.selection_overlay.cancelRequested.connect(self._on_cancel_selection)
 
+        self.watcher.files_found.connect(l.gallery.add_items)
+        self.watcher.files_found.connect(self._on_base_tiles)
+        self.watcher.files_removed.connect(l.gallery.remove_items)
+
     def _setup_menus(self):
         l = self.layout_engine
         self._menu_cache = {
@@ -94,8 +114,28 @@ class MainWindow(QMainWindow):
         self.open_folder_action = l.file_menu.addAction("&Open Folder")
         self.open_folder_action.setShortcut("Ctrl+O")
         self.open_folder_action.triggered.connect(self._on_open_folder)
+
+        self.watch_action = l.file_menu.addAction("&Watch Folder for Changes")
+        self.watch_action.setCheckable(True)
+        self.watch_action.setChecked(state.watch_workspace)
+        self.watch_action.toggled.connect(self._on_watch_toggled)
+
+        self.pause_scan_action = l.file_menu.addAction("&Pause Scanning")
+        self.pause_scan_action.setCheckable(True)
+        self.pause_scan_action.toggled.connect(self._on_pause_toggled)
+        self.stop_scan_action = l.file_menu.addAction("&Stop Scanning")
+        self.stop_scan_action.triggered.connect(self._on_stop_scan)
+        self.compact_action = l.file_menu.addAction("&Compact Workspace")
+        self.compact_action.triggered.connect(self._on_compact_workspace)
         
         # View Menu
+        self.zoom_in_action = l.view_menu.addAction("&Larger Thumbnails")
+        self.zoom_in_action.setShortcut("Ctrl++")
+        self.zoom_in_action.triggered.connect(l.gallery.zoom_in)
+        self.zoom_out_action = l.view_menu.addAction("&Smaller Thumbnails")
+        self.zoom_out_action.setShortcut("Ctrl+-")
+        self.zoom_out_action.triggered.connect(l.gallery.zoom_out)
+
         self.group_menu = l.view_menu.addMenu("Group By")
         self._menu_cache["View/Group By"] = self.group_menu
         self.group_menu.addAction("None").triggered.connect(lambda: l.gallery.set_grouping(None))
@@ -169,14 +209,14 @@ class MainWindow(QMainWindow):
         self.layout_engine.gallery.apply_sort(metric, plugin, values)
 
     def _on_item_selected(self, file_path: str):
-        if not os.path.exists(file_path): return
+        if not path_exists(file_path): return
         
         # Try to get metadata from database
         metadata = state.db_manager.get_image_metadata(file_path)
         
         if not metadata:
-            # Fallback to filesystem
-            stats = os.stat(file_path)
+            # Fallback to filesystem (archive members report their archive)
+            stats = os.stat(container_of(file_path) if split_member_path(file_path) else file_path)
             metadata = {
                 "Filename": os.path.basename(file_path),
                 "Path": file_path,
@@ -209,15 +249,144 @@ class MainWindow(QMainWindow):
             self._start_scan(folder)
 
     def _start_scan(self, path: str):
+        # Superseded scans stop at their next checkpoint
+        state.cancel_active_scans()
+        self._cancel_level_loader()
+        self._active_scanner = None
+        self.pause_scan_action.setChecked(False)
+        # Refreshes of the previous workspace must not refill the gallery
+        self.watcher.stop()
         self.layout_engine.gallery.clear()
-        db_path = os.path.join(path, ".pic_analyzer.db")
+        self._tile_level = ThumbnailPyramid.BASE_LEVEL
+        self._level_paths = None
+        db_path = DatabaseManager.workspace_db_path(path)
         state.db_manager.switch_database(db_path)
         hide_file(db_path)
-        scanner = FolderScanner(path, db_path)
-        scanner.signals.file_found.connect(self.layout_engine.gallery.add_item)
-        state.active_scanners.append(scanner)
+        scanner = FolderScanner(
+            path, db_path, incremental=True, snapshot=True, **state.scanner_options()
+        )
+        scanner.signals.files_found.connect(self._on_scan_batch)
+        scanner.signals.files_removed.connect(self._on_scan_removed)
+        scanner.signals.finished.connect(self._on_scan_finished)
+        self._active_scanner = scanner
+        state.register_scanner(scanner)
         QThreadPool.globalInstance().start(scanner)
 
+    def _is_active_scan_sender(self) -> bool:
+        scanner = self._active_scanner
+        return scanner is not None and self.sender() is scanner.signals
+
+    def _on_scan_batch(self, batch: list):
+        # Batches queued by a superseded scan must not reach the new gallery
+        if self._is_active_scan_sender():
+            self.layout_engine.gallery.add_items(batch)
+
+    def _on_scan_removed(self, paths: list):
+        if self._is_active_scan_sender():
+            self.layout_engine.gallery.remove_items(paths)
+
+    def _on_pause_toggled(self, paused: bool):
+        if self._active_scanner is None:
+            return
+        if paused:
+            self._active_scanner.pause()
+        else:
+            self._active_scanner.resume()
+
+    def _on_stop_scan(self):
+        if self._active_scanner is not None:
+            self._active_scanner.cancel()
+            self._active_scanner = None
+        self.pause_scan_action.setChecked(False)
+
+    def _on_scan_finished(self):
+        if not self._is_active_scan_sender():
+            return # A superseded scan finished
+        scanner = self._active_scanner
+        self._active_scanner = None
+        hide_file(ThumbnailPack.path_for(scanner.db_path))
+        self._load_thumbnail_level()
+        if state.watch_workspace:
+            self.watcher.start(scanner.folder_path, scanner.db_path, **state.scanner_options())
+
+    def _load_thumbnail_level(self):
+        """Swaps the gallery tiles for the pyramid level matching the cell size.
+
+        Only tiles in or near the viewport are loaded, so levels missing from
+        the pack are generated for what is on screen rather than the whole
+        library; the rest follows as the gallery scrolls. Scans deliver the
+        base level, so nothing is loaded while it matches.
+        """
+        self._cancel_level_loader()
+        if self._active_scanner is not None or not state.current_folder:
+            return # Picked up once the running scan has finished
+        gallery = self.layout_engine.gallery
+        level = ThumbnailPyramid.level_for(gallery.thumbnail_size, self.devicePixelRatioF())
+        if level != self._tile_level:
+            self._tile_level = level
+            self._level_paths = set()
+        if self._level_paths is None:
+            return
+        paths = [path for path in gallery.paths_near_viewport()
+                 if path not in self._level_paths]
+        if not paths:
+            return
+        options = state.scanner_options()
+        options.pop("max_workers")
+        loader = ThumbnailLevelLoader(state.db_manager.db_path, paths, level, **options)
+        loader.signals.files_found.connect(self._on_level_batch)
+        self._level_loader = loader
+        QThreadPool.globalInstance().start(loader)
+
+    def _cancel_level_loader(self):
+        if self._level_loader is not None:
+            self._level_loader.cancel()
+            self._level_loader = None
+
+    def _on_level_batch(self, batch: list):
+        loader = self._level_loader
+        if loader is not None and self.sender() is loader.signals:
+            self.layout_engine.gallery.add_items(batch)
+            self._level_paths.update(path for path, _ in batch)
+
+    def _on_base_tiles(self, batch: list):
+        """Reloads the level of tiles the watcher reset to the base thumbnail."""
+        if self._level_paths is not None:
+            self._level_paths.difference_update(path for path, _ in batch)
+            self._load_thumbnail_level()
+
+    def _on_watch_toggled(self, enabled: bool):
+        state.watch_workspace = enabled
+        if not enabled:
+            self.watcher.stop()
+        elif state.current_folder and self._active_scanner is None:
+            self.watcher.start(
+                state.current_folder, state.db_manager.db_path, **state.scanner_options()
+            )
+
+    def _on_compact_workspace(self):
+        """Prunes vanished images from the workspace and shrinks its files."""
+        if not state.current_folder or self._maintenance is not None:
+            return
+        maintenance = WorkspaceMaintenance(state.db_manager.db_path)
+        maintenance.setAutoDelete(False)
+        maintenance.signals.files_removed.connect(self.layout_engine.gallery.remove_items)
+        maintenance.signals.finished.connect(self._on_compact_finished)
+        maintenance.signals.error.connect(self._on_compact_finished)
+        self._maintenance = maintenance
+        self.compact_action.setEnabled(False)
+        QThreadPool.globalInstance().start(maintenance)
+
+    def _on_compact_finished(self, *args):
+        maintenance, self._maintenance = self._maintenance, None
+        self.compact_action.setEnabled(True)
+        if maintenance is not None and maintenance.result is not None:
+            result = maintenance.result
+            self.toast.show_message(
+                f"Removed {len(result['removed_paths'])} missing images, "
+                f"freed {max(0, result['bytes_freed']) / 1024:.0f} KB"
+            )
+
     # Plugin Hooks
     def get_menu(self, path: str) -> QMenu:
         """
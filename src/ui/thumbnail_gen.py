@@ -1,31 +1,259 @@
-from PIL import Image
+from PIL import Image, ExifTags
 import io
+import zlib
+import struct
 import logging
 
 logger = logging.getLogger(__name__)
 
+# EXIF IFD1 tags locating the embedded JPEG preview
+JPEG_INTERCHANGE_FORMAT = 0x0201
+JPEG_INTERCHANGE_FORMAT_LENGTH = 0x0202
+
+# Header of raw-pixel thumbnails: magic, width, height, pixel format,
+# compression, padding
+RAW_MAGIC = b"PARW"
+RAW_HEADER = struct.Struct("<4sHHBBxx")
+
 class ThumbnailGenerator:
-    """Utility class to generate thumbnails from image files."""
-    
+    """Utility class to generate thumbnails from image files.
+
+    Two decode paths are available:
+
+    * ``"fast"`` (default) only decodes as many pixels as the thumbnail needs.
+      JPEGs are downscaled in the DCT domain while decoding (``Image.draft``),
+      other formats are shrunk by an integer factor with ``Image.reduce``
+      before the final resample.
+    * ``"exact"`` decodes the image at native resolution and resamples it
+      with Lanczos, trading speed for the best possible quality.
+
+    Optionally, the preview many cameras embed in the EXIF data (IFD1) is
+    used instead of decoding the main image, as long as it is at least as
+    large as the requested thumbnail and has the same aspect ratio.
+
+    Thumbnails are encoded as JPEG by default. The ``"raw"`` encodings store
+    the pixels behind a small header instead (see ``read_raw``), so views can
+    wrap them in a ``QImage`` without decoding, at the cost of disk space.
+    ``"raw-zlib"`` deflates the pixels, which is far cheaper to undo than a
+    JPEG decode.
+    """
+    QUALITY_FAST = "fast"
+    QUALITY_EXACT = "exact"
+    QUALITIES = (QUALITY_FAST, QUALITY_EXACT)
+
+    # Bounding box of the thumbnails produced by folder scans
+    THUMBNAIL_SIZE = (150, 150)
+
+    # The final resample of the fast path shrinks by at least this factor,
+    # which keeps the result visually indistinguishable from the exact path.
+    FAST_REDUCING_GAP = 2.0
+
+    # Thumbnail source reported for embedded EXIF previews; decoded
+    # thumbnails report the quality they were decoded with.
+    SOURCE_EMBEDDED = "embedded"
+    # Maximum relative difference between the aspect ratios of an embedded
+    # preview and its main image. Rejects letterboxed previews.
+    EMBEDDED_ASPECT_TOLERANCE = 0.02
+
+    ENCODING_JPEG = "jpeg"
+    ENCODING_RAW = "raw"
+    ENCODING_RAW_ZLIB = "raw-zlib"
+    ENCODINGS = (ENCODING_JPEG, ENCODING_RAW, ENCODING_RAW_ZLIB)
+
+    # Pixel formats of raw thumbnails. ARGB32 is premultiplied and stored in
+    # little-endian order (B, G, R, A bytes), matching QImage's native layout.
+    RAW_RGB888 = 1
+    RAW_ARGB32_PREMULTIPLIED = 2
+    RAW_BYTES_PER_PIXEL = {RAW_RGB888: 3, RAW_ARGB32_PREMULTIPLIED: 4}
+
     @staticmethod
-    def generate(image_path, size=(150, 150)):
+    def generate(image_path, size=(150, 150), quality=QUALITY_FAST):
         """
         Generates a thumbnail for the given image and returns it as bytes.
+
+        Args:
+            image_path (str): Path to the source image.
+            size (tuple[int, int]): Bounding box of the thumbnail.
+            quality (str): ``"fast"`` or ``"exact"`` decoding (see class docs).
+
+        Returns:
+            bytes: The JPEG encoded thumbnail, or None if the image could not
+            be read.
         """
+        return ThumbnailGenerator.generate_with_source(image_path, size, quality)[0]
+
+    @staticmethod
+    def generate_with_source(image_path, size=(150, 150), quality=QUALITY_FAST,
+                             use_embedded=False, encoding=ENCODING_JPEG):
+        """
+        Generates a thumbnail and reports which path produced it.
+
+        Args:
+            image_path (str | file object): Path to the source image, or the
+                image already read into memory (see ``src.app.ingest``).
+            size (tuple[int, int]): Bounding box of the thumbnail.
+            quality (str): ``"fast"`` or ``"exact"`` decoding (see class docs).
+            use_embedded (bool): Try the embedded EXIF preview first.
+            encoding (str): One of ``ENCODINGS`` (see class docs).
+
+        Returns:
+            tuple[bytes, str]: The encoded thumbnail and its source
+            (``"embedded"``, ``"fast"`` or ``"exact"``), or ``(None, None)``
+            if the image could not be read.
+        """
+        name = getattr(image_path, "name", image_path)
         try:
-            logger.debug(f"Opening image for thumbnail: {image_path}")
+            logger.debug(f"Opening image for thumbnail: {name}")
             with Image.open(image_path) as img:
-                # Convert to RGB if necessary (e.g., for GIFs/P-mode images)
-                if img.mode in ("P", "RGBA"):
-                    img = img.convert("RGB")
-                    
-                # Use thumbnail() which maintains aspect ratio
-                img.thumbnail(size)
-                
-                # Save to buffer
-                buffer = io.BytesIO()
-                img.save(buffer, format="JPEG", quality=85)
-                return buffer.getvalue()
+                if use_embedded:
+                    thumb_bytes = ThumbnailGenerator._from_embedded(img, size, encoding)
+                    if thumb_bytes:
+                        return thumb_bytes, ThumbnailGenerator.SOURCE_EMBEDDED
+
+                # Palette images can only be resized with nearest-neighbour,
+                # so they have to be expanded before resampling.
+                if img.mode == "P":
+                    img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+
+                if quality == ThumbnailGenerator.QUALITY_EXACT:
+                    img.load()
+                    img.thumbnail(size, resample=Image.LANCZOS, reducing_gap=None)
+                else:
+                    quality = ThumbnailGenerator.QUALITY_FAST
+                    gap = ThumbnailGenerator.FAST_REDUCING_GAP
+                    # Ask the JPEG decoder for RGB output at a reduced scale
+                    img.draft("RGB", (int(size[0] * gap), int(size[1] * gap)))
+                    img.thumbnail(size, resample=Image.BICUBIC, reducing_gap=gap)
+
+                # Encoding converts after resizing, so only the small image is converted
+                return ThumbnailGenerator._encode(img, encoding), quality
+        except Exception as e:
+            logger.error(f"Error generating thumbnail for {name}: {e}")
+            return None, None
+
+    @staticmethod
+    def downscale(thumb_bytes, size, encoding=ENCODING_JPEG):
+        """
+        Shrinks an encoded thumbnail to fit ``size`` without touching the original.
+
+        Args:
+            thumb_bytes (bytes | memoryview): A previously generated thumbnail
+                in any encoding.
+            size (tuple[int, int]): Bounding box of the smaller thumbnail.
+            encoding (str): Encoding of the result, one of ``ENCODINGS``.
+
+        Returns:
+            bytes: The encoded thumbnail, or None if it could not be read.
+        """
+        try:
+            raw = ThumbnailGenerator.read_raw(thumb_bytes)
+            if raw:
+                width, height, bytes_per_line, pixel_format, pixels = raw
+                if pixel_format == ThumbnailGenerator.RAW_ARGB32_PREMULTIPLIED:
+                    img = Image.frombuffer("RGBA", (width, height), pixels,
+                                           "raw", "BGRa", bytes_per_line, 1)
+                else:
+                    img = Image.frombuffer("RGB", (width, height), pixels,
+                                           "raw", "RGB", bytes_per_line, 1)
+            else:
+                img = Image.open(io.BytesIO(thumb_bytes))
+            with img:
+                img.thumbnail(size, resample=Image.LANCZOS)
+                return ThumbnailGenerator._encode(img, encoding)
+        except Exception as e:
+            logger.error(f"Error downscaling thumbnail: {e}")
+            return None
+
+    @staticmethod
+    def read_raw(thumb_bytes):
+        """
+        Parses a raw-pixel thumbnail.
+
+        Args:
+            thumb_bytes (bytes | memoryview): An encoded thumbnail.
+
+        Returns:
+            tuple: ``(width, height, bytes_per_line, pixel_format, pixels)``,
+            or None if the thumbnail is not raw or is truncated. ``pixels`` is
+            a view of ``thumb_bytes`` unless it had to be decompressed.
+        """
+        if len(thumb_bytes) < RAW_HEADER.size or thumb_bytes[:4] != RAW_MAGIC:
+            return None
+        _, width, height, pixel_format, compressed = RAW_HEADER.unpack_from(thumb_bytes)
+        bytes_per_pixel = ThumbnailGenerator.RAW_BYTES_PER_PIXEL.get(pixel_format)
+        if bytes_per_pixel is None:
+            return None
+        pixels = memoryview(thumb_bytes)[RAW_HEADER.size:]
+        if compressed:
+            try:
+                pixels = zlib.decompress(pixels)
+            except zlib.error:
+                return None
+        bytes_per_line = width * bytes_per_pixel
+        if len(pixels) != bytes_per_line * height:
+            return None
+        return width, height, bytes_per_line, pixel_format, pixels
+
+    @staticmethod
+    def _encode(img, encoding):
+        """Encodes a thumbnail-sized image in ``encoding``."""
+        if encoding in (ThumbnailGenerator.ENCODING_RAW, ThumbnailGenerator.ENCODING_RAW_ZLIB):
+            if "A" in img.getbands():
+                pixel_format = ThumbnailGenerator.RAW_ARGB32_PREMULTIPLIED
+                pixels = img.convert("RGBA").tobytes("raw", "BGRa")
+            else:
+                pixel_format = ThumbnailGenerator.RAW_RGB888
+                pixels = img.convert("RGB").tobytes()
+            compressed = encoding == ThumbnailGenerator.ENCODING_RAW_ZLIB
+            if compressed:
+                pixels = zlib.compress(pixels, 1)
+            header = RAW_HEADER.pack(RAW_MAGIC, img.width, img.height, pixel_format, compressed)
+            return header + pixels
+
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        buffer = io.BytesIO()
+        img.save(buffer, format="JPEG", quality=85)
+        return buffer.getvalue()
+
+    @staticmethod
+    def _from_embedded(img, size, encoding=ENCODING_JPEG):
+        """Returns a thumbnail built from the EXIF preview of ``img``, or None.
+
+        Only the EXIF segment is read; the main image is never decoded.
+        """
+        exif_data = img.info.get("exif")
+        if not exif_data:
+            return None
+        try:
+            ifd1 = img.getexif().get_ifd(ExifTags.IFD.IFD1)
+            offset = ifd1.get(JPEG_INTERCHANGE_FORMAT)
+            length = ifd1.get(JPEG_INTERCHANGE_FORMAT_LENGTH)
+            if not offset or not length:
+                return None
+            # Offsets are relative to the TIFF header following "Exif\0\0"
+            tiff_start = 6 if exif_data.startswith(b"Exif\x00\x00") else 0
+            preview = exif_data[tiff_start + offset:tiff_start + offset + length]
+
+            with Image.open(io.BytesIO(preview)) as embedded:
+                width, height = img.size
+                emb_width, emb_height = embedded.size
+                main_aspect = width / height
+                aspect_error = abs(emb_width / emb_height - main_aspect) / main_aspect
+                if aspect_error > ThumbnailGenerator.EMBEDDED_ASPECT_TOLERANCE:
+                    return None
+                # The preview must cover the thumbnail the main image would give
+                scale = min(size[0] / width, size[1] / height, 1.0)
+                target = (round(width * scale), round(height * scale))
+                if emb_width < target[0] or emb_height < target[1]:
+                    return None
+
+                if ((emb_width, emb_height) == target and embedded.mode == "RGB"
+                        and encoding == ThumbnailGenerator.ENCODING_JPEG):
+                    # Already the right size, store it without re-encoding
+                    return bytes(preview)
+                embedded.thumbnail(size, resample=Image.BICUBIC)
+                return ThumbnailGenerator._encode(embedded, encoding)
         except Exception as e:
-            logger.error(f"Error generating thumbnail for {image_path}: {e}")
+            logger.debug(f"Unusable embedded thumbnail: {e}")
             return None
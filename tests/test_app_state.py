@@ -22,3 +22,41 @@ def test_app_state_set_folder():
     state = AppState()
     state.set_current_folder("/mock/path")
     assert state.current_folder == "/mock/path"
+
+def test_app_state_scan_worker_setting():
+    state = AppState()
+    assert state.max_scan_workers >= 1
+
+def test_app_state_scanner_lifecycle(tmp_path, qtbot):
+    from src.app.file_scanner import FolderScanner
+    state = AppState()
+    finished = FolderScanner(str(tmp_path))
+    superseded = FolderScanner(str(tmp_path))
+    state.register_scanner(finished)
+    state.register_scanner(superseded)
+    assert state.active_scanners == [finished, superseded]
+
+    finished.run()
+    assert state.active_scanners == [superseded]
+
+    state.cancel_active_scans()
+    assert superseded.is_cancelled
+    superseded.run()
+    assert state.active_scanners == []
+
+def test_app_state_scanner_options():
+    state = AppState()
+    state.max_scan_workers = 2
+    state.thumbnail_quality = "exact"
+    state.use_embedded_thumbnails = False
+    state.thumbnail_encoding = "raw"
+    state.global_cache_dir = "/tmp/cache"
+    state.global_cache_max_bytes = 1024
+    assert state.scanner_options() == {
+        "max_workers": 2,
+        "thumbnail_quality": "exact",
+        "use_embedded_thumbnails": False,
+        "thumbnail_encoding": "raw",
+        "global_cache_dir": "/tmp/cache",
+        "global_cache_max_bytes": 1024,
+    }
@@ -0,0 +1,73 @@
+import os
+import zipfile
+import pytest
+from src.app.archives import (
+    is_archive, member_path, split_member_path, container_of, path_exists,
+    path_mtime, list_members, read_member, open_image
+)
+
+
+@pytest.fixture
+def archive(tmp_path):
+    path = str(tmp_path / "export.cbz")
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("b.jpg", b"second")
+        zf.writestr("pages/a.png", b"first")
+        zf.writestr("notes.txt", b"text")
+        zf.writestr("pages/", b"")
+    return path
+
+
+def test_member_paths(tmp_path):
+    archive = os.path.join(str(tmp_path), "odd!/name.zip")
+    path = member_path(archive, "dir/x.jpg")
+    assert split_member_path(path) == (archive, "dir/x.jpg")
+    assert container_of(path) == archive
+    assert split_member_path(os.path.join(str(tmp_path), "plain!/x.jpg")) is None
+    assert container_of(os.path.join("a", "b.jpg")) == "a"
+    assert is_archive("X.ZIP") and is_archive("y.cbz") and not is_archive("z.rar")
+
+
+def test_list_and_read_members(archive):
+    members = list_members(archive, {".jpg", ".png"})
+    assert [name for name, _ in members] == ["b.jpg", "pages/a.png"]
+    assert members[0][1].st_size == 6
+    assert members[0][1].crc == zipfile.ZipFile(archive).getinfo("b.jpg").CRC
+    assert members[0][1].st_ino is None
+
+    assert read_member(member_path(archive, "pages/a.png")) == b"first"
+    with open_image(member_path(archive, "b.jpg")) as f:
+        assert f.read() == b"second"
+    assert path_exists(member_path(archive, "b.jpg"))
+    with pytest.raises(OSError):
+        read_member(member_path(archive, "missing.jpg"))
+
+
+def test_rewritten_archive_is_reopened(archive):
+    assert read_member(member_path(archive, "b.jpg")) == b"second"
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("b.jpg", b"replaced content")
+    assert read_member(member_path(archive, "b.jpg")) == b"replaced content"
+
+
+def test_broken_archive(tmp_path):
+    path = tmp_path / "broken.zip"
+    path.write_bytes(b"not a zip")
+    with pytest.raises(OSError):
+        list_members(str(path), {".jpg"})
+    assert not path_exists(member_path(str(tmp_path / "gone.zip"), "a.jpg"))
+
+
+def test_path_exists_and_mtime(archive, tmp_path):
+    from datetime import datetime
+    with zipfile.ZipFile(archive, "a") as zf:
+        zf.writestr(zipfile.ZipInfo("dated.jpg", (2020, 5, 4, 3, 2, 0)), b"x")
+    assert path_mtime(member_path(archive, "dated.jpg")) == datetime(2020, 5, 4, 3, 2).timestamp()
+    assert path_mtime(archive) == os.path.getmtime(archive)
+    with pytest.raises(OSError):
+        path_mtime(member_path(archive, "missing.jpg"))
+
+    link = tmp_path / "broken.jpg"
+    link.symlink_to(tmp_path / "nowhere.jpg")
+    assert not path_exists(str(link))
+    assert path_exists(str(link), follow_symlinks=False)
@@ -0,0 +1,80 @@
+import sqlite3
+import threading
+import pytest
+from src.app import connections
+from src.app.connections import ConnectionManager, open_connection
+from src.app.database import DatabaseManager
+
+
+def in_thread(func):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(func()))
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+def test_open_connection_applies_pragmas(tmp_path):
+    conn = open_connection(str(tmp_path / "tuned.db"))
+    assert conn.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+    assert conn.execute("PRAGMA synchronous").fetchone() == (1,) # NORMAL
+    assert conn.execute("PRAGMA temp_store").fetchone() == (2,) # MEMORY
+    assert conn.execute("PRAGMA cache_size").fetchone() == (-16 * 1024,)
+    conn.close()
+
+
+def test_no_wal_on_network_filesystems(tmp_path, monkeypatch):
+    monkeypatch.setattr(connections, "storage_class", lambda path: connections.STORAGE_NETWORK)
+    conn = open_connection(str(tmp_path / "share.db"))
+    assert conn.execute("PRAGMA journal_mode").fetchone() == ("delete",)
+    conn.close()
+
+
+def test_one_connection_per_thread(tmp_path):
+    manager = ConnectionManager.for_database(str(tmp_path / "a.db"))
+    assert ConnectionManager.for_database(str(tmp_path / "a.db")) is manager
+    conn = manager.connection()
+    assert manager.connection() is conn
+    other = in_thread(manager.connection)
+    assert other is not conn
+    manager.close()
+
+
+def test_close_retires_connections(tmp_path):
+    manager = ConnectionManager.for_database(str(tmp_path / "b.db"))
+    conn = manager.connection()
+    worker_conns = []
+    ready, retired, done = threading.Event(), threading.Event(), threading.Event()
+    def worker():
+        worker_conns.append(manager.connection())
+        ready.set()
+        retired.wait()
+        worker_conns.append(manager.connection())
+        done.set()
+    thread = threading.Thread(target=worker)
+    thread.start()
+    ready.wait()
+
+    manager.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")
+    retired.set()
+    thread.join()
+    assert worker_conns[1] is not worker_conns[0]
+    assert manager.connection() is not conn
+    manager.close()
+
+
+def test_database_manager_reuses_connection(tmp_path):
+    first, second = str(tmp_path / "first.db"), str(tmp_path / "second.db")
+    db = DatabaseManager(first)
+    conn = db._connection()
+    db.get_numeric_metrics()
+    db.get_image_metadata("/missing.jpg")
+    assert db._connection() is conn
+
+    db.switch_database(second)
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")
+    assert db.get_numeric_metrics()[:2] == ["file_size", "modified_at"]
+    ConnectionManager.for_database(second).close()
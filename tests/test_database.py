@@ -53,3 +53,108 @@ def test_switch_database(tmp_path):
     cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='images'")
     assert cursor.fetchone() is not None
     conn.close()
+
+def test_images_schema_migration(tmp_path):
+    db_path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE images (id INTEGER PRIMARY KEY, path TEXT UNIQUE, filename TEXT)")
+    conn.commit()
+    conn.close()
+
+    DatabaseManager(db_path)
+    conn = sqlite3.connect(db_path)
+    columns = {col[1] for col in conn.execute("PRAGMA table_info(images)")}
+    conn.close()
+    assert {column for column, _ in DatabaseManager.IMAGE_COLUMN_MIGRATIONS}.issubset(columns)
+
+def _add_image(conn, path, results=1, value="1"):
+    img_id = conn.execute(
+        "INSERT INTO images (path, filename) VALUES (?, ?)", (path, os.path.basename(path))
+    ).lastrowid
+    for i in range(results):
+        conn.execute(
+            "INSERT INTO analysis_results (image_id, plugin_name, result_key, result_value) "
+            "VALUES (?, 'p', ?, ?)", (img_id, f"k{i}", value)
+        )
+    conn.execute("INSERT INTO thumbnail_levels (image_id, level) VALUES (?, 64)", (img_id,))
+    return img_id
+
+def test_delete_images_cascades(db_manager):
+    conn = sqlite3.connect(db_manager.db_path)
+    _add_image(conn, "/a.jpg")
+    kept = _add_image(conn, "/b.jpg")
+    assert DatabaseManager.delete_images(conn, ["/a.jpg", "/missing.jpg"]) == 1
+    conn.commit()
+    assert conn.execute("SELECT path FROM images").fetchall() == [("/b.jpg",)]
+    for table in DatabaseManager.IMAGE_CHILD_TABLES:
+        assert conn.execute(f"SELECT DISTINCT image_id FROM {table}").fetchall() == [(kept,)]
+    conn.close()
+
+def test_prune_orphans(db_manager):
+    conn = sqlite3.connect(db_manager.db_path)
+    img_id = _add_image(conn, "/a.jpg", results=2)
+    conn.execute("DELETE FROM images WHERE id = ?", (img_id,))
+    assert DatabaseManager.prune_orphans(conn) == 3
+    conn.close()
+
+def test_compact_releases_free_pages(db_manager):
+    conn = sqlite3.connect(db_manager.db_path)
+    assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+    for i in range(200):
+        _add_image(conn, f"/{i}.jpg", results=20, value="x" * 100)
+    conn.commit()
+    size = os.path.getsize(db_manager.db_path)
+    DatabaseManager.delete_images(conn, [f"/{i}.jpg" for i in range(200)])
+    conn.commit()
+    assert conn.execute("PRAGMA freelist_count").fetchone()[0] > 0
+
+    assert DatabaseManager.compact(conn, time_budget=10)
+    assert conn.execute("PRAGMA freelist_count").fetchone()[0] == 0
+    assert os.path.getsize(db_manager.db_path) < size
+    # ANALYZE ran
+    assert conn.execute(
+        "SELECT name FROM sqlite_master WHERE name = 'sqlite_stat1'"
+    ).fetchone() is not None
+    conn.close()
+
+def test_compact_stops_at_time_budget(db_manager):
+    conn = sqlite3.connect(db_manager.db_path)
+    for i in range(50):
+        _add_image(conn, f"/{i}.jpg", results=20, value="x" * 100)
+    conn.commit()
+    DatabaseManager.delete_images(conn, [f"/{i}.jpg" for i in range(50)])
+    conn.commit()
+    assert not DatabaseManager.compact(conn, time_budget=0)
+    assert conn.execute("PRAGMA freelist_count").fetchone()[0] > 0
+    conn.close()
+
+def test_run_maintenance(tmp_path):
+    db_path = str(tmp_path / "legacy.db")
+    # Created before incremental auto-vacuum was enabled
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE images (id INTEGER PRIMARY KEY, path TEXT UNIQUE, filename TEXT)")
+    conn.commit()
+    conn.close()
+    manager = DatabaseManager(db_path)
+
+    existing = tmp_path / "kept.jpg"
+    existing.write_bytes(b"x")
+    conn = sqlite3.connect(db_path)
+    _add_image(conn, str(existing))
+    gone = _add_image(conn, str(tmp_path / "gone.jpg"))
+    _add_image(conn, str(tmp_path / "orphan.jpg"))
+    conn.execute("DELETE FROM images WHERE path = ?", (str(tmp_path / "orphan.jpg"),))
+    conn.commit()
+    conn.close()
+
+    result = manager.run_maintenance()
+    assert result["removed_paths"] == [str(tmp_path / "gone.jpg")]
+    assert result["orphans"] == 2
+
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT path FROM images").fetchall() == [(str(existing),)]
+    assert conn.execute(
+        "SELECT count(*) FROM analysis_results WHERE image_id = ?", (gone,)
+    ).fetchone()[0] == 0
+    assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+    conn.close()
@@ -30,3 +30,35 @@ def test_get_numeric_metrics(tmp_path):
     assert "size_kb" in metrics
     assert "density" in metrics
     assert "color" not in metrics
+
+def test_header_metrics(tmp_path):
+    db_path = str(tmp_path / "header.db")
+    db = DatabaseManager(db_path)
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO images (path, filename, file_size) VALUES ('p0', 'f0', 1)")
+    conn.commit()
+    assert db.get_numeric_metrics() == ["file_size", "modified_at"]
+
+    conn.execute(
+        """INSERT INTO images (path, filename, width, height, format, frame_count, taken_at)
+        VALUES ('p1', 'f1', 4000, 3000, 'JPEG', 1, 1600000000.0),
+               ('p2', 'f2', 100, 50, 'GIF', 12, NULL),
+               ('p3', 'f3', NULL, NULL, '', NULL, NULL)"""
+    )
+    conn.commit()
+    conn.close()
+
+    metrics = db.get_numeric_metrics()
+    assert metrics[:8] == ["file_size", "modified_at", "width", "height", "megapixels",
+                           "aspect_ratio", "frame_count", "taken_at"]
+    assert db.get_metric_values("megapixels") == {"p1": 12.0, "p2": 0.005}
+    assert db.get_metric_values("aspect_ratio") == {"p1": 4000 / 3000, "p2": 2.0}
+    assert db.get_metric_values("frame_count") == {"p1": 1.0, "p2": 12.0}
+    assert db.get_metric_values("taken_at") == {"p1": 1600000000.0}
+
+    metadata = db.get_image_metadata("p2")
+    assert metadata["Dimensions"] == "100 x 50 (0.0 MP)"
+    assert metadata["Format"] == "GIF"
+    assert metadata["Frames"] == 12
+    assert "Taken" not in metadata
+    assert "Format" not in db.get_image_metadata("p3")
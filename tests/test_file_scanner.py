@@ -27,6 +27,10 @@ def temp_image_dir(tmp_path):
     save_img(sub_dir / "test3.webp")
     save_img(sub_dir / "test4.BMP")
     (img_dir / "not_an_image.txt").write_text("fake data")
+    # Older than FolderScanner.MTIME_GRANULARITY_NS, so incremental scans
+    # trust their mtimes
+    for directory in (img_dir, sub_dir):
+        os.utime(directory, ns=(0, os.stat(directory).st_mtime_ns - 60_000_000_000))
     
     return str(img_dir)
 
@@ -36,7 +40,7 @@ def test_folder_scanner_finds_images(temp_image_dir, qtbot):
     scanner = FolderScanner(temp_image_dir)
     
     # Connect signal to collect found files and thumbnails
-    scanner.signals.file_found.connect(lambda p, t: found_files.append((p, t)))
+    scanner.signals.files_found.connect(found_files.extend)
     
     # Run the scanner logic directly
     scanner.run()
@@ -62,13 +66,13 @@ def test_folder_scanner_persistence(temp_image_dir, qtbot, tmp_path):
     cursor.execute("SELECT count(*) FROM images")
     assert cursor.fetchone()[0] == 4
     
-    cursor.execute("SELECT thumbnail FROM images WHERE thumbnail IS NOT NULL")
-    assert len(cursor.fetchall()) == 4
+    cursor.execute("SELECT count(*) FROM images WHERE thumb_length > 0 AND thumbnail IS NULL")
+    assert cursor.fetchone()[0] == 4
     conn.close()
     
     # Run again, should load from DB (we can mock thumbnail_gen to verify)
     import unittest.mock as mock
-    with mock.patch('src.ui.thumbnail_gen.ThumbnailGenerator.generate') as mock_gen:
+    with mock.patch('src.ui.thumbnail_gen.ThumbnailGenerator.generate_with_source') as mock_gen:
         scanner2 = FolderScanner(temp_image_dir, db_path)
         scanner2.run()
         # Should NOT call generate because it loads from DB
@@ -85,8 +89,8 @@ def test_folder_scanner_persistence(temp_image_dir, qtbot, tmp_path):
         img = Image.new('RGB', (20, 20), color='blue') # Different content
         img.save(f, format="JPEG")
     
-    with mock.patch('src.ui.thumbnail_gen.ThumbnailGenerator.generate') as mock_gen:
-        mock_gen.return_value = b"new_thumb"
+    with mock.patch('src.ui.thumbnail_gen.ThumbnailGenerator.generate_with_source') as mock_gen:
+        mock_gen.return_value = (b"new_thumb", "fast")
         scanner3 = FolderScanner(temp_image_dir, db_path)
         scanner3.run()
         # Should call generate exactly once for the modified file
@@ -98,16 +102,1157 @@ def test_folder_scanner_finished_signal(temp_image_dir, qtbot):
     with qtbot.waitSignal(scanner.signals.finished, timeout=1000):
         scanner.run()
 
-def test_folder_scanner_error(qtbot, monkeypatch):
-    scanner = FolderScanner("/invalid/path")
+def test_folder_scanner_error(qtbot, monkeypatch, tmp_path):
+    scanner = FolderScanner(str(tmp_path))
     
-    def mock_walk(path):
+    def mock_scandir(path):
         raise OSError("Permission denied")
     
     import os
-    monkeypatch.setattr(os, "walk", mock_walk)
+    monkeypatch.setattr(os, "scandir", mock_scandir)
     
     with qtbot.waitSignal(scanner.signals.error, timeout=1000) as blocker:
         scanner.run()
     
     assert "Permission denied" in blocker.args[0]
+
+def test_folder_scanner_process_pool(temp_image_dir, qtbot, tmp_path):
+    db_path = str(tmp_path / "parallel.db")
+    from src.app.database import DatabaseManager
+    DatabaseManager(db_path)
+
+    found_files = []
+    scanner = FolderScanner(temp_image_dir, db_path, max_workers=2)
+    scanner.signals.files_found.connect(found_files.extend)
+    scanner.run()
+
+    assert len(found_files) == 4
+    assert all(len(thumb) > 0 for _, thumb in found_files)
+
+    import sqlite3
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute("SELECT count(*) FROM images WHERE thumb_length > 0")
+    assert cursor.fetchone()[0] == 4
+    conn.close()
+
+def test_folder_scanner_worker_cap():
+    assert FolderScanner("/tmp").max_workers == 1
+    assert FolderScanner("/tmp", max_workers=0).max_workers == 1
+    assert FolderScanner("/tmp", max_workers=3).max_workers == 3
+
+def test_folder_scanner_queue_follows_read_concurrency():
+    scanner = FolderScanner("/tmp", max_workers=4, storage="hdd")
+    scanner._tune_for_storage()
+    assert scanner.read_concurrency == 1
+    assert scanner._queue_limit() == 1
+    assert scanner.listing_workers == FolderScanner.HDD_LISTING_WORKERS
+
+    scanner = FolderScanner("/tmp", max_workers=4, storage="ssd")
+    scanner._tune_for_storage()
+    assert scanner.read_concurrency == 4
+    assert scanner._queue_limit() == 4 * FolderScanner.QUEUE_DEPTH
+
+def test_folder_scanner_bulk_cache_index(temp_image_dir, qtbot, tmp_path, monkeypatch):
+    db_path = str(tmp_path / "index.db")
+    from src.app.database import DatabaseManager
+    DatabaseManager(db_path)
+    FolderScanner(temp_image_dir, db_path).run()
+
+    import sqlite3
+    statements = []
+    original_connect = sqlite3.connect
+    def traced_connect(*args, **kwargs):
+        conn = original_connect(*args, **kwargs)
+        conn.set_trace_callback(statements.append)
+        return conn
+    monkeypatch.setattr(sqlite3, "connect", traced_connect)
+
+    found_files = []
+    scanner = FolderScanner(temp_image_dir, db_path)
+    scanner.signals.files_found.connect(lambda batch: found_files.extend(p for p, _ in batch))
+    import unittest.mock as mock
+    with mock.patch('src.ui.thumbnail_gen.ThumbnailGenerator.generate_with_source') as mock_gen:
+        scanner.run()
+        assert mock_gen.call_count == 0
+
+    assert len(found_files) == 4
+    selects = [s for s in statements
+               if s.lstrip().upper().startswith("SELECT") and "FROM images" in s]
+    # One index query plus one batched thumbnail fetch, no per-file lookups.
+    assert len(selects) == 2
+    assert not any("WHERE path" in s for s in selects)
+
+def test_folder_scanner_regenerates_missing_cached_thumbnail(temp_image_dir, qtbot, tmp_path):
+    db_path = str(tmp_path / "missing.db")
+    from src.app.database import DatabaseManager
+    DatabaseManager(db_path)
+    FolderScanner(temp_image_dir, db_path).run()
+
+    import sqlite3
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE images SET thumb_length = NULL WHERE path LIKE '%test1.jpg'")
+    conn.commit()
+    conn.close()
+
+    import unittest.mock as mock
+    with mock.patch('src.ui.thumbnail_gen.ThumbnailGenerator.generate_with_source') as mock_gen:
+        mock_gen.return_value = (b"regenerated", "fast")
+        FolderScanner(temp_image_dir, db_path).run()
+        assert mock_gen.call_count == 1
+
+def test_folder_scanner_records_directory_index(temp_image_dir, qtbot, tmp_path):
+    db_path = str(tmp_path / "dirs.db")
+    from src.app.database import DatabaseManager
+    DatabaseManager(db_path)
+    FolderScanner(temp_image_dir, db_path).run()
+
+    import sqlite3
+    conn = sqlite3.connect(db_path)
+    rows = dict(conn.execute("SELECT path, entry_count FROM directories"))
+    conn.close()
+    assert rows == {
+        temp_image_dir: 4, # test1.jpg, test2.png, not_an_image.txt, sub
+        os.path.join(temp_image_dir, "sub"): 2
+    }
+
+def test_folder_scanner_incremental_skips_unchanged_dirs(temp_image_dir, qtbot, tmp_path, monkeypatch):
+    db_path = str(tmp_path / "incremental.db")
+    from src.app.database import DatabaseManager
+    DatabaseManager(db_path)
+    FolderScanner(temp_image_dir, db_path, incremental=True).run()
+
+    # Add a file to the sub directory only
+    from PIL import Image
+    sub_dir = os.path.join(temp_image_dir, "sub")
+    Image.new('RGB', (10, 10), color='green').save(os.path.join(sub_dir, "test5.png"))
+    os.utime(sub_dir, ns=(0, os.stat(sub_dir).st_mtime_ns + 1_000_000))
+
+    listed = []
+    original_scandir = os.scandir
+    def tracking_scandir(path):
+        listed.append(path)
+        return original_scandir(path)
+    monkeypatch.setattr(os, "scandir", tracking_scandir)
+
+    found_files = []
+    scanner = FolderScanner(temp_image_dir, db_path, incremental=True)
+    scanner.signals.files_found.connect(lambda batch: found_files.extend(p for p, _ in batch))
+    scanner.run()
+
+    assert listed == [sub_dir]
+    assert len(found_files) == 5
+    assert os.path.join(sub_dir, "test5.png") in found_files
+
+def test_directory_refresher_applies_deltas(temp_image_dir, qtbot, tmp_path):
+    db_path = str(tmp_path / "refresh.db")
+    from src.app.database import DatabaseManager
+    DatabaseManager(db_path)
+    FolderScanner(temp_image_dir, db_path).run()
+
+    from PIL import Image
+    from src.app.file_scanner import DirectoryRefresher
+    sub_dir = os.path.join(temp_image_dir, "sub")
+    new_dir = os.path.join(temp_image_dir, "new")
+    os.mkdir(new_dir)
+    Image.new('RGB', (10, 10), color='green').save(os.path.join(new_dir, "test5.png"))
+    os.remove(os.path.join(temp_image_dir, "test2.png"))
+    shutil.rmtree(sub_dir)
+
+    found_files = []
+    removed = []
+    refresher = DirectoryRefresher(temp_image_dir, [temp_image_dir], db_path)
+    refresher.signals.files_found.connect(lambda batch: found_files.extend(p for p, _ in batch))
+    refresher.signals.files_removed.connect(removed.extend)
+    refresher.run()
+
+    # Unchanged test1.jpg is not re-emitted
+    assert found_files == [os.path.join(new_dir, "test5.png")]
+    assert sorted(removed) == sorted([
+        os.path.join(temp_image_dir, "test2.png"),
+        os.path.join(sub_dir, "test3.webp"),
+        os.path.join(sub_dir, "test4.BMP"),
+    ])
+    assert refresher.removed_dirs == [sub_dir]
+
+    import sqlite3
+    conn = sqlite3.connect(db_path)
+    paths = {row[0] for row in conn.execute("SELECT path FROM images")}
+    dirs = {row[0] for row in conn.execute("SELECT path FROM directories")}
+    conn.close()
+    assert paths == {os.path.join(temp_image_dir, "test1.jpg"), os.path.join(new_dir, "test5.png")}
+    assert dirs == {temp_image_dir, new_dir}
+
+def test_directory_refresher_keeps_known_subdirectories(temp_image_dir, qtbot, tmp_path):
+    db_path = str(tmp_path / "refresh_parent.db")
+    from src.app.database import DatabaseManager
+    DatabaseManager(db_path)
+    FolderScanner(temp_image_dir, db_path).run()
+
+    from PIL import Image
+    from src.app.file_scanner import DirectoryRefresher
+    Image.new('RGB', (10, 10), color='green').save(os.path.join(temp_image_dir, "test5.png"))
+    refresher = DirectoryRefresher(temp_image_dir, [temp_image_dir], db_path)
+    refresher.run()
+
+    # "sub" was listed again but not entered; it did not go anywhere
+    assert refresher.removed_paths == [] and refresher.removed_dirs == []
+    import sqlite3
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT count(*) FROM images").fetchone()[0] == 5
+    assert conn.execute("SELECT count(*) FROM directories").fetchone()[0] == 2
+    conn.close()
+
+def test_folder_scanner_batches_results(temp_image_dir, qtbot):
+    batches = []
+    scanner = FolderScanner(temp_image_dir)
+    scanner.BATCH_SIZE = 3
+    scanner.BATCH_INTERVAL = 60
+    scanner.signals.files_found.connect(batches.append)
+    scanner.run()
+
+    # Flushed once when full and once more at the end of the scan
+    assert [len(batch) for batch in batches] == [3, 1]
+    for path, thumb in batches[0] + batches[1]:
+        assert isinstance(path, str)
+        assert len(thumb) > 0
+
+def test_folder_scanner_flushes_batches_by_time(temp_image_dir, qtbot):
+    batches = []
+    scanner = FolderScanner(temp_image_dir)
+    scanner.BATCH_INTERVAL = 0
+    scanner.signals.files_found.connect(batches.append)
+    scanner.run()
+    assert [len(batch) for batch in batches] == [1, 1, 1, 1]
+
+def test_folder_scanner_flushes_due_batches_during_slow_listings(tmp_path, qtbot, monkeypatch):
+    import time
+    from PIL import Image
+    root = tmp_path / "slow"
+    root.mkdir()
+    Image.new('RGB', (10, 10), color='red').save(root / "a.jpg")
+    for i in range(20):
+        (root / f"d{i:02}").mkdir()
+
+    real_list = FolderScanner._list_directory
+    def slow_list(self, directory, cached):
+        if directory != str(root):
+            time.sleep(0.1) # A high-latency share
+        return real_list(self, directory, cached)
+    monkeypatch.setattr(FolderScanner, "_list_directory", slow_list)
+
+    delivered = []
+    scanner = FolderScanner(str(root), listing_workers=1)
+    started = time.monotonic()
+    scanner.signals.files_found.connect(lambda batch: delivered.append(time.monotonic() - started))
+    scanner.run()
+    # Delivered once due, not only at the end of the walk
+    assert len(delivered) == 1
+    assert delivered[0] < 1.0
+
+def test_folder_scanner_cancel(temp_image_dir, qtbot, tmp_path):
+    db_path = str(tmp_path / "cancel.db")
+    from src.app.database import DatabaseManager
+    DatabaseManager(db_path)
+
+    import unittest.mock as mock
+    from src.ui.thumbnail_gen import ThumbnailGenerator
+    batches, finished = [], []
+    scanner = FolderScanner(temp_image_dir, db_path)
+    scanner.BATCH_INTERVAL = 60
+    original = ThumbnailGenerator.generate_with_source
+    def generate_then_cancel(*args, **kwargs):
+        scanner.cancel()
+        return original(*args, **kwargs)
+    scanner.signals.files_found.connect(batches.append)
+    scanner.signals.finished.connect(lambda: finished.append(True))
+
+    with mock.patch('src.ui.thumbnail_gen.ThumbnailGenerator.generate_with_source',
+                    side_effect=generate_then_cancel) as mock_gen:
+        with qtbot.waitSignal(scanner.signals.cancelled, timeout=1000):
+            scanner.run()
+
+    assert mock_gen.call_count == 1
+    assert batches == [] # undelivered results are discarded
+    assert finished == []
+    import sqlite3
+    conn = sqlite3.connect(db_path)
+    # An incomplete scan must not mark directories as indexed
+    assert conn.execute("SELECT count(*) FROM directories").fetchone()[0] == 0
+    conn.close()
+
+def test_folder_scanner_pause_resume(temp_image_dir, qtbot):
+    import threading
+    found_files = []
+    scanner = FolderScanner(temp_image_dir)
+    scanner.signals.files_found.connect(lambda batch: found_files.extend(p for p, _ in batch))
+    scanner.pause()
+    assert scanner.is_paused
+
+    thread = threading.Thread(target=scanner.run)
+    thread.start()
+    qtbot.wait(300)
+    assert thread.is_alive()
+    assert found_files == []
+
+    scanner.resume()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+    # Emitted from a foreign thread, so delivered through the event loop
+    qtbot.waitUntil(lambda: len(found_files) == 4, timeout=1000)
+
+def test_folder_scanner_cancel_while_paused(temp_image_dir, qtbot):
+    import threading
+    scanner = FolderScanner(temp_image_dir)
+    scanner.pause()
+    thread = threading.Thread(target=scanner.run)
+    thread.start()
+    scanner.cancel()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+    assert scanner.is_cancelled
+
+def test_folder_scanner_thumbnail_quality(temp_image_dir, qtbot):
+    import unittest.mock as mock
+    with mock.patch('src.ui.thumbnail_gen.ThumbnailGenerator.generate_with_source') as mock_gen:
+        mock_gen.return_value = (b"thumb", "exact")
+        FolderScanner(temp_image_dir, thumbnail_quality="exact").run()
+        assert mock_gen.call_count == 4
+        assert all(call.kwargs["quality"] == "exact" for call in mock_gen.call_args_list)
+
+def test_folder_scanner_records_thumbnail_source(temp_image_dir, qtbot, tmp_path):
+    db_path = str(tmp_path / "source.db")
+    from src.app.database import DatabaseManager
+    db_manager = DatabaseManager(db_path)
+    FolderScanner(temp_image_dir, db_path, thumbnail_quality="exact").run()
+
+    import sqlite3
+    conn = sqlite3.connect(db_path)
+    sources = {row[0] for row in conn.execute("SELECT thumbnail_source FROM images")}
+    conn.close()
+    assert sources == {"exact"}
+    metadata = db_manager.get_image_metadata(os.path.join(temp_image_dir, "test1.jpg"))
+    assert metadata["Thumbnail Source"] == "exact"
+
+def test_folder_scanner_emits_cached_thumbnails_from_pack(temp_image_dir, qtbot, tmp_path):
+    db_path = str(tmp_path / "pack.db")
+    from src.app.database import DatabaseManager
+    DatabaseManager(db_path)
+    first = []
+    scanner = FolderScanner(temp_image_dir, db_path)
+    scanner.signals.files_found.connect(first.extend)
+    scanner.run()
+    assert os.path.exists(str(tmp_path / "pack.thumbs"))
+
+    second = []
+    scanner = FolderScanner(temp_image_dir, db_path)
+    scanner.signals.files_found.connect(second.extend)
+    scanner.run()
+    assert all(isinstance(thumb, memoryview) for _, thumb in second)
+    assert dict(first) == {path: thumb.tobytes() for path, thumb in second}
+
+def test_folder_scanner_moves_legacy_blobs_into_pack(temp_image_dir, qtbot, tmp_path):
+    db_path = str(tmp_path / "legacy.db")
+    from src.app.database import DatabaseManager
+    DatabaseManager(db_path)
+    FolderScanner(temp_image_dir, db_path).run()
+
+    import sqlite3
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE images SET thumbnail = X'C0FFEE', thumb_offset = NULL, thumb_length = NULL")
+    conn.commit()
+
+    found = []
+    scanner = FolderScanner(temp_image_dir, db_path)
+    scanner.signals.files_found.connect(lambda batch: found.extend(bytes(t) for _, t in batch))
+    import unittest.mock as mock
+    with mock.patch('src.ui.thumbnail_gen.ThumbnailGenerator.generate_with_source') as mock_gen:
+        scanner.run()
+        assert mock_gen.call_count == 0
+    assert found == [b"\xc0\xff\xee"] * 4
+
+    rows = conn.execute("SELECT thumbnail, thumb_length FROM images").fetchall()
+    conn.close()
+    assert rows == [(None, 3)] * 4
+
+def test_thumbnail_level_loader(temp_image_dir, qtbot, tmp_path):
+    from src.app.file_scanner import ThumbnailLevelLoader
+    db_path = str(tmp_path / "levels.db")
+    from src.app.database import DatabaseManager
+    DatabaseManager(db_path)
+    FolderScanner(temp_image_dir, db_path).run()
+    paths = [os.path.join(temp_image_dir, name) for name in ("test1.jpg", "test2.png")]
+
+    batches = []
+    loader = ThumbnailLevelLoader(db_path, paths, 64)
+    loader.signals.files_found.connect(batches.append)
+    with qtbot.waitSignal(loader.signals.finished, timeout=1000):
+        loader.run()
+    assert [path for batch in batches for path, _ in batch] == paths
+
+    cancelled = ThumbnailLevelLoader(db_path, paths, 64)
+    cancelled.cancel()
+    with qtbot.waitSignal(cancelled.signals.cancelled, timeout=1000):
+        cancelled.run()
+
+def test_modified_image_drops_derived_levels(temp_image_dir, qtbot, tmp_path):
+    from src.app.thumb_store import ThumbnailPack, ThumbnailPyramid
+    db_path = str(tmp_path / "stale_levels.db")
+    from src.app.database import DatabaseManager
+    DatabaseManager(db_path)
+    FolderScanner(temp_image_dir, db_path).run()
+
+    import sqlite3
+    conn = sqlite3.connect(db_path)
+    path = os.path.join(temp_image_dir, "test1.jpg")
+    ThumbnailPyramid(conn, ThumbnailPack.for_database(db_path)).load([path], 64)
+    assert conn.execute("SELECT count(*) FROM thumbnail_levels").fetchone()[0] == 1
+
+    from PIL import Image
+    Image.new('RGB', (30, 30), color='blue').save(path)
+    os.utime(path, ns=(0, 0))
+    FolderScanner(temp_image_dir, db_path).run()
+    assert conn.execute("SELECT count(*) FROM thumbnail_levels").fetchone()[0] == 0
+    conn.close()
+
+def test_renamed_image_keeps_its_row(temp_image_dir, qtbot, tmp_path, monkeypatch):
+    db_path = str(tmp_path / "moves.db")
+    from src.app.database import DatabaseManager
+    DatabaseManager(db_path)
+    FolderScanner(temp_image_dir, db_path).run()
+
+    import sqlite3
+    conn = sqlite3.connect(db_path)
+    old_path = os.path.join(temp_image_dir, "test1.jpg")
+    img_id = conn.execute("SELECT id FROM images WHERE path = ?", (old_path,)).fetchone()[0]
+    conn.execute(
+        "INSERT INTO analysis_results (image_id, plugin_name, result_key, result_value) "
+        "VALUES (?, 'tags', 'label', 'red')", (img_id,)
+    )
+    conn.commit()
+
+    new_path = os.path.join(temp_image_dir, "sub", "renamed.jpg")
+    os.rename(old_path, new_path)
+    from src.ui.thumbnail_gen import ThumbnailGenerator
+    def fail(*args, **kwargs):
+        raise AssertionError("moved images must not be decoded")
+    monkeypatch.setattr(ThumbnailGenerator, "generate_with_source", staticmethod(fail))
+
+    found_files = []
+    scanner = FolderScanner(temp_image_dir, db_path)
+    scanner.signals.files_found.connect(lambda batch: found_files.extend(p for p, _ in batch))
+    scanner.run()
+
+    assert new_path in found_files
+    assert scanner.moved_paths == [(old_path, new_path)]
+    row = conn.execute("SELECT id, filename FROM images WHERE path = ?", (new_path,)).fetchone()
+    assert row == (img_id, "renamed.jpg")
+    assert conn.execute("SELECT count(*) FROM images WHERE path = ?", (old_path,)).fetchone()[0] == 0
+    assert conn.execute(
+        "SELECT result_value FROM analysis_results WHERE image_id = ?", (img_id,)
+    ).fetchone() == ("red",)
+    conn.close()
+
+def test_moved_image_matched_by_content(temp_image_dir, qtbot, tmp_path):
+    db_path = str(tmp_path / "copies.db")
+    from src.app.database import DatabaseManager
+    DatabaseManager(db_path)
+    FolderScanner(temp_image_dir, db_path).run()
+
+    import sqlite3
+    conn = sqlite3.connect(db_path)
+    old_path = os.path.join(temp_image_dir, "test2.png")
+    kept_path = os.path.join(temp_image_dir, "test1.jpg")
+    img_id = conn.execute("SELECT id FROM images WHERE path = ?", (old_path,)).fetchone()[0]
+
+    # A move across filesystems is a copy with a new inode and mtime
+    new_path = os.path.join(temp_image_dir, "moved.png")
+    shutil.copy(old_path, new_path)
+    os.remove(old_path)
+    # A copy whose original still exists is a new image
+    copy_path = os.path.join(temp_image_dir, "copy.jpg")
+    shutil.copy(kept_path, copy_path)
+
+    scanner = FolderScanner(temp_image_dir, db_path)
+    scanner.run()
+
+    assert scanner.moved_paths == [(old_path, new_path)]
+    assert conn.execute("SELECT id FROM images WHERE path = ?", (new_path,)).fetchone() == (img_id,)
+    ids = {row[0] for row in conn.execute(
+        "SELECT id FROM images WHERE path IN (?, ?)", (kept_path, copy_path)
+    )}
+    assert len(ids) == 2
+    conn.close()
+
+def test_moves_are_not_counted_as_removed(temp_image_dir, qtbot, tmp_path):
+    db_path = str(tmp_path / "moves_removed.db")
+    from src.app.database import DatabaseManager
+    DatabaseManager(db_path)
+    FolderScanner(temp_image_dir, db_path).run()
+
+    sub_dir = os.path.join(temp_image_dir, "sub")
+    gone = os.path.join(temp_image_dir, "test2.png")
+    os.remove(gone)
+    moves = [
+        (os.path.join(temp_image_dir, "test1.jpg"), os.path.join(sub_dir, "test1.jpg")),
+        (os.path.join(sub_dir, "test3.webp"), os.path.join(temp_image_dir, "test3.webp")),
+        (os.path.join(sub_dir, "test4.BMP"), os.path.join(temp_image_dir, "test4.BMP")),
+    ]
+    for old_path, new_path in moves:
+        os.rename(old_path, new_path)
+
+    removed = []
+    scanner = FolderScanner(temp_image_dir, db_path)
+    scanner.signals.files_removed.connect(removed.extend)
+    scanner.run()
+
+    assert sorted(scanner.moved_paths) == sorted(moves)
+    assert scanner.removed_paths == [gone]
+    # The gallery still drops the old paths of moved images
+    assert sorted(removed) == sorted([gone] + [old_path for old_path, _ in moves])
+
+def test_identical_images_share_one_thumbnail(temp_image_dir, qtbot, tmp_path, monkeypatch):
+    db_path = str(tmp_path / "copies_shared.db")
+    from src.app.database import DatabaseManager
+    DatabaseManager(db_path)
+    original = os.path.join(temp_image_dir, "test1.jpg")
+    shutil.copy(original, os.path.join(temp_image_dir, "test1_copy.jpg"))
+
+    from src.ui.thumbnail_gen import ThumbnailGenerator
+    decoded = []
+    real_generate = ThumbnailGenerator.generate_with_source
+    def counting_generate(*args, **kwargs):
+        decoded.append(args)
+        return real_generate(*args, **kwargs)
+    monkeypatch.setattr(ThumbnailGenerator, "generate_with_source", staticmethod(counting_generate))
+    FolderScanner(temp_image_dir, db_path).run()
+    assert len(decoded) == 4 # The copy reuses the thumbnail of test1.jpg
+
+    # Copies added later are not decoded either
+    shutil.copy(original, os.path.join(temp_image_dir, "sub", "test1_copy.jpg"))
+    scanner = FolderScanner(temp_image_dir, db_path)
+    scanner.run()
+    assert len(decoded) == 4 and scanner.generated_count == 0
+
+    import sqlite3
+    conn = sqlite3.connect(db_path)
+    records = conn.execute(
+        "SELECT DISTINCT thumb_offset, thumb_length FROM images WHERE filename LIKE 'test1%'"
+    ).fetchall()
+    assert conn.execute("SELECT count(*) FROM images").fetchone()[0] == 6
+    conn.close()
+    assert len(records) == 1
+
+def test_directory_refresher_reports_moves(temp_image_dir, qtbot, tmp_path):
+    db_path = str(tmp_path / "refresh_moves.db")
+    from src.app.database import DatabaseManager
+    DatabaseManager(db_path)
+    FolderScanner(temp_image_dir, db_path).run()
+
+    from src.app.file_scanner import DirectoryRefresher
+    old_path = os.path.join(temp_image_dir, "sub", "test3.webp")
+    new_path = os.path.join(temp_image_dir, "test3.webp")
+    os.rename(old_path, new_path)
+
+    found_files = []
+    removed = []
+    refresher = DirectoryRefresher(
+        temp_image_dir, [temp_image_dir, os.path.dirname(old_path)], db_path
+    )
+    refresher.signals.files_found.connect(lambda batch: found_files.extend(p for p, _ in batch))
+    refresher.signals.files_removed.connect(removed.extend)
+    refresher.run()
+
+    assert found_files == [new_path]
+    assert removed == [old_path]
+
+    import sqlite3
+    conn = sqlite3.connect(db_path)
+    paths = {row[0] for row in conn.execute("SELECT path FROM images")}
+    conn.close()
+    assert new_path in paths and old_path not in paths
+
+def test_full_scan_prunes_vanished_images(temp_image_dir, qtbot, tmp_path):
+    db_path = str(tmp_path / "prune.db")
+    from src.app.database import DatabaseManager
+    DatabaseManager(db_path)
+    FolderScanner(temp_image_dir, db_path).run()
+
+    import sqlite3
+    conn = sqlite3.connect(db_path)
+    gone = os.path.join(temp_image_dir, "test2.png")
+    img_id = conn.execute("SELECT id FROM images WHERE path = ?", (gone,)).fetchone()[0]
+    conn.execute(
+        "INSERT INTO analysis_results (image_id, plugin_name, result_key, result_value) "
+        "VALUES (?, 'tags', 'label', 'red')", (img_id,)
+    )
+    conn.commit()
+    os.remove(gone)
+    shutil.rmtree(os.path.join(temp_image_dir, "sub"))
+
+    removed = []
+    scanner = FolderScanner(temp_image_dir, db_path)
+    scanner.signals.files_removed.connect(removed.extend)
+    scanner.run()
+
+    assert sorted(removed) == sorted([
+        gone,
+        os.path.join(temp_image_dir, "sub", "test3.webp"),
+        os.path.join(temp_image_dir, "sub", "test4.BMP"),
+    ])
+    paths = [row[0] for row in conn.execute("SELECT path FROM images")]
+    assert paths == [os.path.join(temp_image_dir, "test1.jpg")]
+    assert conn.execute("SELECT count(*) FROM analysis_results").fetchone()[0] == 0
+    conn.close()
+
+def test_regenerated_image_keeps_its_id(temp_image_dir, qtbot, tmp_path):
+    db_path = str(tmp_path / "upsert.db")
+    from src.app.database import DatabaseManager
+    DatabaseManager(db_path)
+    FolderScanner(temp_image_dir, db_path).run()
+
+    import sqlite3
+    conn = sqlite3.connect(db_path)
+    path = os.path.join(temp_image_dir, "test1.jpg")
+    img_id = conn.execute("SELECT id FROM images WHERE path = ?", (path,)).fetchone()[0]
+
+    from PIL import Image
+    Image.new('RGB', (30, 30), color='blue').save(path)
+    os.utime(path, ns=(0, 0))
+    FolderScanner(temp_image_dir, db_path).run()
+
+    assert conn.execute(
+        "SELECT id, modified_at FROM images WHERE path = ?", (path,)
+    ).fetchone() == (img_id, 0)
+    conn.close()
+
+def test_interrupted_scan_resumes_from_journal(temp_image_dir, qtbot, tmp_path, monkeypatch):
+    db_path = str(tmp_path / "journal.db")
+    from src.app.database import DatabaseManager
+    DatabaseManager(db_path)
+    monkeypatch.setattr(FolderScanner, "JOURNAL_INTERVAL", 0)
+    sub_dir = os.path.join(temp_image_dir, "sub")
+
+    scanner = FolderScanner(temp_image_dir, db_path, incremental=True)
+    scanner.BATCH_SIZE = 1 # one batch per image
+    def crash_in_sub(batch):
+        if any(path.startswith(sub_dir) for path, _ in batch):
+            scanner.cancel()
+    scanner.signals.files_found.connect(crash_in_sub)
+    scanner.run()
+    assert scanner.is_cancelled
+
+    import json
+    import sqlite3
+    conn = sqlite3.connect(db_path)
+    pending = conn.execute(
+        "SELECT pending FROM scan_journal WHERE root = ?", (temp_image_dir,)
+    ).fetchone()[0]
+    assert json.loads(pending) == [sub_dir]
+    assert conn.execute("SELECT path FROM directories").fetchall() == [(temp_image_dir,)]
+
+    import src.app.file_scanner as file_scanner
+    listed = []
+    real_scandir = os.scandir
+    def scandir(path):
+        listed.append(path)
+        return real_scandir(path)
+    monkeypatch.setattr(file_scanner.os, "scandir", scandir)
+
+    found_files = []
+    resumed = FolderScanner(temp_image_dir, db_path, incremental=True)
+    resumed.signals.files_found.connect(lambda batch: found_files.extend(p for p, _ in batch))
+    resumed.run()
+
+    assert resumed.resumed
+    # Indexed images are emitted first, completed directories are not listed again
+    assert found_files[:3] == [
+        os.path.join(sub_dir, "test3.webp"),
+        os.path.join(temp_image_dir, "test1.jpg"),
+        os.path.join(temp_image_dir, "test2.png"),
+    ]
+    assert found_files[3:] == [os.path.join(sub_dir, "test4.BMP")]
+    assert listed == [sub_dir]
+    assert conn.execute("SELECT count(*) FROM scan_journal").fetchone()[0] == 0
+    assert {row[0] for row in conn.execute("SELECT path FROM directories")} == {
+        temp_image_dir, sub_dir
+    }
+    conn.close()
+
+def test_directory_refresher_keeps_no_journal(temp_image_dir, qtbot, tmp_path, monkeypatch):
+    db_path = str(tmp_path / "no_journal.db")
+    from src.app.database import DatabaseManager
+    DatabaseManager(db_path)
+    FolderScanner(temp_image_dir, db_path).run()
+    monkeypatch.setattr(FolderScanner, "JOURNAL_INTERVAL", 0)
+
+    from src.app.file_scanner import DirectoryRefresher
+    refresher = DirectoryRefresher(temp_image_dir, [temp_image_dir], db_path)
+    refresher.BATCH_SIZE = 1
+    refresher.signals.files_found.connect(lambda batch: refresher.cancel())
+    os.remove(os.path.join(temp_image_dir, "test1.jpg"))
+    refresher.run()
+
+    import sqlite3
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT count(*) FROM scan_journal").fetchone()[0] == 0
+    conn.close()
+
+def test_snapshot_emits_index_before_walking(temp_image_dir, qtbot, tmp_path, monkeypatch):
+    db_path = str(tmp_path / "snapshot.db")
+    from src.app.database import DatabaseManager
+    DatabaseManager(db_path)
+    FolderScanner(temp_image_dir, db_path, incremental=True).run()
+
+    from PIL import Image
+    new_path = os.path.join(temp_image_dir, "sub", "new.png")
+    Image.new('RGB', (10, 10), color='green').save(new_path)
+    gone = os.path.join(temp_image_dir, "test2.png")
+    os.remove(gone)
+
+    import src.app.file_scanner as file_scanner
+    events = []
+    real_scandir = os.scandir
+    def scandir(path):
+        events.append(("listed", path))
+        return real_scandir(path)
+    monkeypatch.setattr(file_scanner.os, "scandir", scandir)
+
+    scanner = FolderScanner(temp_image_dir, db_path, incremental=True, snapshot=True)
+    scanner.signals.files_found.connect(lambda batch: events.extend(("found", p) for p, _ in batch))
+    removed = []
+    scanner.signals.files_removed.connect(removed.extend)
+    scanner.run()
+
+    found = [path for kind, path in events if kind == "found"]
+    first_listing = events.index(("listed", temp_image_dir))
+    # The whole index, in path order, before the filesystem is touched
+    assert found[:4] == sorted([
+        os.path.join(temp_image_dir, "test1.jpg"), gone,
+        os.path.join(temp_image_dir, "sub", "test3.webp"),
+        os.path.join(temp_image_dir, "sub", "test4.BMP"),
+    ])
+    assert first_listing == 4
+    # Then only the deltas
+    assert found[4:] == [new_path]
+    assert removed == [gone]
+
+def test_scan_rules_prune_before_listing(temp_image_dir, qtbot, tmp_path, monkeypatch):
+    from PIL import Image
+    from src.app.scan_rules import ScanRules
+    junk = os.path.join(temp_image_dir, "cache")
+    os.makedirs(os.path.join(junk, "deep"))
+    Image.new('RGB', (10, 10)).save(os.path.join(junk, "deep", "x.png"))
+    hidden = os.path.join(temp_image_dir, ".trash")
+    os.mkdir(hidden)
+    Image.new('RGB', (10, 10)).save(os.path.join(hidden, "y.png"))
+    Image.new('RGB', (300, 300)).save(os.path.join(temp_image_dir, "big.bmp"))
+
+    import src.app.file_scanner as file_scanner
+    listed = []
+    real_scandir = os.scandir
+    def scandir(path):
+        listed.append(path)
+        return real_scandir(path)
+    monkeypatch.setattr(file_scanner.os, "scandir", scandir)
+
+    found_files = []
+    rules = ScanRules(exclude=list(ScanRules.DEFAULT_EXCLUDE) + ["cache/"], max_size=10000)
+    scanner = FolderScanner(temp_image_dir, rules=rules)
+    scanner.signals.files_found.connect(
+        lambda batch: found_files.extend(os.path.basename(p) for p, _ in batch))
+    scanner.run()
+
+    assert sorted(found_files) == ["test1.jpg", "test2.png", "test3.webp", "test4.BMP"]
+    assert listed == [temp_image_dir, os.path.join(temp_image_dir, "sub")]
+
+def test_links_are_walked_once(temp_image_dir, qtbot, tmp_path):
+    from src.app.scan_rules import ScanRules
+    sub_dir = os.path.join(temp_image_dir, "sub")
+    os.link(os.path.join(temp_image_dir, "test1.jpg"), os.path.join(sub_dir, "hardlink.jpg"))
+    os.symlink(temp_image_dir, os.path.join(sub_dir, "loop"))
+    os.symlink(sub_dir, os.path.join(temp_image_dir, "alias"))
+
+    found_files = []
+    scanner = FolderScanner(temp_image_dir, rules=ScanRules(follow_symlinks=True))
+    scanner.signals.files_found.connect(lambda batch: found_files.extend(p for p, _ in batch))
+    scanner.run()
+
+    assert sorted(os.path.basename(p) for p in found_files) == [
+        "test1.jpg", "test2.png", "test3.webp", "test4.BMP"
+    ]
+
+def test_files_without_inodes_are_not_duplicates(temp_image_dir, qtbot, tmp_path, monkeypatch):
+    # Windows reports no inodes for directory entries
+    class NoInodeEntry:
+        def __init__(self, entry):
+            self._entry = entry
+            self.name, self.path = entry.name, entry.path
+        def is_dir(self, follow_symlinks=True):
+            return self._entry.is_dir(follow_symlinks=follow_symlinks)
+        def is_file(self, follow_symlinks=True):
+            return self._entry.is_file(follow_symlinks=follow_symlinks)
+        def stat(self, follow_symlinks=True):
+            st = self._entry.stat()
+            return os.stat_result((st.st_mode, 0, 0, st.st_nlink, st.st_uid, st.st_gid,
+                                   st.st_size, st.st_atime, st.st_mtime, st.st_ctime))
+    class NoInodeScandir:
+        def __init__(self, path):
+            self._it = real_scandir(path)
+        def __enter__(self):
+            return (NoInodeEntry(entry) for entry in self._it)
+        def __exit__(self, *exc):
+            self._it.close()
+    real_scandir = os.scandir
+    monkeypatch.setattr(os, "scandir", NoInodeScandir)
+
+    found_files = []
+    scanner = FolderScanner(temp_image_dir)
+    scanner.signals.files_found.connect(lambda batch: found_files.extend(p for p, _ in batch))
+    scanner.run()
+    assert len(found_files) == 4
+
+def test_unstatable_images_are_not_pruned(temp_image_dir, qtbot, tmp_path, monkeypatch):
+    from src.app.database import DatabaseManager
+    from src.app.file_scanner import DirectoryRefresher
+    db_path = str(tmp_path / "unstatable.db")
+    DatabaseManager(db_path)
+    FolderScanner(temp_image_dir, db_path).run()
+
+    flaky = os.path.join(temp_image_dir, "test1.jpg")
+    class FlakyEntry:
+        def __init__(self, entry):
+            self._entry = entry
+            self.name, self.path = entry.name, entry.path
+        def is_dir(self, follow_symlinks=True):
+            return self._entry.is_dir(follow_symlinks=follow_symlinks)
+        def is_file(self, follow_symlinks=True):
+            return self._entry.is_file(follow_symlinks=follow_symlinks)
+        def stat(self, follow_symlinks=True):
+            if self.path == flaky:
+                raise PermissionError("transient")
+            return self._entry.stat()
+    class FlakyScandir:
+        def __init__(self, path):
+            self._it = real_scandir(path)
+        def __enter__(self):
+            return (FlakyEntry(entry) for entry in self._it)
+        def __exit__(self, *exc):
+            self._it.close()
+    real_scandir = os.scandir
+    monkeypatch.setattr(os, "scandir", FlakyScandir)
+
+    for scanner in (FolderScanner(temp_image_dir, db_path),
+                    DirectoryRefresher(temp_image_dir, [temp_image_dir], db_path)):
+        removed = []
+        scanner.signals.files_removed.connect(removed.extend)
+        scanner.run()
+        assert removed == []
+
+    import sqlite3
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT count(*) FROM images WHERE path = ?", (flaky,)).fetchone()[0] == 1
+    conn.close()
+
+def test_stored_rules_drop_excluded_images(temp_image_dir, qtbot, tmp_path):
+    db_path = str(tmp_path / "rules_prune.db")
+    from src.app.database import DatabaseManager
+    DatabaseManager(db_path)
+    FolderScanner(temp_image_dir, db_path, incremental=True).run()
+
+    import sqlite3
+    from src.app.scan_rules import ScanRules
+    conn = sqlite3.connect(db_path)
+    ScanRules(exclude=["sub"]).save(conn)
+
+    removed = []
+    scanner = FolderScanner(temp_image_dir, db_path, incremental=True)
+    scanner.signals.files_removed.connect(removed.extend)
+    scanner.run()
+
+    sub_dir = os.path.join(temp_image_dir, "sub")
+    assert removed == [os.path.join(sub_dir, "test3.webp"), os.path.join(sub_dir, "test4.BMP")]
+    assert {row[0] for row in conn.execute("SELECT path FROM directories")} == {temp_image_dir}
+    conn.close()
+
+def test_parallel_listing_keeps_walk_order(temp_image_dir, qtbot, tmp_path, monkeypatch):
+    from PIL import Image
+    for i in range(6):
+        nested = os.path.join(temp_image_dir, f"d{i}", "inner")
+        os.makedirs(nested)
+        Image.new('RGB', (10, 10)).save(os.path.join(nested, f"n{i}.jpg"))
+    os.makedirs(os.path.join(temp_image_dir, "locked"))
+
+    real_scandir = os.scandir
+    def scandir(path):
+        if os.path.basename(path) == "locked":
+            raise PermissionError("denied")
+        return real_scandir(path)
+    monkeypatch.setattr("src.app.file_scanner.os.scandir", scandir)
+
+    orders = []
+    for listing_workers in (1, 4):
+        found_files = []
+        scanner = FolderScanner(temp_image_dir, listing_workers=listing_workers)
+        scanner.signals.files_found.connect(lambda batch: found_files.extend(p for p, _ in batch))
+        scanner.run()
+        orders.append(found_files)
+
+    assert len(orders[0]) == 10
+    assert orders[0] == orders[1]
+
+def test_rotational_storage_reads_in_inode_order(tmp_path, qtbot):
+    from PIL import Image
+    folder = tmp_path / "disk"
+    folder.mkdir()
+    for name in ("c.jpg", "a.jpg", "b.jpg"):
+        Image.new('RGB', (10, 10)).save(folder / name)
+    by_inode = sorted(os.listdir(folder), key=lambda n: os.stat(folder / n).st_ino)
+
+    orders = {}
+    for storage in ("ssd", "hdd"):
+        found_files = []
+        scanner = FolderScanner(str(folder), storage=storage, listing_workers=4)
+        scanner.signals.files_found.connect(
+            lambda batch: found_files.extend(os.path.basename(p) for p, _ in batch))
+        scanner.run()
+        orders[storage] = found_files
+        assert scanner.read_concurrency == 1
+
+    assert orders["ssd"] == ["a.jpg", "b.jpg", "c.jpg"]
+    assert orders["hdd"] == by_inode
+
+def test_scan_records_image_headers(temp_image_dir, qtbot, tmp_path):
+    db_path = str(tmp_path / "headers.db")
+    from src.app.database import DatabaseManager
+    DatabaseManager(db_path)
+    FolderScanner(temp_image_dir, db_path, incremental=True).run()
+
+    import sqlite3
+    conn = sqlite3.connect(db_path)
+    rows = dict(conn.execute("SELECT filename, width || 'x' || height || ' ' || format FROM images"))
+    assert rows == {"test1.jpg": "10x10 JPEG", "test2.png": "10x10 PNG",
+                    "test3.webp": "10x10 WEBP", "test4.BMP": "10x10 BMP"}
+
+    # Images indexed before headers were recorded get them on the next scan
+    conn.execute("UPDATE images SET width = NULL, height = NULL, format = NULL")
+    conn.commit()
+    FolderScanner(temp_image_dir, db_path, incremental=True).run()
+    assert conn.execute("SELECT count(*) FROM images WHERE width = 10").fetchone()[0] == 4
+
+    import unittest.mock as mock
+    with mock.patch("src.app.file_scanner.read_header") as read_header:
+        FolderScanner(temp_image_dir, db_path, incremental=True).run()
+        assert read_header.call_count == 0
+    conn.close()
+
+def write_archive(path, members):
+    import io
+    import zipfile
+    from PIL import Image
+    with zipfile.ZipFile(path, "w") as zf:
+        for name, color in members:
+            buffer = io.BytesIO()
+            Image.new('RGB', (12, 8), color=color).save(buffer, format="PNG")
+            zf.writestr(name, buffer.getvalue())
+
+def test_archives_are_scanned_as_folders(temp_image_dir, qtbot, tmp_path, monkeypatch):
+    db_path = str(tmp_path / "archives.db")
+    from src.app.database import DatabaseManager
+    DatabaseManager(db_path)
+    archive = os.path.join(temp_image_dir, "sub", "export.zip")
+    write_archive(archive, [("x.png", "red"), ("pages/y.png", "blue")])
+    member_x, member_y = archive + "!/x.png", archive + "!/pages/y.png"
+
+    found = []
+    scanner = FolderScanner(temp_image_dir, db_path, incremental=True)
+    scanner.signals.files_found.connect(lambda batch: found.extend(p for p, _ in batch))
+    scanner.run()
+    assert member_x in found and member_y in found
+    assert len(found) == 6
+
+    import sqlite3
+    import zipfile
+    conn = sqlite3.connect(db_path)
+    row = conn.execute(
+        "SELECT member_crc, width, height, thumb_length FROM images WHERE path = ?", (member_y,)
+    ).fetchone()
+    assert row[:3] == (zipfile.ZipFile(archive).getinfo("pages/y.png").CRC, 12, 8)
+    assert row[3] > 0
+
+    # Unchanged archives are not opened again
+    def fail(*args):
+        raise AssertionError("unchanged archive listed")
+    monkeypatch.setattr("src.app.file_scanner.list_members", fail)
+    os.utime(os.path.join(temp_image_dir, "sub")) # relist the folder holding it
+    scanner = FolderScanner(temp_image_dir, db_path, incremental=True)
+    scanner.signals.files_found.connect(lambda batch: found.extend(p for p, _ in batch))
+    scanner.run()
+    monkeypatch.undo()
+
+    # A rewritten archive only regenerates changed members and drops removed ones
+    write_archive(archive, [("x.png", "red"), ("z.png", "green")])
+    import unittest.mock as mock
+    removed = []
+    with mock.patch('src.ui.thumbnail_gen.ThumbnailGenerator.generate_with_source') as mock_gen:
+        mock_gen.return_value = (b"thumb", "fast")
+        scanner = FolderScanner(temp_image_dir, db_path, incremental=True)
+        scanner.signals.files_removed.connect(removed.extend)
+        scanner.run()
+        assert mock_gen.call_count == 1
+    assert removed == [member_y]
+
+    # Maintenance and refreshes of the archive itself keep its members
+    assert DatabaseManager(db_path).run_maintenance()["removed_paths"] == []
+    from src.app.file_scanner import DirectoryRefresher
+    refresher = DirectoryRefresher(temp_image_dir, [archive], db_path)
+    refresher.run()
+    assert refresher.removed_paths == []
+    assert conn.execute("SELECT count(*) FROM images WHERE member_crc IS NOT NULL").fetchone()[0] == 2
+
+    os.remove(archive)
+    removed = []
+    scanner = FolderScanner(temp_image_dir, db_path, incremental=True)
+    scanner.signals.files_removed.connect(removed.extend)
+    scanner.run()
+    assert removed == [member_x, archive + "!/z.png"]
+    assert conn.execute("SELECT count(*) FROM directories WHERE path = ?", (archive,)).fetchone()[0] == 0
+    conn.close()
+
+def test_images_over_decode_budget_are_deferred(temp_image_dir, qtbot, tmp_path):
+    from PIL import Image
+    Image.new('RGB', (40, 30), color='blue').save(os.path.join(temp_image_dir, "big.png"))
+    db_path = str(tmp_path / "budget.db")
+    from src.app.database import DatabaseManager
+    DatabaseManager(db_path)
+
+    found_files = []
+    scanner = FolderScanner(temp_image_dir, db_path, incremental=True)
+    scanner.MAX_DECODE_PIXELS = 10 * 10
+    scanner.signals.files_found.connect(
+        lambda batch: found_files.extend((os.path.basename(p), t) for p, t in batch))
+    scanner.run()
+
+    names = [name for name, _ in found_files]
+    # A placeholder in walk order, the thumbnail after everything else
+    assert names.index("big.png") < names.index("test3.webp")
+    assert found_files[names.index("big.png")][1] is None
+    assert names[-1] == "big.png" and found_files[-1][1]
+    assert len(found_files) == 6
+
+    import sqlite3
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT width FROM images WHERE filename = 'big.png'").fetchone() == (40,)
+    conn.close()
+
+def test_decode_budget_follows_measured_rate():
+    scanner = FolderScanner("unused")
+    assert scanner._pixel_budget() == scanner.MAX_DECODE_PIXELS
+    for _ in range(scanner.DECODE_RATE_SAMPLES):
+        scanner._record_decode({"width": 5000, "height": 4000}, 1.0)
+    # 20 MP per second may take DECODE_SECONDS
+    assert scanner._pixel_budget() == int(20_000_000 * scanner.DECODE_SECONDS)
+    for _ in range(100):
+        scanner._record_decode({"width": 1000, "height": 1000}, 1.0)
+    assert scanner._pixel_budget() == scanner.MIN_DECODE_PIXELS
+
+def test_undecodable_images_keep_their_placeholder(temp_image_dir, qtbot, tmp_path, monkeypatch):
+    from PIL import Image
+    Image.new('RGB', (40, 30), color='blue').save(os.path.join(temp_image_dir, "bomb.png"))
+    # Pillow refuses to decode it, as it would a 20000x20000 PNG
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 100)
+    db_path = str(tmp_path / "bomb.db")
+    from src.app.database import DatabaseManager
+    DatabaseManager(db_path)
+
+    found = []
+    scanner = FolderScanner(temp_image_dir, db_path, incremental=True)
+    scanner.signals.files_found.connect(found.extend)
+    scanner.run()
+    bomb = os.path.join(temp_image_dir, "bomb.png")
+    assert (bomb, None) in found
+    assert len({path for path, _ in found}) == 5
+
+    import sqlite3
+    conn = sqlite3.connect(db_path)
+    assert conn.execute(
+        "SELECT width, thumbnail_source, thumb_length FROM images WHERE path = ?", (bomb,)
+    ).fetchone() == (40, FolderScanner.SOURCE_UNDECODABLE, None)
+    conn.close()
+
+    # Later scans show the placeholder without trying again
+    import unittest.mock as mock
+    for snapshot in (False, True):
+        found = []
+        with mock.patch('src.app.file_scanner.ingest_file') as ingest:
+            scanner = FolderScanner(temp_image_dir, db_path, incremental=True, snapshot=snapshot)
+            scanner.signals.files_found.connect(found.extend)
+            scanner.run()
+            assert ingest.call_count == 0
+        assert found.count((bomb, None)) == 1
+
+def test_overdue_pool_jobs_leave_the_queue_limit(monkeypatch):
+    from src.app import file_scanner
+    class Job:
+        def __init__(self, running):
+            self._running = running
+        def running(self):
+            return self._running
+    clock = [100.0]
+    monkeypatch.setattr(file_scanner.time, "monotonic", lambda: clock[0])
+    scanner = FolderScanner("unused", max_workers=2)
+    pending = {Job(True): ("/slow.png",), Job(False): ("/queued.png",)}
+    assert scanner._busy_jobs(pending) == 2
+    clock[0] += scanner.DECODE_SECONDS / 2
+    assert scanner._busy_jobs(pending) == 2
+    clock[0] += scanner.DECODE_SECONDS
+    assert scanner._busy_jobs(pending) == 1
+
+def test_incremental_scan_retries_images_that_failed(temp_image_dir, qtbot, tmp_path):
+    db_path = str(tmp_path / "retry.db")
+    from src.app.database import DatabaseManager
+    DatabaseManager(db_path)
+    sub_dir = os.path.join(temp_image_dir, "sub")
+    partial = os.path.join(sub_dir, "copying.jpg")
+    from PIL import Image
+    Image.new('RGB', (10, 10), color='green').save(partial)
+    with open(partial, "rb") as f:
+        data = f.read()
+    with open(partial, "wb") as f:
+        f.write(data[:20]) # Still being copied
+    mtime = os.stat(sub_dir).st_mtime_ns - 60_000_000_000
+    os.utime(sub_dir, ns=(0, mtime))
+    FolderScanner(temp_image_dir, db_path, incremental=True).run()
+
+    import sqlite3
+    conn = sqlite3.connect(db_path)
+    assert conn.execute(
+        "SELECT mtime_ns FROM directories WHERE path = ?", (sub_dir,)
+    ).fetchone() == (None,)
+    conn.close()
+
+    # The copy completes without changing the directory's mtime
+    with open(partial, "wb") as f:
+        f.write(data)
+    os.utime(sub_dir, ns=(0, mtime))
+    found_files = []
+    scanner = FolderScanner(temp_image_dir, db_path, incremental=True)
+    scanner.signals.files_found.connect(lambda batch: found_files.extend(p for p, _ in batch))
+    scanner.run()
+    assert partial in found_files
+
+def test_recently_modified_directories_are_listed_again(temp_image_dir, qtbot, tmp_path):
+    db_path = str(tmp_path / "racy.db")
+    from src.app.database import DatabaseManager
+    DatabaseManager(db_path)
+    sub_dir = os.path.join(temp_image_dir, "sub")
+    # Modified within the mtime granularity of the scan
+    os.utime(sub_dir)
+    FolderScanner(temp_image_dir, db_path, incremental=True).run()
+
+    import sqlite3
+    conn = sqlite3.connect(db_path)
+    mtimes = dict(conn.execute("SELECT path, mtime_ns FROM directories"))
+    conn.close()
+    assert mtimes[sub_dir] is None
+    assert mtimes[temp_image_dir] == os.stat(temp_image_dir).st_mtime_ns
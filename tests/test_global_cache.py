@@ -0,0 +1,235 @@
+import os
+import pytest
+from src.app.file_ops import content_fingerprint
+from src.app.global_cache import GlobalThumbnailCache
+
+@pytest.fixture
+def cache(tmp_path):
+    return GlobalThumbnailCache(str(tmp_path / "cache"), max_bytes=1000)
+
+def test_content_fingerprint(tmp_path):
+    small = tmp_path / "small.bin"
+    small.write_bytes(b"sticker")
+    copy = tmp_path / "copy.bin"
+    copy.write_bytes(b"sticker")
+    other = tmp_path / "other.bin"
+    other.write_bytes(b"stickeR")
+    assert content_fingerprint(str(small)) == content_fingerprint(str(copy))
+    assert content_fingerprint(str(small)) != content_fingerprint(str(other))
+    assert content_fingerprint(str(tmp_path / "missing.bin")) is None
+
+    # Large files only hash the head, middle and tail blocks
+    block = 1024
+    data = bytearray(os.urandom(10 * block))
+    large = tmp_path / "large.bin"
+    large.write_bytes(data)
+    fingerprint = content_fingerprint(str(large), block_size=block)
+    data[2 * block] ^= 0xFF # outside the sampled blocks
+    large.write_bytes(data)
+    assert content_fingerprint(str(large), block_size=block) == fingerprint
+    data[-1] ^= 0xFF
+    large.write_bytes(data)
+    assert content_fingerprint(str(large), block_size=block) != fingerprint
+
+def test_put_and_get(cache):
+    variant = GlobalThumbnailCache.variant((150, 150), "fast", True, "jpeg")
+    assert cache.get("key", variant) == (None, None)
+    cache.put("key", variant, b"thumbnail", "embedded")
+    data, source = cache.get("key", variant)
+    assert data == b"thumbnail" and source == "embedded"
+    assert cache.get("key", GlobalThumbnailCache.variant((150, 150), "exact", True, "jpeg")) == (None, None)
+    assert cache.get_many(["key", "other"], variant) == {"key": (data, "embedded")}
+
+    cache.put("key", variant, b"replaced")
+    assert cache.total_bytes == len(b"replaced")
+
+def test_lru_eviction(cache):
+    for key in "abcd":
+        cache.put(key, "v", key.encode() * 300)
+    # Only three fit; "a" was used least recently
+    assert cache.get("a", "v") == (None, None)
+    assert cache.total_bytes <= cache.max_bytes
+
+    cache.get("b", "v") # "c" is now the least recently used
+    cache.put("e", "v", b"e" * 300)
+    assert cache.get("c", "v") == (None, None)
+    assert cache.get("b", "v")[0] == b"b" * 300
+    assert cache.get("e", "v")[0] == b"e" * 300
+
+def test_shrinking_bound_evicts(tmp_path):
+    directory = str(tmp_path / "shared")
+    cache = GlobalThumbnailCache.for_directory(directory)
+    assert GlobalThumbnailCache.for_directory(directory) is cache
+    cache.put("a", "v", b"a" * 100)
+    cache.put("b", "v", b"b" * 100)
+    GlobalThumbnailCache.for_directory(directory, max_bytes=150)
+    assert cache.get("a", "v") == (None, None)
+    assert cache.total_bytes == 100
+
+def test_processes_share_the_cache(tmp_path):
+    import sys
+    import subprocess
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    cache_dir = str(tmp_path / "cache")
+    code = (
+        "import sys; from src.app.global_cache import GlobalThumbnailCache; "
+        "cache = GlobalThumbnailCache(sys.argv[1], max_bytes=1 << 30); "
+        "[cache.put(f'{sys.argv[2]}{i}', 'v', sys.argv[2].encode() * (i + 1)) for i in range(400)]"
+    )
+    writers = [subprocess.Popen([sys.executable, "-c", code, cache_dir, name], cwd=root)
+               for name in ("a", "b", "c")]
+    assert all(writer.wait(timeout=120) == 0 for writer in writers)
+
+    # No writer overwrote another one's records
+    cache = GlobalThumbnailCache(cache_dir)
+    for name in ("a", "b", "c"):
+        found = cache.get_many([f"{name}{i}" for i in range(400)], "v")
+        assert len(found) == 400
+        assert all(bytes(data) == name.encode() * (int(key[1:]) + 1)
+                   for key, (data, _) in found.items())
+
+def test_appends_after_another_process_compacted(tmp_path):
+    directory = str(tmp_path / "cache")
+    mine = GlobalThumbnailCache(directory)
+    mine.put("before", "v", b"x" * 100)
+    # Another process fills the cache until it evicts and compacts the pack
+    other = GlobalThumbnailCache(directory, max_bytes=1 << 20)
+    for i in range(30):
+        other.put(f"big{i}", "v", os.urandom(100 * 1024))
+    mine.put("after", "v", b"y" * 100)
+    assert other.get("after", "v")[0] == b"y" * 100
+
+def test_scanner_shares_thumbnails_between_workspaces(tmp_path, qtbot):
+    from PIL import Image
+    from src.app.database import DatabaseManager
+    from src.app.file_scanner import FolderScanner
+    import sqlite3
+    import unittest.mock as mock
+
+    cache_dir = str(tmp_path / "cache")
+    for workspace in ("one", "two"):
+        folder = tmp_path / workspace
+        folder.mkdir()
+        for name in ("meme.png", "copy.png"):
+            Image.new('RGB', (40, 40), color='purple').save(folder / name)
+
+    db_one = str(tmp_path / "one" / ".pic_analyzer.db")
+    DatabaseManager(db_one)
+    from src.ui.thumbnail_gen import ThumbnailGenerator
+    original = ThumbnailGenerator.generate_with_source
+    with mock.patch('src.ui.thumbnail_gen.ThumbnailGenerator.generate_with_source',
+                    side_effect=original) as mock_gen:
+        FolderScanner(str(tmp_path / "one"), db_one, global_cache_dir=cache_dir).run()
+        # Identical content is only thumbnailed once
+        assert mock_gen.call_count == 1
+
+    db_two = str(tmp_path / "two" / ".pic_analyzer.db")
+    DatabaseManager(db_two)
+    found = []
+    scanner = FolderScanner(str(tmp_path / "two"), db_two, global_cache_dir=cache_dir)
+    scanner.signals.files_found.connect(lambda batch: found.extend(t for _, t in batch))
+    with mock.patch('src.ui.thumbnail_gen.ThumbnailGenerator.generate_with_source') as mock_gen:
+        scanner.run()
+        assert mock_gen.call_count == 0
+    assert len(found) == 2
+
+    conn = sqlite3.connect(db_two)
+    rows = conn.execute("SELECT thumb_length, content_key, thumbnail_source FROM images").fetchall()
+    conn.close()
+    # The workspace keeps its own copy
+    assert all(length and key and source == "fast" for length, key, source in rows)
+
+    # Rows that only reference the cache (as older versions wrote them) get
+    # their copy on the next scan
+    conn = sqlite3.connect(db_two)
+    conn.execute("UPDATE images SET thumb_offset = NULL, thumb_length = NULL")
+    conn.commit()
+    conn.close()
+    found.clear()
+    scanner = FolderScanner(str(tmp_path / "two"), db_two, global_cache_dir=cache_dir)
+    scanner.signals.files_found.connect(lambda batch: found.extend(t for _, t in batch))
+    with mock.patch('src.ui.thumbnail_gen.ThumbnailGenerator.generate_with_source') as mock_gen:
+        scanner.run()
+        assert mock_gen.call_count == 0
+    assert len(found) == 2 and all(isinstance(t, memoryview) for t in found)
+    conn = sqlite3.connect(db_two)
+    assert conn.execute("SELECT count(*) FROM images WHERE thumb_length").fetchone()[0] == 2
+    conn.close()
+
+    # Clearing the cache loses nothing
+    GlobalThumbnailCache.for_directory(cache_dir, max_bytes=0)
+    found.clear()
+    scanner = FolderScanner(str(tmp_path / "two"), db_two, global_cache_dir=cache_dir)
+    scanner.signals.files_found.connect(lambda batch: found.extend(t for _, t in batch))
+    with mock.patch('src.ui.thumbnail_gen.ThumbnailGenerator.generate_with_source') as mock_gen:
+        scanner.run()
+        assert mock_gen.call_count == 0
+    assert len(found) == 2
+
+    # Pyramid levels are derived from the base thumbnail
+    from src.app.thumb_store import ThumbnailPack, ThumbnailPyramid
+    conn = sqlite3.connect(db_two)
+    pyramid = ThumbnailPyramid(conn, ThumbnailPack.for_database(db_two),
+                               global_cache=GlobalThumbnailCache.for_directory(cache_dir))
+    with mock.patch('src.ui.thumbnail_gen.ThumbnailGenerator.generate_with_source') as mock_gen:
+        assert len(pyramid.load([str(tmp_path / "two" / "meme.png")], 64)) == 1
+        assert mock_gen.call_count == 0
+    conn.close()
+
+def test_scanner_reads_new_images_once(tmp_path, monkeypatch):
+    import builtins
+    from PIL import Image
+    from src.app.database import DatabaseManager
+    from src.app.file_scanner import FolderScanner
+
+    cache_dir = str(tmp_path / "cache")
+    paths = []
+    for workspace in ("one", "two"):
+        folder = tmp_path / workspace
+        folder.mkdir()
+        Image.new('RGB', (40, 40), color='teal').save(folder / "meme.png")
+        paths.append(str(folder / "meme.png"))
+        DatabaseManager(str(folder / ".pic_analyzer.db"))
+
+    opened = []
+    real_open = builtins.open
+    def counting_open(file, *args, **kwargs):
+        if file in paths:
+            opened.append(file)
+        return real_open(file, *args, **kwargs)
+    monkeypatch.setattr(builtins, "open", counting_open)
+
+    # A miss, then a hit: each fingerprinted and parsed from a single read
+    for folder in ("one", "two"):
+        FolderScanner(str(tmp_path / folder), str(tmp_path / folder / ".pic_analyzer.db"),
+                      global_cache_dir=cache_dir).run()
+    assert opened == paths
+
+def test_pool_workers_reuse_cached_thumbnails(tmp_path):
+    import sqlite3
+    from PIL import Image
+    from src.app.database import DatabaseManager
+    from src.app.file_scanner import FolderScanner
+
+    cache_dir = str(tmp_path / "cache")
+    for workspace in ("one", "two"):
+        folder = tmp_path / workspace
+        folder.mkdir()
+        for i in range(4):
+            Image.new('RGB', (40, 40), color=(i * 50, 0, 0)).save(folder / f"{i}.png")
+        DatabaseManager(str(folder / ".pic_analyzer.db"))
+
+    FolderScanner(str(tmp_path / "one"), str(tmp_path / "one" / ".pic_analyzer.db"),
+                  global_cache_dir=cache_dir).run()
+    cache = GlobalThumbnailCache.for_directory(cache_dir)
+    pack_size = cache.pack.size()
+
+    db_two = str(tmp_path / "two" / ".pic_analyzer.db")
+    scanner = FolderScanner(str(tmp_path / "two"), db_two, max_workers=2,
+                            global_cache_dir=cache_dir)
+    scanner.run()
+    # Hits are not stored again
+    assert cache.pack.size() == pack_size
+    conn = sqlite3.connect(db_two)
+    assert conn.execute("SELECT count(*) FROM images WHERE thumb_length").fetchone()[0] == 4
+    conn.close()
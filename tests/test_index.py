@@ -0,0 +1,113 @@
+import os
+import sys
+import json
+import sqlite3
+import subprocess
+import pytest
+from PIL import Image
+from src.app.index import run_index, main, ProgressReporter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture
+def image_dir(tmp_path):
+    img_dir = tmp_path / "images"
+    (img_dir / "sub").mkdir(parents=True)
+    for i, name in enumerate(["a.jpg", "b.png", "sub/c.webp"]):
+        Image.new('RGB', (40, 30), color=(i * 60, 0, 0)).save(img_dir / name)
+    return str(img_dir)
+
+def test_run_index(image_dir):
+    progress = ProgressReporter(stream=None)
+    summary = run_index(image_dir, progress=progress)
+
+    assert summary["status"] == "finished"
+    assert summary["images"] == 3
+    assert summary["generated"] == 3
+    assert summary["database"] == os.path.join(image_dir, ".pic_analyzer.db")
+    conn = sqlite3.connect(summary["database"])
+    assert conn.execute("SELECT count(*) FROM images").fetchone()[0] == 3
+    conn.close()
+
+    # The workspace is now warm
+    summary = run_index(image_dir)
+    assert summary["images"] == 3
+    assert summary["generated"] == 0
+
+def test_main_writes_summary(image_dir, tmp_path):
+    summary_path = str(tmp_path / "summary.json")
+    db_path = str(tmp_path / "custom.db")
+    assert main([image_dir, "--db", db_path, "--no-global-cache", "-q",
+                 "--summary", summary_path]) == 0
+    with open(summary_path) as f:
+        summary = json.load(f)
+    assert summary["database"] == db_path
+    assert summary["images"] == 3
+    assert summary["images_per_second"] > 0
+
+def test_main_keeps_thumbnails_in_the_workspace(image_dir, tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "user-cache"))
+    assert main([image_dir, "-q"]) == 0
+    conn = sqlite3.connect(os.path.join(image_dir, ".pic_analyzer.db"))
+    rows = conn.execute("SELECT thumb_length FROM images").fetchall()
+    conn.close()
+    assert len(rows) == 3 and all(length for length, in rows)
+    assert os.path.getsize(os.path.join(image_dir, ".pic_analyzer.thumbs")) > 0
+    assert not (tmp_path / "user-cache").exists()
+
+def test_global_cache_is_opt_in(image_dir):
+    from src.app.index import build_parser
+    from src.app.global_cache import default_cache_dir
+    parser = build_parser()
+    assert parser.parse_args([image_dir]).global_cache is None
+    assert parser.parse_args([image_dir, "--global-cache"]).global_cache == default_cache_dir()
+    assert parser.parse_args([image_dir, "--global-cache", "/tmp/c"]).global_cache == "/tmp/c"
+
+def test_main_rejects_missing_folder(tmp_path, capsys):
+    assert main([str(tmp_path / "missing")]) == 1
+
+def test_cli_runs_without_qt(image_dir):
+    result = subprocess.run(
+        [sys.executable, "-c",
+         "import sys, runpy; sys.argv = sys.argv[1:]; "
+         "runpy.run_module('src.app.index', run_name='__main__')",
+         "index", image_dir, "--workers", "2", "--no-global-cache", "-q"],
+        cwd=ROOT, capture_output=True, text=True, timeout=120,
+        env=dict(os.environ, PIC_ANALYZER_NO_QT="1"),
+    )
+    assert result.returncode == 0, result.stderr
+    summary = json.loads(result.stdout)
+    assert summary["status"] == "finished"
+    assert summary["workers"] == 2
+    assert summary["images"] == 3
+
+def test_qt_free_signals():
+    code = (
+        "import sys\n"
+        "from src.app.qt_compat import HAS_QT, QObject, Signal\n"
+        "assert not HAS_QT and 'PySide6' not in sys.modules\n"
+        "class S(QObject):\n"
+        "    batch = Signal(list)\n"
+        "    relay = Signal(list)\n"
+        "a, b, seen = S(), S(), []\n"
+        "a.batch.connect(b.relay)\n"
+        "b.relay.connect(seen.append)\n"
+        "a.batch.emit([1])\n"
+        "assert seen == [[1]] and not S().batch._slots\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True,
+        env=dict(os.environ, PIC_ANALYZER_NO_QT="1"),
+    )
+    assert result.returncode == 0, result.stderr
+
+def test_main_stores_scan_rules(image_dir):
+    from src.app.scan_rules import ScanRules
+    assert main([image_dir, "--no-global-cache", "-q", "--exclude", "sub",
+                 "--max-size", "100000"]) == 0
+    conn = sqlite3.connect(os.path.join(image_dir, ".pic_analyzer.db"))
+    rules = ScanRules.load(conn)
+    assert "sub" in rules.exclude and ".*" in rules.exclude
+    assert rules.max_size == 100000
+    assert conn.execute("SELECT count(*) FROM images").fetchone()[0] == 2
+    conn.close()
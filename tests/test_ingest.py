@@ -0,0 +1,122 @@
+import builtins
+import os
+import pytest
+from datetime import datetime
+from PIL import Image
+from src.app import ingest
+from src.app.file_ops import content_fingerprint, fingerprint_data
+from src.app.ingest import ingest_file, read_file, read_header, pixel_count
+
+
+@pytest.fixture
+def photo(tmp_path):
+    path = str(tmp_path / "photo.jpg")
+    exif = Image.Exif()
+    exif.get_ifd(0x8769)[0x9003] = "2021:06:15 10:30:00" # DateTimeOriginal
+    Image.new("RGB", (64, 48), "green").save(path, exif=exif)
+    return path
+
+
+@pytest.mark.parametrize("mmap_min_bytes", [ingest.MMAP_MIN_BYTES, 0])
+def test_read_file_returns_whole_content(photo, monkeypatch, mmap_min_bytes):
+    monkeypatch.setattr(ingest, "MMAP_MIN_BYTES", mmap_min_bytes)
+    with open(photo, "rb") as f:
+        expected = f.read()
+    data, stream = read_file(photo)
+    try:
+        assert len(data) == len(expected)
+        assert data[:] == expected
+        assert stream.name == photo
+        stream.seek(10)
+        assert stream.read(5) == expected[10:15]
+        assert stream.tell() == 15
+    finally:
+        stream.close()
+
+
+@pytest.mark.parametrize("size", [100, 64 * 1024 * 3 + 1, 1 << 20])
+def test_fingerprint_data_matches_file_fingerprint(tmp_path, size):
+    path = tmp_path / "blob"
+    path.write_bytes(os.urandom(size))
+    assert fingerprint_data(path.read_bytes()) == content_fingerprint(str(path))
+
+
+def test_read_header(photo):
+    data, stream = read_file(photo)
+    header = read_header(stream)
+    stream.close()
+    assert header["width"] == 64
+    assert header["height"] == 48
+    assert header["format"] == "JPEG"
+    assert header["taken_at"] == datetime(2021, 6, 15, 10, 30).timestamp()
+
+
+def test_read_header_of_garbage(tmp_path):
+    path = tmp_path / "broken.jpg"
+    path.write_bytes(b"not an image")
+    data, stream = read_file(str(path))
+    assert read_header(stream) == {}
+    stream.close()
+
+
+def test_ingest_file_reads_once(photo, monkeypatch):
+    opened = []
+    real_open = builtins.open
+    def counting_open(file, *args, **kwargs):
+        if file == photo:
+            opened.append(file)
+        return real_open(file, *args, **kwargs)
+    monkeypatch.setattr(builtins, "open", counting_open)
+
+    thumbnail, source, content_key, header, cached = ingest_file(photo)
+
+    assert opened == [photo]
+    assert thumbnail and source == "fast"
+    assert content_key == content_fingerprint(photo)
+    assert header["width"] == 64
+    assert not cached
+
+
+def test_ingest_file_keeps_given_fingerprint(photo):
+    assert ingest_file(photo, content_key="known")[2] == "known"
+
+
+def test_ingest_file_reuses_cached_thumbnail(photo, monkeypatch):
+    from src.ui.thumbnail_gen import ThumbnailGenerator
+    def fail(*args, **kwargs):
+        raise AssertionError("decoded a cached image")
+    monkeypatch.setattr(ThumbnailGenerator, "generate_with_source", fail)
+    keys = []
+    def lookup(content_key):
+        keys.append(content_key)
+        return b"cached", "embedded"
+
+    # Even over the pixel budget: nothing needs decoding
+    result = ingest_file(photo, lookup=lookup, max_pixels=1)
+    assert result[:2] == (b"cached", "embedded") and result[4]
+    assert keys == [content_fingerprint(photo)]
+    assert result[3]["width"] == 64
+
+
+def test_ingest_missing_file(tmp_path):
+    assert ingest_file(str(tmp_path / "gone.jpg")) == (None, None, None, {}, False)
+
+
+def test_ingest_file_skips_decoding_over_pixel_budget(photo):
+    thumbnail, source, content_key, header, _ = ingest_file(photo, max_pixels=64 * 48 - 1)
+    assert (thumbnail, source) == (None, None)
+    assert content_key == content_fingerprint(photo)
+    assert pixel_count(header) == 64 * 48
+    assert ingest_file(photo, max_pixels=64 * 48)[0]
+
+
+def test_read_header_of_decompression_bomb(tmp_path, monkeypatch):
+    path = str(tmp_path / "huge.png")
+    Image.new("RGB", (40, 30)).save(path)
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 100)
+    with pytest.raises(Image.DecompressionBombError):
+        Image.open(path)
+    assert pixel_count(read_header(path)) == 40 * 30
+    data, stream = read_file(path)
+    assert read_header(stream)["format"] == "PNG"
+    stream.close()
@@ -0,0 +1,91 @@
+import os
+import pytest
+from src.app import io_tuning
+from src.app.io_tuning import ConcurrencyTuner, storage_class, timed_call
+
+
+def test_mount_fstype_uses_longest_mount_point(tmp_path):
+    mounts = tmp_path / "mounts"
+    mounts.write_text(
+        "/dev/sda1 / ext4 rw 0 0\n"
+        "server:/photos /mnt/photos nfs4 rw 0 0\n"
+        "//nas/my\\040share /mnt/my\\040share cifs rw 0 0\n"
+    )
+    assert io_tuning._mount_fstype("/mnt/photos/2024", str(mounts)) == "nfs4"
+    assert io_tuning._mount_fstype("/mnt/photosynth", str(mounts)) == "ext4"
+    assert io_tuning._mount_fstype("/mnt/my share/a", str(mounts)) == "cifs"
+    assert io_tuning._mount_fstype("/x", str(tmp_path / "missing")) is None
+
+
+def test_rotational_reads_parent_of_partitions(tmp_path):
+    disk = tmp_path / "disk"
+    (disk / "queue").mkdir(parents=True)
+    (disk / "queue" / "rotational").write_text("1\n")
+    partition = disk / "part1"
+    partition.mkdir()
+    sysfs = tmp_path / "dev" / "block"
+    sysfs.mkdir(parents=True)
+    device = os.makedev(8, 1)
+    os.symlink(partition, sysfs / "8:1")
+
+    assert io_tuning._rotational(device, str(sysfs)) is True
+    assert io_tuning._rotational(os.makedev(9, 9), str(sysfs)) is None
+
+
+def test_storage_class(monkeypatch, tmp_path):
+    monkeypatch.setattr(io_tuning.sys, "platform", "linux")
+    monkeypatch.setattr(io_tuning, "_mount_fstype", lambda path: "nfs")
+    assert storage_class(str(tmp_path)) == io_tuning.STORAGE_NETWORK
+
+    monkeypatch.setattr(io_tuning, "_mount_fstype", lambda path: "ext4")
+    monkeypatch.setattr(io_tuning, "_rotational", lambda device: False)
+    assert storage_class(str(tmp_path)) == io_tuning.STORAGE_SSD
+    monkeypatch.setattr(io_tuning, "_rotational", lambda device: None)
+    assert storage_class(str(tmp_path)) == io_tuning.STORAGE_UNKNOWN
+
+    monkeypatch.setattr(io_tuning.sys, "platform", "win32")
+    assert storage_class(str(tmp_path)) == io_tuning.STORAGE_UNKNOWN
+
+
+def test_timed_call():
+    result, seconds = timed_call(max, 1, 2)
+    assert result == 2
+    assert seconds >= 0
+
+
+def run_tuner(tuner, monkeypatch, throughput_at, windows):
+    """Feeds ``windows`` windows whose throughput depends on the limit."""
+    clock = [0.0]
+    monkeypatch.setattr(io_tuning.time, "monotonic", lambda: clock[0])
+    tuner._reset_window()
+    limits = []
+    for _ in range(windows):
+        # One second per window, so throughput == bytes recorded
+        per_read = throughput_at(tuner.limit) / tuner.WINDOW
+        for i in range(tuner.WINDOW):
+            if i == tuner.WINDOW - 1:
+                clock[0] += 1.0
+            tuner.record(per_read, 0.01)
+        limits.append(tuner.limit)
+    return limits
+
+
+def test_tuner_backs_off_when_readers_thrash(monkeypatch):
+    # A spinning disk: every extra reader costs throughput
+    tuner = ConcurrencyTuner(1, 8)
+    limits = run_tuner(tuner, monkeypatch, lambda n: 100.0 / n, 12)
+    assert limits[-1] <= 2
+
+
+def test_tuner_climbs_while_throughput_scales(monkeypatch):
+    # A network share: throughput grows with concurrency up to 6 readers
+    tuner = ConcurrencyTuner(1, 8, initial=1)
+    limits = run_tuner(tuner, monkeypatch, lambda n: 100.0 * min(n, 6), 12)
+    assert limits[-1] in (5, 6, 7)
+    assert tuner.reads == 12 * tuner.WINDOW
+    assert tuner.mean_latency() == pytest.approx(0.01)
+
+
+def test_tuner_with_a_single_reader_never_moves(monkeypatch):
+    tuner = ConcurrencyTuner(1, 1)
+    assert run_tuner(tuner, monkeypatch, lambda n: 100.0, 3) == [1, 1, 1]
@@ -29,3 +29,12 @@ def test_date_grouping_run(tmp_path):
     # Test year granularity
     result_year = plugin.run(str(test_file), granularity="year")
     assert result_year["date"] == "2024"
+
+
+def test_date_grouping_reads_archive_member_dates(tmp_path):
+    import zipfile
+    archive = tmp_path / "album.cbz"
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr(zipfile.ZipInfo("p1.jpg", (2019, 7, 14, 12, 0, 0)), b"data")
+    result = DateGroupingPlugin().run(str(archive) + "!/p1.jpg", granularity="day")
+    assert result == {"date": "2019-07-14"}
@@ -0,0 +1,52 @@
+import sqlite3
+import pytest
+from src.app.database import DatabaseManager
+from src.app.scan_rules import ScanRules
+
+def test_default_rules_prune_junk():
+    rules = ScanRules()
+    assert rules.excludes_dir(".git")
+    assert rules.excludes_dir("photos/@eaDir")
+    assert not rules.excludes_dir("photos/2024")
+    assert not rules.accepts_file("photos/._IMG_1.jpg")
+    assert rules.accepts_file("photos/IMG_1.jpg", 1000)
+
+def test_patterns_with_slashes_match_relative_paths():
+    rules = ScanRules(exclude=["cache/*", "exports/", "*.tmp.jpg"])
+    assert rules.excludes_dir("cache/thumbs")
+    assert not rules.excludes_dir("other/cache/thumbs")
+    assert rules.excludes_dir("exports")
+    # Directory-only patterns leave files alone
+    assert rules.accepts_file("exports")
+    assert not rules.accepts_file("a/b.tmp.jpg")
+    assert rules.excludes_path("cache/thumbs/a.jpg")
+    assert not rules.excludes_path("keep/a.jpg")
+
+def test_include_and_size_bounds():
+    rules = ScanRules(exclude=[], include=["IMG_*"], min_size=10, max_size=100)
+    assert rules.accepts_file("IMG_1.jpg", 50)
+    assert not rules.accepts_file("DSC_1.jpg", 50)
+    assert not rules.accepts_file("IMG_1.jpg", 5)
+    assert not rules.accepts_file("IMG_1.jpg", 500)
+    # Sizes are not known for indexed paths
+    assert not rules.excludes_path("IMG_1.jpg")
+
+def test_rules_round_trip(tmp_path):
+    db_path = str(tmp_path / "rules.db")
+    DatabaseManager(db_path)
+    conn = sqlite3.connect(db_path)
+    assert ScanRules.load(conn) == ScanRules()
+
+    conn.execute("INSERT INTO directories (path) VALUES ('/x')")
+    conn.commit()
+    rules = ScanRules(exclude=["raw"], min_size=1, follow_symlinks=True)
+    rules.save(conn)
+    assert ScanRules.load(conn) == rules
+    # Changed rules invalidate the cached directory listings
+    assert conn.execute("SELECT count(*) FROM directories").fetchone()[0] == 0
+
+    conn.execute("INSERT INTO directories (path) VALUES ('/x')")
+    conn.commit()
+    rules.save(conn)
+    assert conn.execute("SELECT count(*) FROM directories").fetchone()[0] == 1
+    conn.close()
@@ -0,0 +1,217 @@
+import os
+import sqlite3
+import pytest
+from src.app.database import DatabaseManager
+from src.app.thumb_store import ThumbnailPack, ThumbnailPyramid
+from src.ui.thumbnail_gen import ThumbnailGenerator
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / ".pic_analyzer.db")
+    DatabaseManager(path)
+    return path
+
+def add_image(conn, pack, path, data):
+    offset = pack.append(data)
+    conn.execute(
+        "INSERT OR REPLACE INTO images (path, filename, thumb_offset, thumb_length) VALUES (?, ?, ?, ?)",
+        (path, os.path.basename(path), offset, len(data))
+    )
+    conn.commit()
+
+def test_pack_path_and_shared_instance(db_path, tmp_path):
+    assert ThumbnailPack.path_for(db_path) == str(tmp_path / ".pic_analyzer.thumbs")
+    assert ThumbnailPack.for_database(db_path) is ThumbnailPack.for_database(db_path)
+
+def test_append_and_read(tmp_path):
+    pack = ThumbnailPack(str(tmp_path / "test.thumbs"))
+    first = pack.append(b"first")
+    second = pack.append(b"second thumbnail")
+
+    view = pack.read(first, 5)
+    assert isinstance(view, memoryview)
+    assert view.readonly
+    assert view == b"first"
+    # Reading after a later append remaps the grown file
+    assert pack.read(second, 16) == b"second thumbnail"
+    third = pack.append(b"third")
+    assert pack.read(third, 5) == b"third"
+    # Earlier views stay valid after the remap
+    assert view == b"first"
+
+def test_read_rejects_mismatched_entries(tmp_path):
+    pack = ThumbnailPack(str(tmp_path / "test.thumbs"))
+    offset = pack.append(b"payload")
+    assert pack.read(offset, 3) is None
+    assert pack.read(offset + 1, 6) is None
+    assert pack.read(offset + 100, 7) is None
+    assert pack.read(None, 7) is None
+    assert ThumbnailPack(str(tmp_path / "missing.thumbs")).read(8, 4) is None
+
+def test_compaction_reclaims_dead_entries(db_path):
+    pack = ThumbnailPack(ThumbnailPack.path_for(db_path))
+    conn = sqlite3.connect(db_path)
+    for i in range(4):
+        add_image(conn, pack, f"/img/{i}.jpg", bytes([i]) * 1000)
+    # Replaced and deleted images leave dead records behind
+    add_image(conn, pack, "/img/0.jpg", b"new" * 100)
+    conn.execute("DELETE FROM images WHERE path = '/img/3.jpg'")
+    conn.commit()
+    size_before = pack.size()
+    old_view = pack.read(*conn.execute(
+        "SELECT thumb_offset, thumb_length FROM images WHERE path = '/img/1.jpg'").fetchone())
+
+    pack.compact(conn)
+    assert pack.size() < size_before
+    expected = {"/img/0.jpg": b"new" * 100, "/img/1.jpg": b"\x01" * 1000, "/img/2.jpg": b"\x02" * 1000}
+    rows = conn.execute("SELECT path, thumb_offset, thumb_length FROM images").fetchall()
+    assert {path: pack.read(offset, length) for path, offset, length in rows} == expected
+    assert old_view == b"\x01" * 1000
+    conn.close()
+
+def test_failed_compaction_removes_its_copy(db_path, monkeypatch):
+    pack = ThumbnailPack(ThumbnailPack.path_for(db_path))
+    conn = sqlite3.connect(db_path)
+    add_image(conn, pack, "/img/a.jpg", b"a" * 100)
+    add_image(conn, pack, "/img/a.jpg", b"b" * 100)
+    row = conn.execute("SELECT thumb_offset, thumb_length FROM images").fetchone()
+
+    import src.app.thumb_store as thumb_store
+    def locked(src, dst):
+        raise PermissionError("pack is mapped by another view")
+    monkeypatch.setattr(thumb_store.os, "replace", locked)
+    with pytest.raises(PermissionError):
+        pack.compact(conn)
+
+    assert not os.path.exists(pack.path + ".tmp")
+    assert conn.execute("SELECT thumb_offset, thumb_length FROM images").fetchone() == row
+    assert pack.read(*row) == b"b" * 100
+    conn.close()
+
+def test_compaction_keeps_shared_records_shared(db_path):
+    pack = ThumbnailPack(ThumbnailPack.path_for(db_path))
+    conn = sqlite3.connect(db_path)
+    add_image(conn, pack, "/img/dead.jpg", b"d" * 1000)
+    add_image(conn, pack, "/img/a.jpg", b"a" * 1000)
+    # An identical copy shares the record of a.jpg
+    conn.execute(
+        "INSERT INTO images (path, filename, thumb_offset, thumb_length) "
+        "SELECT '/img/copy.jpg', 'copy.jpg', thumb_offset, thumb_length FROM images "
+        "WHERE path = '/img/a.jpg'"
+    )
+    conn.execute("DELETE FROM images WHERE path = '/img/dead.jpg'")
+    conn.commit()
+
+    pack.compact(conn)
+    records = conn.execute("SELECT DISTINCT thumb_offset, thumb_length FROM images").fetchall()
+    assert len(records) == 1
+    assert pack.read(*records[0]) == b"a" * 1000
+    assert pack.size() == ThumbnailPack.HEADER.size + 1000
+    conn.close()
+
+def test_compact_if_needed(db_path, monkeypatch):
+    pack = ThumbnailPack(ThumbnailPack.path_for(db_path))
+    monkeypatch.setattr(ThumbnailPack, "COMPACT_MIN_BYTES", 1000)
+    conn = sqlite3.connect(db_path)
+    add_image(conn, pack, "/img/a.jpg", b"a" * 1000)
+    assert not pack.compact_if_needed(conn)
+    add_image(conn, pack, "/img/a.jpg", b"b" * 1000)
+    add_image(conn, pack, "/img/a.jpg", b"c" * 1000)
+    assert pack.compact_if_needed(conn)
+    offset, length = conn.execute("SELECT thumb_offset, thumb_length FROM images").fetchone()
+    assert pack.read(offset, length) == b"c" * 1000
+    assert pack.size() == length + ThumbnailPack.HEADER.size
+    conn.close()
+
+def make_indexed_image(tmp_path, db_path, size=(1200, 900)):
+    from PIL import Image
+    from src.app.file_scanner import FolderScanner
+    img_dir = tmp_path / "images"
+    img_dir.mkdir()
+    Image.new('RGB', size, color='green').save(img_dir / "photo.jpg")
+    FolderScanner(str(img_dir), db_path).run()
+    return str(img_dir / "photo.jpg")
+
+def test_pyramid_level_for():
+    assert ThumbnailPyramid.level_sizes() == [64, 128, 150, 300, 600]
+    assert ThumbnailPyramid.level_for(150) == 150
+    assert ThumbnailPyramid.level_for(150, 2.0) == 300
+    assert ThumbnailPyramid.level_for(64, 1.5) == 128
+    assert ThumbnailPyramid.level_for(300, 3.0) == 600
+
+def test_pyramid_derives_smaller_levels_from_cache(tmp_path, db_path):
+    from PIL import Image
+    import io
+    import unittest.mock as mock
+    path = make_indexed_image(tmp_path, db_path)
+    conn = sqlite3.connect(db_path)
+    pyramid = ThumbnailPyramid(conn, ThumbnailPack.for_database(db_path))
+
+    with mock.patch('src.ui.thumbnail_gen.ThumbnailGenerator.generate_with_source') as mock_gen:
+        [(result_path, thumb)] = pyramid.load([path, "/not/indexed.jpg"], 64)
+        assert mock_gen.call_count == 0
+    assert result_path == path
+    assert Image.open(io.BytesIO(thumb)).size == (64, 48)
+    assert conn.execute("SELECT level FROM thumbnail_levels").fetchall() == [(64,)]
+
+    # Stored levels are served from the pack
+    with mock.patch('src.ui.thumbnail_gen.ThumbnailGenerator.downscale') as mock_downscale:
+        [(_, cached)] = pyramid.load([path], 64)
+        assert mock_downscale.call_count == 0
+    assert isinstance(cached, memoryview)
+    assert cached == thumb
+    conn.close()
+
+def test_pyramid_decodes_original_only_for_larger_levels(tmp_path, db_path):
+    from PIL import Image
+    import io
+    import unittest.mock as mock
+    path = make_indexed_image(tmp_path, db_path)
+    conn = sqlite3.connect(db_path)
+    pyramid = ThumbnailPyramid(conn, ThumbnailPack.for_database(db_path))
+
+    [(_, thumb)] = pyramid.load([path], 600)
+    assert Image.open(io.BytesIO(thumb)).size == (600, 450)
+
+    # The 300px level comes from the cached 600px one, not the original
+    sources = []
+    original_downscale = ThumbnailGenerator.downscale
+    def tracking_downscale(data, size, **kwargs):
+        sources.append(Image.open(io.BytesIO(data)).size)
+        return original_downscale(data, size, **kwargs)
+    with mock.patch('src.ui.thumbnail_gen.ThumbnailGenerator.generate_with_source') as mock_gen, \
+         mock.patch('src.ui.thumbnail_gen.ThumbnailGenerator.downscale', side_effect=tracking_downscale):
+        [(_, thumb)] = pyramid.load([path], 300)
+        assert mock_gen.call_count == 0
+    assert sources == [(600, 450)]
+    assert Image.open(io.BytesIO(thumb)).size == (300, 225)
+    conn.close()
+
+def test_compaction_keeps_levels_and_drops_orphans(tmp_path, db_path):
+    path = make_indexed_image(tmp_path, db_path)
+    conn = sqlite3.connect(db_path)
+    pack = ThumbnailPack.for_database(db_path)
+    pyramid = ThumbnailPyramid(conn, pack)
+    [(_, thumb)] = pyramid.load([path], 64)
+    thumb = bytes(thumb)
+    conn.execute("INSERT INTO thumbnail_levels VALUES (999, 64, 8, 4)")
+    conn.commit()
+
+    pack.compact(conn)
+    assert conn.execute("SELECT image_id FROM thumbnail_levels WHERE image_id = 999").fetchall() == []
+    [(_, compacted)] = pyramid.load([path], 64)
+    assert compacted == thumb
+    conn.close()
+
+def test_pack_check_leaves_no_transaction_open(db_path, monkeypatch):
+    from src.app.connections import open_connection
+    pack = ThumbnailPack(ThumbnailPack.path_for(db_path))
+    monkeypatch.setattr(ThumbnailPack, "COMPACT_MIN_BYTES", 1000)
+    conn = open_connection(db_path) # WAL, as workspaces are opened
+    add_image(conn, pack, "/img/a.jpg", b"a" * 2000)
+    assert pack.size() > ThumbnailPack.COMPACT_MIN_BYTES
+    assert not pack.compact_if_needed(conn)
+    assert not conn.in_transaction
+    # The WAL checkpoint of the post-scan compaction needs that
+    assert DatabaseManager.compact(conn, time_budget=10)
+    conn.close()
@@ -2,7 +2,7 @@ import pytest
 from PIL import Image
 import io
 import os
-from src.ui.thumbnail_gen import ThumbnailGenerator
+from src.ui.thumbnail_gen import ThumbnailGenerator, RAW_HEADER
 
 @pytest.fixture
 def test_image(tmp_path):
@@ -27,3 +27,122 @@ def test_generate_thumbnail_invalid_path():
     gen = ThumbnailGenerator()
     thumb_bytes = gen.generate("invalid_path.jpg")
     assert thumb_bytes is None
+
+@pytest.mark.parametrize("quality", ThumbnailGenerator.QUALITIES)
+def test_generate_thumbnail_qualities(test_image, quality):
+    thumb_bytes = ThumbnailGenerator.generate(test_image, quality=quality)
+    thumb_img = Image.open(io.BytesIO(thumb_bytes))
+    assert thumb_img.size == (150, 150)
+    assert thumb_img.mode == "RGB"
+
+def test_fast_path_uses_jpeg_draft(test_image, monkeypatch):
+    from PIL import JpegImagePlugin
+    drafts = []
+    original_draft = JpegImagePlugin.JpegImageFile.draft
+    def tracking_draft(self, mode, size):
+        result = original_draft(self, mode, size)
+        drafts.append(self.size)
+        return result
+    monkeypatch.setattr(JpegImagePlugin.JpegImageFile, "draft", tracking_draft)
+
+    ThumbnailGenerator.generate(test_image, quality=ThumbnailGenerator.QUALITY_FAST)
+    # The 1000px JPEG is decoded at a reduced DCT scale
+    assert drafts and drafts[-1][0] < 1000
+
+    drafts.clear()
+    ThumbnailGenerator.generate(test_image, quality=ThumbnailGenerator.QUALITY_EXACT)
+    assert drafts == []
+
+@pytest.mark.parametrize("mode", ["P", "RGBA", "L", "CMYK"])
+def test_generate_thumbnail_modes(tmp_path, mode):
+    img_path = tmp_path / f"test_{mode}.png"
+    if mode == "CMYK":
+        img_path = tmp_path / "test_cmyk.jpg"
+    Image.new(mode, (400, 200)).save(img_path)
+    thumb_bytes = ThumbnailGenerator.generate(str(img_path))
+    thumb_img = Image.open(io.BytesIO(thumb_bytes))
+    assert thumb_img.size == (150, 75)
+    assert thumb_img.mode == "RGB"
+
+def make_exif_jpeg(path, size, preview_size):
+    """Saves a JPEG of ``size`` with an EXIF (IFD1) preview of ``preview_size``."""
+    import struct
+    preview = Image.new('RGB', preview_size, color='blue')
+    buffer = io.BytesIO()
+    preview.save(buffer, format="JPEG")
+    preview_bytes = buffer.getvalue()
+
+    # Little-endian TIFF: empty IFD0 at 8 pointing to IFD1 at 14, preview at 44
+    ifd1 = struct.pack("<H", 2)
+    ifd1 += struct.pack("<HHII", 0x0201, 4, 1, 44)
+    ifd1 += struct.pack("<HHII", 0x0202, 4, 1, len(preview_bytes))
+    ifd1 += struct.pack("<I", 0)
+    tiff = b"II*\x00" + struct.pack("<I", 8) + struct.pack("<HI", 0, 14) + ifd1
+    Image.new('RGB', size, color='red').save(path, exif=b"Exif\x00\x00" + tiff + preview_bytes)
+
+def test_generate_uses_embedded_preview(tmp_path):
+    img_path = str(tmp_path / "camera.jpg")
+    make_exif_jpeg(img_path, (1600, 1200), (160, 120))
+
+    thumb_bytes, source = ThumbnailGenerator.generate_with_source(img_path, use_embedded=True)
+    assert source == ThumbnailGenerator.SOURCE_EMBEDDED
+    thumb_img = Image.open(io.BytesIO(thumb_bytes))
+    assert thumb_img.size == (150, 113)
+    # The preview is blue while the main image is red
+    assert thumb_img.getpixel((75, 56))[2] > 200
+
+    thumb_bytes, source = ThumbnailGenerator.generate_with_source(img_path)
+    assert source == ThumbnailGenerator.QUALITY_FAST
+    assert Image.open(io.BytesIO(thumb_bytes)).getpixel((75, 56))[0] > 200
+
+@pytest.mark.parametrize("preview_size", [(100, 75), (160, 90)])
+def test_generate_rejects_unsuitable_preview(tmp_path, preview_size):
+    # Too small, or letterboxed (16:9 preview of a 4:3 image)
+    img_path = str(tmp_path / "camera.jpg")
+    make_exif_jpeg(img_path, (1600, 1200), preview_size)
+    thumb_bytes, source = ThumbnailGenerator.generate_with_source(img_path, use_embedded=True)
+    assert source == ThumbnailGenerator.QUALITY_FAST
+    assert Image.open(io.BytesIO(thumb_bytes)).size == (150, 113)
+
+def test_generate_with_source_invalid_path():
+    assert ThumbnailGenerator.generate_with_source("invalid_path.jpg") == (None, None)
+
+@pytest.mark.parametrize("encoding", ["raw", "raw-zlib"])
+def test_generate_raw_encoding(tmp_path, encoding):
+    img_path = str(tmp_path / "photo.png")
+    Image.new('RGB', (400, 300), color=(10, 20, 30)).save(img_path)
+
+    thumb_bytes, _ = ThumbnailGenerator.generate_with_source(img_path, encoding=encoding)
+    width, height, bytes_per_line, pixel_format, pixels = ThumbnailGenerator.read_raw(thumb_bytes)
+    assert (width, height, bytes_per_line) == (150, 113, 450)
+    assert pixel_format == ThumbnailGenerator.RAW_RGB888
+    assert bytes(pixels[:3]) == b"\x0a\x14\x1e"
+    if encoding == "raw":
+        assert len(thumb_bytes) == RAW_HEADER.size + 450 * 113
+    else:
+        assert len(thumb_bytes) < 450 * 113
+
+def test_generate_raw_keeps_alpha_premultiplied(tmp_path):
+    img_path = str(tmp_path / "alpha.png")
+    Image.new('RGBA', (20, 20), color=(200, 100, 0, 128)).save(img_path)
+    thumb_bytes, _ = ThumbnailGenerator.generate_with_source(img_path, encoding="raw")
+    _, _, _, pixel_format, pixels = ThumbnailGenerator.read_raw(thumb_bytes)
+    assert pixel_format == ThumbnailGenerator.RAW_ARGB32_PREMULTIPLIED
+    # B, G, R, A with colour channels scaled by alpha
+    assert bytes(pixels[:4]) == bytes([0, 50, 100, 128])
+
+def test_read_raw_rejects_other_data():
+    assert ThumbnailGenerator.read_raw(b"\xff\xd8\xff\xe0 jpeg data") is None
+    assert ThumbnailGenerator.read_raw(b"PARW") is None
+    truncated = ThumbnailGenerator._encode(Image.new('RGB', (4, 4)), "raw")[:-1]
+    assert ThumbnailGenerator.read_raw(truncated) is None
+
+@pytest.mark.parametrize("source_encoding", ["jpeg", "raw", "raw-zlib"])
+def test_downscale_between_encodings(source_encoding):
+    thumb = ThumbnailGenerator._encode(Image.new('RGB', (150, 100), color='red'), source_encoding)
+    small = ThumbnailGenerator.downscale(memoryview(thumb), (64, 64), encoding="raw")
+    width, height, _, _, pixels = ThumbnailGenerator.read_raw(small)
+    assert (width, height) == (64, 43)
+    assert pixels[0] > 200
+    jpeg = ThumbnailGenerator.downscale(thumb, (64, 64))
+    assert Image.open(io.BytesIO(jpeg)).size == (64, 43)
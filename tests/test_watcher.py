@@ -0,0 +1,126 @@
+import pytest
+import os
+from PIL import Image
+from src.app.database import DatabaseManager
+from src.app.file_scanner import FolderScanner, DirectoryRefresher
+from src.app.watcher import WorkspaceWatcher
+
+@pytest.fixture
+def workspace(tmp_path):
+    root = tmp_path / "workspace"
+    (root / "sub").mkdir(parents=True)
+    Image.new('RGB', (10, 10), color='red').save(root / "a.jpg")
+    Image.new('RGB', (10, 10), color='red').save(root / "sub" / "b.png")
+    db_path = str(tmp_path / "workspace.db")
+    DatabaseManager(db_path)
+    FolderScanner(str(root), db_path).run()
+    return str(root), db_path
+
+@pytest.mark.parametrize("force_polling", [False, True])
+def test_watcher_reports_changes(workspace, qtbot, force_polling):
+    root, db_path = workspace
+    watcher = WorkspaceWatcher(force_polling=force_polling)
+    watcher._debounce_timer.setInterval(50)
+    watcher.poll_interval = 0.05
+    watcher.start(root, db_path)
+    assert watcher.watched_directories() == sorted([root, os.path.join(root, "sub")])
+
+    found, removed = [], []
+    watcher.files_found.connect(lambda batch: found.extend(p for p, _ in batch))
+    watcher.files_removed.connect(removed.extend)
+
+    new_file = os.path.join(root, "sub", "c.png")
+    Image.new('RGB', (10, 10), color='blue').save(new_file)
+    os.remove(os.path.join(root, "a.jpg"))
+    # Make sure polling sees an mtime change even on coarse filesystems
+    for directory in (root, os.path.join(root, "sub")):
+        os.utime(directory, ns=(0, os.stat(directory).st_mtime_ns + 1_000_000))
+
+    qtbot.waitUntil(lambda: bool(found and removed), timeout=5000)
+    assert found == [new_file]
+    assert removed == [os.path.join(root, "a.jpg")]
+    watcher.stop()
+    assert watcher.watched_directories() == []
+
+def test_watcher_tracks_new_directories(workspace, qtbot):
+    root, db_path = workspace
+    watcher = WorkspaceWatcher(force_polling=True)
+    watcher._debounce_timer.setInterval(50)
+    watcher.poll_interval = 0.05
+    watcher.start(root, db_path)
+
+    found = []
+    watcher.files_found.connect(lambda batch: found.extend(p for p, _ in batch))
+    new_dir = os.path.join(root, "new")
+    os.mkdir(new_dir)
+    Image.new('RGB', (10, 10), color='blue').save(os.path.join(new_dir, "d.png"))
+    os.utime(root, ns=(0, os.stat(root).st_mtime_ns + 1_000_000))
+
+    qtbot.waitUntil(lambda: bool(found), timeout=5000)
+    qtbot.waitUntil(lambda: new_dir in watcher.watched_directories(), timeout=5000)
+    watcher.stop()
+
+def test_watcher_drops_batches_of_stopped_refreshes(workspace, qtbot):
+    from unittest import mock
+    root, db_path = workspace
+    watcher = WorkspaceWatcher(force_polling=True)
+    watcher.start(root, db_path)
+    found, removed = [], []
+    watcher.files_found.connect(found.extend)
+    watcher.files_removed.connect(removed.extend)
+
+    watcher._dirty.add(root)
+    with mock.patch("src.app.watcher.QThreadPool"):
+        watcher._flush()
+    signals = watcher._refresher.signals
+    signals.files_found.emit([(os.path.join(root, "a.jpg"), b"")])
+    assert len(found) == 1
+
+    # Batches still queued when the workspace is closed are dropped
+    watcher.stop()
+    signals.files_found.emit([(os.path.join(root, "a.jpg"), b"")])
+    signals.files_removed.emit([os.path.join(root, "a.jpg")])
+    assert len(found) == 1 and removed == []
+
+def test_watcher_ignores_its_own_database(tmp_path, qtbot):
+    from unittest import mock
+    from src.app import watcher as watcher_module
+    root = tmp_path / "workspace"
+    root.mkdir()
+    Image.new('RGB', (10, 10), color='red').save(root / "a.jpg")
+    # The database and its journal live in the watched root
+    db_path = str(root / ".pic_analyzer.db")
+    DatabaseManager(db_path)
+    FolderScanner(str(root), db_path).run()
+
+    refreshes = []
+    def counting_refresher(*args, **kwargs):
+        refresher = DirectoryRefresher(*args, **kwargs)
+        refreshes.append(refresher)
+        return refresher
+
+    watcher = WorkspaceWatcher()
+    watcher._debounce_timer.setInterval(50)
+    found = []
+    watcher.files_found.connect(lambda batch: found.extend(p for p, _ in batch))
+    with mock.patch.object(watcher_module, "DirectoryRefresher", side_effect=counting_refresher):
+        watcher.start(str(root), db_path)
+        Image.new('RGB', (10, 10), color='blue').save(root / "b.png")
+        qtbot.waitUntil(lambda: bool(found), timeout=5000)
+        # Writing the new row must not notify another refresh
+        qtbot.wait(1000)
+    watcher.stop()
+    assert found == [str(root / "b.png")]
+    assert len(refreshes) == 1
+
+def test_watcher_polls_network_shares(workspace, qtbot):
+    from unittest import mock
+    from src.app.io_tuning import STORAGE_NETWORK
+    root, db_path = workspace
+    watcher = WorkspaceWatcher()
+    with mock.patch("src.app.watcher.storage_class", return_value=STORAGE_NETWORK):
+        watcher.start(root, db_path)
+    assert watcher.polling
+    assert watcher._watcher.directories() == []
+    assert watcher.watched_directories() == sorted([root, os.path.join(root, "sub")])
+    watcher.stop()
@@ -21,3 +21,40 @@ def test_main_window_resize(qtbot):
     window.resize(1400, 900)
     # The gallery's resizeEvent should have been triggered
     assert window.layout_engine.sort_overlay.pos() != initial_sort_pos
+
+def test_main_window_loads_levels_near_viewport(qtbot, monkeypatch, tmp_path):
+    from unittest import mock
+    import src.ui.main_window.logic as main_logic
+    from src.app.state import state
+    window = MainWindow()
+    qtbot.addWidget(window)
+    window.resize(800, 600)
+    window.show()
+    gallery = window.layout_engine.gallery
+    gallery.add_items([(f"{i}.jpg", None) for i in range(2000)])
+    qtbot.waitUntil(lambda: gallery.verticalScrollBar().maximum() > 0, timeout=1000)
+
+    loaders = []
+    def loader(db_path, paths, level, **options):
+        loaders.append((paths, level))
+        return mock.MagicMock()
+    monkeypatch.setattr(main_logic, "ThumbnailLevelLoader", loader)
+    monkeypatch.setattr(main_logic, "QThreadPool", mock.MagicMock())
+    monkeypatch.setattr(state, "current_folder", str(tmp_path))
+    monkeypatch.setattr(window, "devicePixelRatioF", lambda: 2.0)
+
+    window._load_thumbnail_level()
+    # HiDPI tiles are only generated for what is on screen
+    (paths, level), = loaders
+    assert level == 300
+    assert paths[0] == "0.jpg" and 0 < len(paths) < 2000
+
+    # Delivered tiles are not requested again once the gallery scrolled
+    window._level_loader = mock.MagicMock()
+    window._level_loader.signals = mock.MagicMock()
+    monkeypatch.setattr(window, "sender", lambda: window._level_loader.signals)
+    window._on_level_batch([(path, b"") for path in paths])
+    gallery.verticalScrollBar().setValue(gallery.verticalScrollBar().maximum())
+    window._load_thumbnail_level()
+    assert not set(loaders[1][0]) & set(paths)
+    assert "1999.jpg" in loaders[1][0]
@@ -61,6 +61,27 @@ def test_gallery_item_delegate_paint(qtbot):
     finally:
         painter.end()
 
+def test_gallery_item_delegate_paints_placeholder(qtbot):
+    gallery = GalleryView()
+    qtbot.addWidget(gallery)
+    gallery.add_item("undecodable.jpg") # No thumbnail
+    qtbot.waitUntil(lambda: len(gallery._group_widgets) > 0, timeout=1000)
+
+    delegate = GalleryItemDelegate(gallery._group_widgets[0])
+    image = QImage(150, 150, QImage.Format_RGB32)
+    image.fill(Qt.white)
+    painter = QPainter(image)
+    try:
+        option = QStyleOptionViewItem()
+        option.rect = image.rect()
+        index = gallery._group_widgets[0].model().index(0, 0)
+        delegate.paint(painter, option, index)
+    finally:
+        painter.end()
+    # The cell is not left empty
+    assert image.pixelColor(10, 10) != Qt.white
+    assert image.pixelColor(2, 2) == Qt.white
+
 def test_gallery_view_esc_exits_selection(qtbot):
     gallery = GalleryView()
     qtbot.addWidget(gallery)
@@ -106,6 +127,26 @@ def test_image_viewer_show_image(qtbot):
     assert viewer.isVisible()
     assert viewer.opacity_effect.opacity() == 0.0 # Starts at 0 for animation
 
+def test_image_viewer_opens_archive_members(qtbot, tmp_path):
+    import io
+    import zipfile
+    from PIL import Image
+    archive = str(tmp_path / "photos.zip")
+    with zipfile.ZipFile(archive, "w") as zf:
+        for name, fmt in (("a.png", "PNG"), ("b.gif", "GIF")):
+            buffer = io.BytesIO()
+            Image.new("RGB", (20, 10), "red").save(buffer, format=fmt)
+            zf.writestr(name, buffer.getvalue())
+
+    viewer = ImageViewer()
+    qtbot.addWidget(viewer)
+    viewer.resize(200, 200)
+    viewer.show_image(archive + "!/a.png")
+    assert not viewer.layout_engine.current_label.pixmap().isNull()
+    viewer.current_movie = viewer._set_media(viewer.layout_engine.current_label, archive + "!/b.gif")
+    assert viewer.current_movie is not None and viewer.current_movie.isValid()
+    viewer.current_movie.stop()
+
 def test_image_viewer_resize(qtbot):
     viewer = ImageViewer()
     qtbot.addWidget(viewer)
@@ -139,3 +180,92 @@ def test_image_viewer_wheel_event(qtbot):
         from PySide6.QtCore import QPointF, QPoint
         event = QWheelEvent(QPointF(10, 10), QPointF(10, 10), QPoint(0, 0), QPoint(0, -120), Qt.NoButton, Qt.NoModifier, Qt.ScrollUpdate, False)
         viewer.wheelEvent(event)
+
+def test_gallery_view_incremental_update_and_remove(qtbot):
+    gallery = GalleryView()
+    qtbot.addWidget(gallery)
+    gallery.add_item("a.jpg")
+    gallery.add_item("b.jpg")
+    qtbot.waitUntil(lambda: gallery.count() == 2, timeout=1000)
+
+    # Re-adding a known path updates it instead of duplicating it
+    gallery.add_item("a.jpg", b"new thumb")
+    assert gallery.count() == 2
+    assert gallery._items[0]['thumb'] == b"new thumb"
+
+    gallery.remove_items(["a.jpg", "missing.jpg"])
+    assert gallery.count() == 1
+    assert gallery._group_widgets[0].count() == 1
+    assert gallery._group_widgets[0].item(0).data(Qt.UserRole) == "b.jpg"
+
+def test_gallery_view_add_items_batch(qtbot):
+    gallery = GalleryView()
+    qtbot.addWidget(gallery)
+    gallery.add_items([("a.jpg", None), ("b.jpg", None)])
+    qtbot.waitUntil(lambda: gallery.count() == 2, timeout=1000)
+
+    # Once the group exists, batches are appended without a rebuild
+    group = gallery._group_widgets[0]
+    gallery.add_items([(f"{i}.jpg", None) for i in range(10)])
+    assert gallery._group_widgets[0] is group
+    assert group.count() == 12
+    assert gallery.count() == 12
+
+def test_gallery_view_thumbnail_zoom(qtbot):
+    gallery = GalleryView()
+    qtbot.addWidget(gallery)
+    gallery.add_items([("a.jpg", None), ("b.jpg", None)])
+    qtbot.waitUntil(lambda: gallery.count() == 2, timeout=1000)
+    group = gallery._group_widgets[0]
+    assert group.gridSize().width() == 150
+
+    with qtbot.waitSignal(gallery.thumbnail_size_changed) as blocker:
+        gallery.zoom_in()
+    assert blocker.args == [300]
+    assert gallery.thumbnail_size == 300
+    assert group.gridSize().width() == 300
+    gallery.zoom_in() # Already the largest size
+    assert gallery.thumbnail_size == 300
+
+    gallery.zoom_out()
+    gallery.zoom_out()
+    assert gallery.thumbnail_size == 64
+    assert group.iconSize().width() == 62
+    assert gallery.paths() == ["a.jpg", "b.jpg"]
+
+def test_gallery_view_raw_thumbnails(qtbot):
+    from PIL import Image
+    from src.ui.thumbnail_gen import ThumbnailGenerator
+    gallery = GalleryView()
+    qtbot.addWidget(gallery)
+    rgb = ThumbnailGenerator._encode(Image.new('RGB', (40, 30), color=(255, 0, 0)), "raw")
+    rgba = ThumbnailGenerator._encode(Image.new('RGBA', (30, 40), color=(0, 0, 255, 255)), "raw-zlib")
+    gallery.add_items([("rgb.jpg", memoryview(rgb)), ("rgba.png", rgba)])
+    qtbot.waitUntil(lambda: gallery.count() == 2, timeout=1000)
+
+    # Pack views are not kept, so the pack can still be compacted
+    assert isinstance(gallery._item_map["rgb.jpg"]['thumb'], bytes)
+    rgb_image = gallery._list_items["rgb.jpg"].icon().pixmap(40, 30).toImage()
+    assert rgb_image.pixelColor(20, 15).getRgb()[:3] == (255, 0, 0)
+    rgba_image = gallery._list_items["rgba.png"].icon().pixmap(30, 40).toImage()
+    assert rgba_image.pixelColor(15, 20).getRgb() == (0, 0, 255, 255)
+
+def test_gallery_view_paths_near_viewport(qtbot):
+    gallery = GalleryView()
+    qtbot.addWidget(gallery)
+    gallery.resize(640, 480)
+    gallery.show()
+    paths = [f"{i}.jpg" for i in range(500)]
+    gallery.add_items([(path, None) for path in paths])
+    qtbot.waitUntil(lambda: gallery.count() == 500, timeout=1000)
+    qtbot.waitUntil(lambda: gallery.verticalScrollBar().maximum() > 0, timeout=1000)
+
+    near = gallery.paths_near_viewport()
+    assert near[0] == "0.jpg"
+    assert "499.jpg" not in near
+    assert len(near) < 100
+
+    with qtbot.waitSignal(gallery.viewport_changed):
+        gallery.verticalScrollBar().setValue(gallery.verticalScrollBar().maximum())
+    near = gallery.paths_near_viewport()
+    assert "499.jpg" in near and "0.jpg" not in near